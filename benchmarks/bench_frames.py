@@ -0,0 +1,81 @@
+"""Throughput of the raw-frame pipe input at 1080p
+
+Run from the repository root (needs ffmpeg on PATH):
+
+    python benchmarks/bench_frames.py [--seconds 10] [--json]
+
+Feeds a generated test pattern through FrameFeed into ffmpeg twice: unpaced
+into a null sink, which shows the most frames per second the Python side can
+push, and paced at 30 fps into the stream's x264 settings, which shows
+whether the producer keeps realtime. For both it reports the frame rate, the
+CPU used by the Python process and the time spent waiting on backpressure.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from frame_feed import FrameFeed, pattern_producer
+
+ENCODE_ARGS = ["-c:v", "libx264", "-preset", "veryfast", "-b:v", "2500k", "-pix_fmt", "yuv420p"]
+
+def run_feed(width, height, seconds, paced, encode):
+    """Stream a test pattern for `seconds` and measure the feed"""
+    feed = FrameFeed(pattern_producer(width, height), width, height, paced=paced, name="bench")
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"] + feed.input_args()
+    cmd += (ENCODE_ARGS if encode else ["-c:v", "rawvideo"]) + ["-f", "null", "-"]
+
+    stdin = feed.open()
+    process = subprocess.Popen(cmd, stdin=stdin)
+    os.close(stdin)
+
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    feed.start()
+    time.sleep(seconds)
+    feed.stop()
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu_start
+    process.wait(timeout=30)
+
+    stats = feed.stats()
+    frame_bytes = width * height * 3
+    return {
+        "fps": stats["frames_written"] / elapsed,
+        "throughput_mb_s": stats["frames_written"] * frame_bytes / elapsed / 1e6,
+        "python_cpu_cores": cpu / elapsed,
+        "backpressure_share": stats["backpressure_seconds"] / elapsed,
+        "late_frames": stats["late_frames"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the raw-frame pipe input")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = {
+        "unpaced_null": run_feed(args.width, args.height, args.seconds, paced=False, encode=False),
+        "paced_x264": run_feed(args.width, args.height, args.seconds, paced=True, encode=True)
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for name, r in results.items():
+        print(
+            f"{name:<14} {r['fps']:6.1f} fps  {r['throughput_mb_s']:6.0f} MB/s  "
+            f"python cpu {r['python_cpu_cores']:4.2f} cores  "
+            f"backpressure {r['backpressure_share'] * 100:3.0f}%  late frames {r['late_frames']}"
+        )
+
+if __name__ == "__main__":
+    main()
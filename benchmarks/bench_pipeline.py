@@ -0,0 +1,446 @@
+"""Streaming pipeline benchmark against a local RTMP sink instead of YouTube
+
+Run from the repository root (needs ffmpeg on PATH):
+
+    python benchmarks/bench_pipeline.py [--duration 15] [--max-streams 16] [--json]
+
+For every mode (re-encode, fast start, adaptive, passthrough, Shorts, loop) it
+measures encode speed, CPU per stream, time from Start to the first packet
+reaching the sink and stop latency, then finds how many concurrent re-encodes
+the host sustains at 1.0x.
+Streams are placed by the resource governor as in the app (pinned cores, x264
+threads and niceness, with --reserved cores left free); each result records
+its placement and speed margin, and each concurrency step how late a small
+periodic task in this process ran, standing in for Streamlit reruns. Use it
+to tune STREAM_ENCODE_COST and STREAM_HOST_BUDGET, and --ungoverned to
+compare with ffmpeg scheduling its own threads.
+With --throttle-kbps the upload to each sink goes through a rate-limited proxy,
+which is how the adaptive bitrate ladder is exercised: with split publishing the
+proxy holds back the publisher, whose delivered speed the ladder follows.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep benchmark streams out of the real analytics history
+os.environ.setdefault("STREAM_DATA_DIR", tempfile.mkdtemp(prefix="bench-data-"))
+
+from stream_engine import run_ffmpeg, stop_stream, get_process
+from encoder_metrics import get_recorder
+from bitrate_control import get_controller
+from resource_governor import configure_governor, get_governor
+from constants import STREAM_COSTS, STREAM_RESERVED_CORES
+
+MODES = {
+    "reencode": {"is_shorts": False, "is_loop": False, "passthrough": False, "fast_start": False, "adaptive": False},
+    "fast_start": {"is_shorts": False, "is_loop": False, "passthrough": False, "fast_start": True, "adaptive": False},
+    "adaptive": {"is_shorts": False, "is_loop": False, "passthrough": False, "fast_start": False, "adaptive": True},
+    "passthrough": {"is_shorts": False, "is_loop": False, "passthrough": True, "fast_start": False, "adaptive": False},
+    "shorts": {"is_shorts": True, "is_loop": False, "passthrough": False, "fast_start": False, "adaptive": False},
+    "loop": {"is_shorts": False, "is_loop": True, "passthrough": False, "fast_start": False, "adaptive": False}
+}
+
+# Seconds of encoder samples ignored while ffmpeg warms up
+WARMUP_SECONDS = 2
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def is_listening(port):
+    """Check /proc/net/tcp for a listener without connecting to it"""
+    try:
+        with open("/proc/net/tcp") as f:
+            rows = f.readlines()[1:]
+    except OSError:
+        return None
+
+    for row in rows:
+        fields = row.split()
+        if int(fields[1].split(":")[1], 16) == port and fields[3] == "0A":
+            return True
+    return False
+
+def process_cpu_seconds(pid):
+    """User plus system CPU time of a process, from /proc"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    except (OSError, IndexError):
+        return None
+
+def make_input(path, seconds):
+    """Generate an ingest-like 720p30 H.264/AAC test clip"""
+    if os.path.exists(path):
+        return path
+
+    subprocess.run([
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", "testsrc2=size=1280x720:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(seconds),
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-g", "60",
+        "-c:a", "aac", "-b:a", "128k",
+        path
+    ], check=True)
+    return path
+
+class LocalSink:
+    """ffmpeg accepting RTMP publishes and discarding what it receives"""
+
+    def __init__(self):
+        self.port = free_port()
+        self.url_base = f"rtmp://127.0.0.1:{self.port}/live"
+        self.first_packet_at = None
+        self.closed = False
+        self.process = self._listen()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _listen(self):
+        return subprocess.Popen(
+            [
+                "ffmpeg", "-hide_banner", "-nostats", "-loglevel", "error",
+                "-listen", "1", "-i", f"{self.url_base}/bench",
+                "-c", "copy", "-f", "null", "-",
+                "-progress", "pipe:1", "-stats_period", "0.1"
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+
+    def _serve(self):
+        # An ffmpeg listener takes one publish; listen again for restarted encodes
+        while True:
+            for line in self.process.stdout:
+                key, _, value = line.strip().partition("=")
+                if self.first_packet_at is None and key == "out_time_us" and value.isdigit() and int(value) > 0:
+                    self.first_packet_at = time.monotonic()
+            self.process.wait()
+            if self.closed:
+                return
+            self.process = self._listen()
+
+    def wait_ready(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            listening = is_listening(self.port)
+            if listening is None:
+                time.sleep(0.5)
+                return
+            if listening:
+                return
+            time.sleep(0.02)
+        raise RuntimeError(f"Sink on port {self.port} did not start listening")
+
+    def close(self):
+        self.closed = True
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+class ThrottledProxy:
+    """TCP proxy in front of a sink capping upload throughput, to emulate a weak uplink"""
+
+    # Bytes forwarded per write; small so the pacing stays smooth
+    CHUNK = 4096
+
+    def __init__(self, upstream_port, kbps):
+        self.upstream_port = upstream_port
+        self.bytes_per_second = kbps * 1000 / 8
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            # A small receive buffer makes the encoder feel the limit quickly
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _connect_upstream(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return socket.create_connection(("127.0.0.1", self.upstream_port))
+            except OSError:
+                # The sink may still be restarting its listener
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def _serve(self, client):
+        try:
+            upstream = self._connect_upstream()
+        except OSError:
+            client.close()
+            return
+        threading.Thread(target=self._pipe, args=(upstream, client, None), daemon=True).start()
+        self._pipe(client, upstream, self.bytes_per_second)
+
+    def _pipe(self, source, destination, rate):
+        try:
+            while True:
+                data = source.recv(self.CHUNK)
+                if not data:
+                    break
+                destination.sendall(data)
+                if rate:
+                    time.sleep(len(data) / rate)
+        except OSError:
+            pass
+        finally:
+            source.close()
+            destination.close()
+
+    def close(self):
+        self.server.close()
+
+class BenchStream:
+    """One engine stream publishing to its own local sink"""
+
+    def __init__(self, name, video_path, mode, throttle_kbps=None, cost=None):
+        self.stream_id = f"bench-{name}"
+        self.cost = cost
+        self.video_path = video_path
+        self.options = dict(MODES[mode])
+        self.sink = LocalSink()
+        self.proxy = ThrottledProxy(self.sink.port, throttle_kbps) if throttle_kbps else None
+        self.url_base = f"rtmp://127.0.0.1:{self.proxy.port}/live" if self.proxy else self.sink.url_base
+        self.logs = []
+        self.thread = None
+
+    def start(self):
+        self.sink.wait_ready()
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(
+            target=run_ffmpeg,
+            args=(self.video_path, "bench", self.options["is_shorts"], self.options["is_loop"], self.logs.append, self.stream_id),
+            kwargs={
+                "rtmp_url": self.url_base,
+                "passthrough": self.options["passthrough"],
+                "fast_start": self.options["fast_start"],
+                "adaptive": self.options["adaptive"],
+                # Every run starts from the top, whatever an interrupted one left behind
+                "resume": False,
+                "cost": None if self.options["passthrough"] else self.cost
+            },
+            daemon=True
+        )
+        self.thread.start()
+
+    def wait_first_packet(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while self.sink.first_packet_at is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        if self.sink.first_packet_at is None:
+            return None
+        return (self.sink.first_packet_at - self.started_at) * 1000
+
+    def cpu_seconds(self):
+        """CPU time of the current ffmpeg process, with its pid"""
+        process = get_process(self.stream_id)
+        return (process.pid, process_cpu_seconds(process.pid)) if process else None
+
+    def speeds(self):
+        recorder = get_recorder(self.stream_id)
+        if recorder is None:
+            return []
+        return [s for t, s in zip(recorder.seconds, recorder.speed) if t >= WARMUP_SECONDS and s > 0]
+
+    def placement(self):
+        return next((p for p in get_governor().placements() if p["stream_id"] == self.stream_id), None)
+
+    def ladder(self):
+        controller = get_controller(self.stream_id)
+        return controller.summary() if controller else None
+
+    def stop(self):
+        """Stop the stream and return how long ffmpeg took to exit, in ms"""
+        start = time.monotonic()
+        stop_stream(self.stream_id)
+        self.thread.join(timeout=30)
+        latency = (time.monotonic() - start) * 1000
+        if self.proxy:
+            self.proxy.close()
+        self.sink.close()
+        return latency
+
+class UiProbe:
+    """Stands in for the Streamlit server: how late a short periodic task runs while streams encode"""
+
+    def __init__(self, period=0.05, work=2000):
+        self.period = period
+        self.work = work
+        self.lateness_ms = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.monotonic()
+            time.sleep(self.period)
+            sum(i * i for i in range(self.work))
+            self.lateness_ms.append((time.monotonic() - start - self.period) * 1000)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def p95(self):
+        if len(self.lateness_ms) < 2:
+            return None
+        return statistics.quantiles(self.lateness_ms, n=20)[-1]
+
+def run_streams(video_path, mode, count, duration, throttle_kbps=None, cost=None):
+    """Run `count` concurrent streams of one mode and measure each of them"""
+    streams = [BenchStream(f"{mode}-{count}-{i}", video_path, mode, throttle_kbps, cost) for i in range(count)]
+    for stream in streams:
+        stream.start()
+
+    first_packet_ms = [stream.wait_first_packet() for stream in streams]
+
+    cpu_start = [stream.cpu_seconds() for stream in streams]
+    window_start = time.monotonic()
+    time.sleep(duration)
+    window = time.monotonic() - window_start
+    cpu_end = [stream.cpu_seconds() for stream in streams]
+    placements = [stream.placement() for stream in streams]
+
+    results = []
+    for stream, first_ms, cpu0, cpu1, placement in zip(streams, first_packet_ms, cpu_start, cpu_end, placements):
+        speeds = stream.speeds()
+        results.append({
+            "speed_median": statistics.median(speeds) if speeds else None,
+            "speed_min": min(speeds) if speeds else None,
+            # Headroom above realtime on its share of cores, as the governor reports it
+            "margin": placement["margin"] if placement else None,
+            "cores": placement["cores"] if placement else None,
+            "threads": placement["threads"] if placement else None,
+            # Unknown when an adaptive stream restarted ffmpeg during the window
+            "cpu_cores": (cpu1[1] - cpu0[1]) / window if cpu0 and cpu1 and cpu0[0] == cpu1[0] and None not in (cpu0[1], cpu1[1]) else None,
+            "time_to_first_packet_ms": first_ms,
+            "ladder": stream.ladder(),
+            "stop_latency_ms": stream.stop()
+        })
+    return results
+
+def find_max_concurrency(video_path, duration, max_streams, cost=None):
+    """Add re-encode streams until the slowest one drops below realtime"""
+    steps = []
+    sustained = 0
+
+    for count in range(1, max_streams + 1):
+        with UiProbe() as probe:
+            results = run_streams(video_path, "loop", count, duration, cost=cost)
+        speeds = [r["speed_median"] for r in results]
+        slowest = min((s for s in speeds if s is not None), default=0)
+        margins = [r["margin"] for r in results if r["margin"] is not None]
+        steps.append({
+            "streams": count,
+            "slowest_speed": slowest,
+            "min_margin": min(margins, default=None),
+            "ui_lateness_p95_ms": probe.p95(),
+            "cores": [r["cores"] for r in results]
+        })
+
+        if slowest < 1.0 or None in speeds:
+            break
+        sustained = count
+
+    return {"max_concurrent_streams": sustained, "steps": steps}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the streaming pipeline against a local sink")
+    parser.add_argument("--input", help="Video to stream (a test clip is generated by default)")
+    parser.add_argument("--duration", type=float, default=15, help="Measurement window per run, in seconds")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--max-streams", type=int, default=16, help="Upper bound of the concurrency search (0 to skip)")
+    parser.add_argument("--throttle-kbps", type=int, help="Cap the upload to each sink, to exercise the adaptive bitrate ladder")
+    parser.add_argument("--encode-cost", type=float, default=STREAM_COSTS["encode"], help="Cores given to each re-encode")
+    parser.add_argument("--reserved", type=int, default=STREAM_RESERVED_CORES, help="Cores kept free for the app")
+    parser.add_argument("--ungoverned", action="store_true", help="Let ffmpeg schedule its own threads, unpinned")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    # Unlimited budget, so the concurrency search can go past the configured one
+    governor = configure_governor(budget=float("inf"), reserved=args.reserved, pin=not args.ungoverned)
+
+    workdir = tempfile.mkdtemp(prefix="bench-pipeline-")
+    # Long enough that non-looped modes outlast the window; the loop clip wraps several times
+    long_clip = args.input or make_input(os.path.join(workdir, "long.mp4"), int(args.duration) + 30)
+    loop_clip = args.input or make_input(os.path.join(workdir, "loop.mp4"), 4)
+
+    results = {
+        "host": {"cpus": os.cpu_count(), "stream_cores": len(governor.cores), "reserved_cores": len(governor.reserved)},
+        "governor": {"pinned": governor.pin, "encode_cost": args.encode_cost},
+        "duration": args.duration,
+        "throttle_kbps": args.throttle_kbps,
+        "modes": {}
+    }
+
+    for mode in args.modes:
+        clip = loop_clip if MODES[mode]["is_loop"] else long_clip
+        results["modes"][mode] = run_streams(clip, mode, 1, args.duration, args.throttle_kbps, args.encode_cost)[0]
+
+    if args.max_streams:
+        results["concurrency"] = find_max_concurrency(loop_clip, args.duration, args.max_streams, args.encode_cost)
+        # The budget that admits exactly the sustained number of re-encodes
+        results["concurrency"]["suggested_budget"] = results["concurrency"]["max_concurrent_streams"] * args.encode_cost
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for mode, r in results["modes"].items():
+        print(
+            f"{mode:<12} speed {r['speed_median'] or 0:5.2f}x (min {r['speed_min'] or 0:4.2f}x)  "
+            f"cpu {r['cpu_cores'] or 0:4.2f} cores on {r['cores'] or '-'}  "
+            f"margin {r['margin'] if r['margin'] is not None else float('nan'):+5.2f}x  "
+            f"first packet {r['time_to_first_packet_ms'] or 0:7.0f} ms  "
+            f"stop {r['stop_latency_ms']:6.0f} ms"
+        )
+        if r["ladder"]:
+            ladder = r["ladder"]
+            print(
+                f"{'':<12} ladder ended on {ladder['rung']} after {ladder['ladder_changes']} changes, "
+                f"{ladder['seconds_below_realtime']:.0f}s below realtime"
+            )
+    if "concurrency" in results:
+        for step in results["concurrency"]["steps"]:
+            print(
+                f"{step['streams']:>3} re-encodes  slowest {step['slowest_speed']:4.2f}x  "
+                f"margin {step['min_margin'] if step['min_margin'] is not None else float('nan'):+5.2f}x  "
+                f"ui lateness p95 {step['ui_lateness_p95_ms'] or 0:6.1f} ms"
+            )
+        print(
+            f"max concurrent re-encodes at >= 1.0x: {results['concurrency']['max_concurrent_streams']} "
+            f"(STREAM_HOST_BUDGET={results['concurrency']['suggested_budget']:g} with STREAM_ENCODE_COST={args.encode_cost:g})"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""How library preparation scales with worker processes
+
+Run from the repository root:
+
+    python benchmarks/bench_prep.py [--files 16] [--seconds 5] [--workers 1 2 4] [--json]
+
+Generates short test clips, then prepares them all with `prep_farm.py` once
+per worker count, each against an empty cache, and once more against the
+warm cache to show that prepared content is skipped. Reports files per
+second and the speedup over one worker; on an otherwise idle host it
+should stay close to the worker count up to the number of cores.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def make_clips(directory, count, seconds):
+    """Distinct test clips, so content hashing does not fold them together"""
+    for i in range(count):
+        subprocess.run([
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency={220 + i * 10}:duration={seconds}",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest",
+            "-y", os.path.join(directory, f"clip{i:03d}.mp4")
+        ], check=True)
+
+def prepare(clips_dir, data_dir, workers):
+    env = dict(os.environ, STREAM_DATA_DIR=data_dir)
+    start = time.monotonic()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "prep_farm.py"), clips_dir, "--workers", str(workers)],
+        env=env, check=True, capture_output=True
+    )
+    return time.monotonic() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure library preparation throughput by worker count")
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5, help="Length of each test clip")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bench_prep_")
+    try:
+        clips_dir = os.path.join(scratch, "clips")
+        os.makedirs(clips_dir)
+        make_clips(clips_dir, args.files, args.seconds)
+
+        results = {}
+        for workers in args.workers:
+            data_dir = os.path.join(scratch, f"data{workers}")
+            cold = prepare(clips_dir, data_dir, workers)
+            warm = prepare(clips_dir, data_dir, workers)
+            results[workers] = {"cold_seconds": cold, "warm_seconds": warm, "files_per_second": args.files / cold}
+            shutil.rmtree(data_dir)
+    finally:
+        shutil.rmtree(scratch)
+
+    baseline = results[min(results)]["files_per_second"]
+    for r in results.values():
+        r["speedup"] = r["files_per_second"] / baseline
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{os.cpu_count()} cores, {args.files} clips of {args.seconds:g} s")
+    for workers, r in results.items():
+        print(
+            f"{workers:>3} workers  {r['files_per_second']:6.2f} files/s  speedup {r['speedup']:4.2f}x  "
+            f"cold {r['cold_seconds']:6.1f} s  warm {r['warm_seconds']:5.2f} s"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Cost of reading ffmpeg output as the number of streams grows
+
+Run from the repository root:
+
+    python benchmarks/bench_reader.py [--streams 1 10 50] [--seconds 5] [--json]
+
+Starts N child processes that print ffmpeg-style progress blocks (with \\r
+status lines mixed in) much faster than ffmpeg does, and reads them two
+ways: a thread per stream iterating the pipe as text, as the engine used
+to, and the shared selector reader. For each it reports the lines read,
+the parent's CPU time and how many threads it needed.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pipe_reader import get_pipe_reader
+
+# A progress block as ffmpeg writes it once per -stats_period, plus a status line
+EMITTER = r'''
+import sys, time
+block = "frame=1500\nfps=30.00\nstream_0_0_q=23.0\nbitrate=2510.4kbits/s\ntotal_size=15728640\nout_time_us=50000000\nout_time=00:00:50.000000\ndup_frames=0\ndrop_frames=0\nspeed=1.00x\nprogress=continue\n"
+status = "frame= 1500 fps= 30 q=23.0 size=   15360kB time=00:00:50.00 bitrate=2510.4kbits/s speed=1.00x    \r"
+end = time.monotonic() + float(sys.argv[1])
+while time.monotonic() < end:
+    sys.stdout.write(block + status)
+    sys.stdout.flush()
+    time.sleep(0.01)
+'''
+
+def spawn(count, seconds):
+    return [
+        subprocess.Popen([sys.executable, "-c", EMITTER, str(seconds)], stdout=subprocess.PIPE, bufsize=0)
+        for _ in range(count)
+    ]
+
+def read_threaded(processes):
+    """A thread per pipe, decoding text and blocking per line"""
+    counts = [0] * len(processes)
+
+    def read(i, process):
+        for line in open(process.stdout.fileno(), "r", closefd=False):
+            if line.partition("=")[1]:
+                counts[i] += 1
+
+    threads = [threading.Thread(target=read, args=(i, p)) for i, p in enumerate(processes)]
+    for thread in threads:
+        thread.start()
+    peak_threads = threading.active_count()
+    for thread in threads:
+        thread.join()
+    return sum(counts), peak_threads
+
+def read_shared(processes):
+    """Every pipe on one selector thread, as bytes"""
+    reader = get_pipe_reader()
+    counts = [0]
+    done = threading.Semaphore(0)
+
+    def on_line(line):
+        if b"=" in line:
+            counts[0] += 1
+
+    for process in processes:
+        reader.register(process.stdout, on_line, done.release)
+    time.sleep(0.5)
+    peak_threads = threading.active_count()
+    for _ in processes:
+        done.acquire()
+    return counts[0], peak_threads
+
+def measure(method, count, seconds):
+    processes = spawn(count, seconds)
+    cpu_start = time.process_time()
+    start = time.monotonic()
+    lines, peak_threads = method(processes)
+    elapsed = time.monotonic() - start
+    cpu = time.process_time() - cpu_start
+    for process in processes:
+        process.wait()
+        process.stdout.close()
+    return {
+        "lines": lines,
+        "lines_per_second": lines / elapsed,
+        "cpu_seconds": cpu,
+        "cpu_us_per_line": cpu / lines * 1e6 if lines else None,
+        "threads": peak_threads
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ffmpeg output reading across many streams")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = {}
+    for count in args.streams:
+        results[count] = {
+            "thread_per_stream": measure(read_threaded, count, args.seconds),
+            "shared_reader": measure(read_shared, count, args.seconds)
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for count, methods in results.items():
+        for name, r in methods.items():
+            print(
+                f"{count:>3} streams  {name:<18} {r['lines_per_second']:9.0f} lines/s  "
+                f"cpu {r['cpu_seconds']:5.2f} s ({r['cpu_us_per_line']:4.1f} us/line)  threads {r['threads']}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Rerun cost of the Streamlit render functions under synthetic load
+
+Run from the repository root:
+
+    python benchmarks/bench_render.py [--runs 5] [--api-latency-ms 0] [--json]
+
+Each render function runs in Streamlit's AppTest harness against a long-lived
+stream: a 10k-message chat history, 12 hours of per-second analytics and
+encoder samples, and a library of many video files. For each one it reports
+the first and median rerun wall time, the element count and the payload size.
+With --api-latency-ms every API read is delayed as a remote API would be;
+renders fetch concurrently, so a rerun should take about one delay (at most
+FETCH_TIMEOUT), not one per call.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Synthetic data must not touch the real data directory or API
+os.environ.setdefault("STREAM_DATA_DIR", tempfile.mkdtemp(prefix="bench-data-"))
+os.environ.setdefault("YOUTUBE_BROADCAST_ID", "benchBroadcast")
+
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.element_tree import Block
+from constants import YOUTUBE_BROADCAST_ID
+from encoder_metrics import create_recorder
+from youtube_api import get_client
+
+STREAM_ID = "bench-stream"
+LIVE_CHAT_ID = "benchLiveChat"
+
+# Long enough that no cached API response expires during a run
+FOREVER = 10 ** 9
+
+def monitor_script():
+    from components.stream_monitor import render_stream_monitor
+    render_stream_monitor()
+
+def chat_script():
+    from components.chat_manager import render_chat_manager
+    render_chat_manager()
+
+def analytics_script():
+    from components.analytics_dashboard import render_analytics_dashboard
+    render_analytics_dashboard()
+
+def setup_script():
+    from components.stream_setup import render_stream_setup
+    from constants import RTMP_URL
+    render_stream_setup(RTMP_URL)
+
+TARGETS = {
+    "render_stream_monitor": monitor_script,
+    "render_chat_manager": chat_script,
+    "render_analytics_dashboard": analytics_script,
+    "render_stream_setup": setup_script
+}
+
+def synthetic_chat(count):
+    """Chat history with the mix of message types a busy stream sees"""
+    authors = [f"viewer{i}" for i in range(count // 10 or 1)]
+    messages = []
+    for i in range(count):
+        message = {
+            "id": f"msg{i}",
+            "author": random.choice(authors),
+            "message": f"Synthetic chat message number {i}",
+            "timestamp": (datetime(2026, 1, 1) + timedelta(seconds=i)).strftime("%H:%M:%S"),
+            "type": "regular"
+        }
+        if i % 50 == 0:
+            message.update(type="super_chat", amount="$5.00", currency="USD", amount_micros=5_000_000)
+        elif i % 97 == 0:
+            message["type"] = "membership"
+        messages.append(message)
+    return messages
+
+def seed_stream(hours, chat_messages):
+    """Fill the API cache, viewer series and encoder recorder of a long stream"""
+    seconds = int(hours * 3600)
+    client = get_client()
+
+    series = client.viewer_series(YOUTUBE_BROADCAST_ID)
+    viewers = 100
+    for i in range(seconds):
+        viewers = max(0, viewers + random.randint(-3, 3))
+        series.record(viewers, i // 20)
+
+    stats = {"viewers": viewers, "likes": seconds // 20, "comments": len(chat_messages), "live_chat_id": LIVE_CHAT_ID}
+    client.cache.put(("video", YOUTUBE_BROADCAST_ID), stats, FOREVER)
+
+    client._chat_state(LIVE_CHAT_ID)["messages"].extend(chat_messages)
+    client.cache.put(("chat", LIVE_CHAT_ID), 2.0, FOREVER)
+
+    recorder = create_recorder(STREAM_ID)
+    recorder.resolution = (1280, 720)
+    with recorder.lock:
+        for i in range(seconds):
+            recorder.add_sample(
+                i,
+                frames=i * 30,
+                dropped=i // 600,
+                fps=30 - random.random() * 0.5,
+                bitrate=2500 + random.uniform(-150, 150),
+                speed=1 + random.uniform(-0.02, 0.02)
+            )
+
+def add_api_latency(seconds):
+    """Delay every read of the shared API client by `seconds`"""
+    client = get_client()
+    for name in ("get_live_stats", "get_active_broadcast", "get_chat_messages"):
+        def delayed(*args, method=getattr(client, name), **kwargs):
+            time.sleep(seconds)
+            return method(*args, **kwargs)
+        setattr(client, name, delayed)
+
+def seed_session(app, chat_messages):
+    """Session state of a session that has been streaming for a while"""
+    app.session_state["streaming"] = True
+    app.session_state["stream_id"] = STREAM_ID
+    app.session_state["stream_key"] = "abcd-efgh-ijkl-mnop"
+    app.session_state["stream_start_time"] = datetime.now() - timedelta(hours=12)
+    app.session_state["stream_settings"] = {
+        "title": "Benchmark Stream",
+        "privacy": "Public",
+        "stream_preset": "720p30",
+        "enable_chat": True
+    }
+    app.session_state["chat_history"] = list(chat_messages)
+
+def walk(node):
+    """Yield every element below a block of the element tree"""
+    for child in node.children.values():
+        if isinstance(child, Block):
+            yield from walk(child)
+        else:
+            yield child
+
+def measure_tree(app):
+    """Element count and serialized size of everything the run produced"""
+    elements = list(walk(app._tree))
+    payload = sum(e.proto.ByteSize() for e in elements if hasattr(e.proto, "ByteSize"))
+    return len(elements), payload
+
+def bench(app, runs):
+    """First run and median rerun wall time of one AppTest"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        # Skips collecting widget state, which AppTest cannot do for
+        # selectboxes with a format_func; widgets keep their defaults
+        app._run()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    elements, payload = measure_tree(app)
+    return {
+        "first_ms": timings[0],
+        "rerun_ms": statistics.median(timings[1:]) if len(timings) > 1 else timings[0],
+        "elements": elements,
+        "payload_bytes": payload,
+        "exceptions": [str(e.value) for e in app.exception]
+    }
+
+def bench_app(runs, library_files, chat_messages):
+    """Full app script with a library directory holding many video files"""
+    library = tempfile.mkdtemp(prefix="bench-library-")
+    for i in range(library_files):
+        open(os.path.join(library, f"video_{i:04d}.mp4"), "wb").close()
+
+    cwd = os.getcwd()
+    os.chdir(library)
+    try:
+        app = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120)
+        seed_session(app, chat_messages)
+        return bench(app, runs)
+    finally:
+        os.chdir(cwd)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure rerun cost of the render functions")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--chat-messages", type=int, default=10_000)
+    parser.add_argument("--hours", type=float, default=12)
+    parser.add_argument("--library-files", type=int, default=500)
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS) + ["streamlit_app"], default=list(TARGETS) + ["streamlit_app"])
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="Delay added to every API read")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    random.seed(0)
+    chat_messages = synthetic_chat(args.chat_messages)
+    seed_stream(args.hours, chat_messages)
+    if args.api_latency_ms:
+        add_api_latency(args.api_latency_ms / 1000)
+
+    results = {}
+    for name in args.targets:
+        if name == "streamlit_app":
+            results[name] = bench_app(args.runs, args.library_files, chat_messages)
+            continue
+
+        app = AppTest.from_function(TARGETS[name], default_timeout=120)
+        seed_session(app, chat_messages)
+        results[name] = bench(app, args.runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'target':<28} {'first':>9} {'rerun':>9} {'elements':>9} {'payload':>11}")
+    for name, r in results.items():
+        print(f"{name:<28} {r['first_ms']:7.0f}ms {r['rerun_ms']:7.0f}ms {r['elements']:9d} {r['payload_bytes'] / 1024:9.1f}KB")
+        for error in r["exceptions"]:
+            print(f"    raised: {error}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Cold start benchmark: import time and first render of the dashboard
+
+Run from the repository root:
+
+    python benchmarks/bench_startup.py [--runs 5] [--json]
+
+Exits non-zero when the first render exceeds FIRST_RENDER_BUDGET_MS.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Time to first paint of the dashboard we commit to, in milliseconds
+FIRST_RENDER_BUDGET_MS = 1500
+
+# Modules imported on startup, in the order the app pulls them in
+STARTUP_MODULES = [
+    "streamlit",
+    "constants",
+    "streamlit_utils",
+    "stream_engine",
+    "components.stream_monitor",
+    "components.analytics_dashboard",
+    "components.chat_manager",
+    "components.stream_setup"
+]
+
+# Heavy dependencies that must not be loaded before a feature needs them
+DEFERRED_MODULES = ["plotly", "numpy", "googleapiclient", "cv2", "ffmpeg"]
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000}}))
+"""
+
+RENDER_PROBE = """
+import sys, time, json
+from streamlit.testing.v1 import AppTest
+# Streamlit itself may pull some of these in; only flag what the app adds
+baseline = [m for m in {deferred!r} if m in sys.modules]
+start = time.perf_counter()
+app = AppTest.from_file("streamlit_app.py", default_timeout=60).run()
+cold_ms = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+AppTest.from_file("streamlit_app.py", default_timeout=60).run()
+warm_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{
+    "cold_ms": cold_ms,
+    "warm_session_ms": warm_ms,
+    "exceptions": [str(e.value) for e in app.exception],
+    "loaded": [m for m in {deferred!r} if m in sys.modules and m not in baseline]
+}}))
+"""
+
+def run_probe(code):
+    """Run a probe in a fresh interpreter so every measurement is a cold start"""
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def measure_imports(runs):
+    """Median cold import time of each startup module"""
+    return {
+        module: statistics.median(run_probe(IMPORT_PROBE.format(module=module))["ms"] for _ in range(runs))
+        for module in STARTUP_MODULES
+    }
+
+def measure_first_render(runs):
+    """Median first render time in a fresh process and in a new session"""
+    samples = [run_probe(RENDER_PROBE.format(deferred=DEFERRED_MODULES)) for _ in range(runs)]
+    return {
+        "cold_ms": statistics.median(s["cold_ms"] for s in samples),
+        "warm_session_ms": statistics.median(s["warm_session_ms"] for s in samples),
+        "exceptions": samples[-1]["exceptions"],
+        "eagerly_loaded": samples[-1]["loaded"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = {
+        "imports_ms": measure_imports(args.runs),
+        "first_render": measure_first_render(args.runs),
+        "budget_ms": FIRST_RENDER_BUDGET_MS
+    }
+    within_budget = results["first_render"]["cold_ms"] <= FIRST_RENDER_BUDGET_MS
+    results["within_budget"] = within_budget
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, ms in results["imports_ms"].items():
+            print(f"import {module:<35} {ms:8.1f} ms")
+        render = results["first_render"]
+        print(f"first render (cold process)         {render['cold_ms']:8.1f} ms  (budget {FIRST_RENDER_BUDGET_MS} ms)")
+        print(f"first render (new session)          {render['warm_session_ms']:8.1f} ms")
+        if render["eagerly_loaded"]:
+            print(f"loaded before needed: {', '.join(render['eagerly_loaded'])}")
+        if render["exceptions"]:
+            print(f"render raised: {render['exceptions']}")
+
+    return 0 if within_budget else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
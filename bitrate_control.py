@@ -0,0 +1,201 @@
+import time
+import threading
+from constants import (
+    BITRATE_LADDER,
+    AUDIO_BITRATE,
+    ABR_DOWN_SPEED,
+    ABR_DOWN_SECONDS,
+    ABR_UP_SPEED,
+    ABR_UP_SECONDS,
+    ABR_GOP_SECONDS
+)
+from metrics import counter
+
+LADDER_CHANGES = counter("abr_ladder_changes_total", "Adaptive bitrate switches by direction")
+BELOW_REALTIME = counter("abr_below_realtime_seconds_total", "Seconds encoded slower than realtime")
+
+# Weight of the newest report in the smoothed speed and throughput
+SMOOTHING = 0.3
+
+# Reports right after a (re)start are not acted on while the encoder warms up
+SETTLE_SECONDS = 5
+
+# Smoothed speed under which stream time counts as below realtime
+REALTIME_SPEED = 0.99
+
+# Throughput has to clear a lower rung's bitrate by this factor to jump to it directly
+THROUGHPUT_MARGIN = 1.15
+
+# Longest wait before probing a higher rung, as a multiple of ABR_UP_SECONDS
+MAX_UP_HOLD_FACTOR = 16
+
+# Registry of controllers by stream id, next to the encoder recorders
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+def total_bitrate(rung):
+    """Video plus audio bitrate of a ladder rung, in kbit/s"""
+    return rung["video_bitrate"] + AUDIO_BITRATE
+
+def scale_filter(rung, is_shorts):
+    """Scale filter for a ladder rung, or None to keep the source size"""
+    height = rung["height"]
+    if is_shorts:
+        height = height or 720
+        # Vertical video: the rung height is the width, at 9:16
+        return f"scale={height}:{round(height * 16 / 9 / 2) * 2}"
+    if height is None:
+        return None
+    # Never upscale a source that is already smaller than the rung
+    return f"scale=-2:min({height}\\,ih)"
+
+class BitrateController:
+    """Steps an encode through the bitrate ladder based on its speed and output throughput"""
+
+    def __init__(self, stream_id, ladder=BITRATE_LADDER):
+        self.stream_id = stream_id
+        self.ladder = ladder
+        self.started_at = time.monotonic()
+
+        self.rung = 0
+        self.pending = None
+        self.switch_at = None
+        self.changes = []
+        self.seconds_below_realtime = 0.0
+        self.up_hold = ABR_UP_SECONDS
+
+        # Smoothed speed (multiple of realtime) and throughput (kbit/s)
+        self.speed = None
+        self.throughput = None
+
+        self._last = None
+        self._settle_until = self.started_at + SETTLE_SECONDS
+        self._slow_since = None
+        self._fast_since = None
+
+    @property
+    def current(self):
+        return self.ladder[self.rung]
+
+    def update(self, out_time, total_size, now=None, delivered=None):
+        """Feed one progress report; True once the encode should restart on the pending rung
+
+        With split publishing the encoder writes into memory and never feels
+        the uplink, so `delivered`, the media seconds and bytes the publisher
+        has sent so far, is measured instead; the cut still follows `out_time`.
+        """
+        now = time.monotonic() if now is None else now
+
+        if self.pending is not None:
+            return out_time >= self.switch_at
+
+        sent_time, sent_size = delivered if delivered is not None else (out_time, total_size)
+        last, self._last = self._last, (now, sent_time, sent_size)
+        # The first report, or one from a restarted process whose counters began again
+        if last is None or now <= last[0] or sent_time < last[1]:
+            return False
+
+        elapsed = now - last[0]
+        speed = max(0.0, sent_time - last[1]) / elapsed
+        throughput = max(0, sent_size - last[2]) * 8 / 1000 / elapsed
+        if self.speed is None:
+            self.speed, self.throughput = speed, throughput
+        else:
+            self.speed += SMOOTHING * (speed - self.speed)
+            self.throughput += SMOOTHING * (throughput - self.throughput)
+
+        if self.speed < REALTIME_SPEED:
+            self.seconds_below_realtime += elapsed
+            BELOW_REALTIME.inc(elapsed)
+
+        if now < self._settle_until:
+            return False
+
+        target = self.choose_rung(now)
+        if target is not None:
+            self.pending = target
+            # Cut over at the next keyframe of the fixed GOP grid
+            self.switch_at = (int(out_time // ABR_GOP_SECONDS) + 1) * ABR_GOP_SECONDS
+        return False
+
+    def choose_rung(self, now):
+        """Rung to switch to, with hysteresis on both directions, or None to stay"""
+        if self.speed < ABR_DOWN_SPEED:
+            self._fast_since = None
+            if self._slow_since is None:
+                self._slow_since = now
+            if now - self._slow_since >= ABR_DOWN_SECONDS and self.rung < len(self.ladder) - 1:
+                return self.rung_for_throughput()
+            return None
+
+        self._slow_since = None
+        if self.speed < ABR_UP_SPEED or self.rung == 0:
+            self._fast_since = None
+            return None
+
+        if self._fast_since is None:
+            self._fast_since = now
+        if now - self._fast_since >= self.up_hold:
+            return self.rung - 1
+        return None
+
+    def rung_for_throughput(self):
+        """Highest lower rung the measured throughput can carry, at least one step down"""
+        for rung in range(self.rung + 1, len(self.ladder)):
+            if total_bitrate(self.ladder[rung]) * THROUGHPUT_MARGIN <= self.throughput:
+                return rung
+        return len(self.ladder) - 1
+
+    def apply(self):
+        """Move to the pending rung once the encode restarted on it; returns the change"""
+        now = time.monotonic()
+        previous = self.rung
+        self.rung, self.pending, self.switch_at = self.pending, None, None
+        direction = "down" if self.rung > previous else "up"
+
+        # Falling back soon after stepping up means the probe failed; wait longer next time
+        if direction == "down" and self.changes:
+            last = self.changes[-1]
+            if last["direction"] == "up" and now - self.started_at - last["at"] < self.up_hold:
+                self.up_hold = min(self.up_hold * 2, ABR_UP_SECONDS * MAX_UP_HOLD_FACTOR)
+
+        change = {
+            "at": round(now - self.started_at, 1),
+            "from": self.ladder[previous]["name"],
+            "to": self.current["name"],
+            "direction": direction,
+            "speed": round(self.speed or 0, 2),
+            "throughput": round(self.throughput or 0)
+        }
+        self.changes.append(change)
+        LADDER_CHANGES.inc(direction=direction)
+
+        self._last = None
+        self._settle_until = now + SETTLE_SECONDS
+        self._slow_since = self._fast_since = None
+        return change
+
+    def summary(self):
+        """Ladder state and totals for the dashboard and the stream archive"""
+        return {
+            "rung": self.current["name"],
+            "ladder_changes": len(self.changes),
+            "seconds_below_realtime": round(self.seconds_below_realtime, 1)
+        }
+
+def create_controller(stream_id, ladder=BITRATE_LADDER):
+    """Create and register a fresh controller for a stream"""
+    controller = BitrateController(stream_id, ladder)
+    with _controllers_lock:
+        _controllers[stream_id] = controller
+    return controller
+
+def get_controller(stream_id):
+    """Look up the controller of a stream, if any"""
+    with _controllers_lock:
+        return _controllers.get(stream_id)
+
+def remove_controller(stream_id):
+    """Drop a finished stream's controller once its summary has been archived"""
+    with _controllers_lock:
+        _controllers.pop(stream_id, None)
@@ -0,0 +1,64 @@
+from constants import WEBGL_POINT_THRESHOLD, CHART_POINT_BUDGET
+from import_utils import lazy_import
+
+# Plotly is only loaded once a chart is first drawn
+go = lazy_import("plotly.graph_objects")
+
+def lttb_indices(values, budget):
+    """Pick the indices of a series to keep using Largest-Triangle-Three-Buckets"""
+    n = len(values)
+    if budget >= n or budget < 3:
+        return list(range(n))
+    
+    indices = [0]
+    bucket_size = (n - 2) / (budget - 2)
+    a = 0
+    
+    for i in range(budget - 2):
+        # Average point of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(values[next_start:next_end]) / (next_end - next_start)
+        
+        # Keep the point of this bucket forming the largest triangle
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = a, values[a]
+        best_index, best_area = start, -1
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (values[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best_index, best_area = j, area
+        
+        indices.append(best_index)
+        a = best_index
+    
+    indices.append(n - 1)
+    return indices
+
+def downsample(x, y, budget=CHART_POINT_BUDGET):
+    """Downsample a series to the point budget, keeping its visual shape"""
+    if len(y) <= budget:
+        return list(x), list(y)
+    
+    indices = lttb_indices(y, budget)
+    return [x[i] for i in indices], [y[i] for i in indices]
+
+def line_trace(x, y, **kwargs):
+    """Build a line trace, switching to downsampled WebGL for large series"""
+    if len(y) <= WEBGL_POINT_THRESHOLD:
+        return go.Scatter(x=x, y=y, **kwargs)
+    
+    x, y = downsample(x, y)
+    # Markers on thousands of points only add noise
+    if kwargs.get("mode") == "lines+markers":
+        kwargs["mode"] = "lines"
+    return go.Scattergl(x=x, y=y, **kwargs)
+
+def data_version(*series):
+    """Cheap version key for append-only series, used to memoize figures"""
+    return tuple(
+        (len(s), s[0], s[-1]) if len(s) else (0,)
+        for s in series
+    )
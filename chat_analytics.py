@@ -0,0 +1,193 @@
+import math
+import uuid
+import heapq
+import hashlib
+from collections import deque
+from datetime import datetime, timedelta
+from constants import CHAT_RATE_MINUTES, CHAT_TOP_CHATTERS_TRACKED
+
+# HyperLogLog registers, 2^12 of them: about 1.6% standard error in 4 KB
+HLL_PRECISION = 12
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+class HyperLogLog:
+    """Approximate count of distinct values in fixed memory"""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        # Position of the first set bit in the remaining bits
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / sum(2.0 ** -r for r in self.registers)
+        empty = self.registers.count(0)
+        if estimate <= 2.5 * m and empty:
+            # Few values so far; counting empty registers is more accurate
+            return round(m * math.log(m / empty))
+        return round(estimate)
+
+class SpaceSaving:
+    """The most frequent values of a stream, tracking at most `capacity` candidates
+
+    Counts are upper bounds that overestimate by at most the error kept with each.
+    """
+
+    def __init__(self, capacity=CHAT_TOP_CHATTERS_TRACKED):
+        self.capacity = capacity
+        self.counters = {}
+        # (count, value) pushed on every change; entries whose count moved on are skipped when evicting
+        self._heap = []
+
+    def add(self, value):
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += 1
+        elif len(self.counters) < self.capacity:
+            counter = self.counters[value] = [1, 0]
+        else:
+            # The new value takes over the smallest counter, inheriting its count as error
+            count = self._pop_smallest()
+            counter = self.counters[value] = [count + 1, count]
+        heapq.heappush(self._heap, (counter[0], value))
+
+        # Rebuild from the live counters once stale entries dominate
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, v) for v, (count, _) in self.counters.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_smallest(self):
+        """Remove the counter with the smallest count; returns that count"""
+        while True:
+            count, value = heapq.heappop(self._heap)
+            counter = self.counters.get(value)
+            if counter is not None and counter[0] == count:
+                del self.counters[value]
+                return count
+
+    def top(self, n):
+        """(value, count, error) of the `n` most frequent values"""
+        ranked = sorted(self.counters.items(), key=lambda item: -item[1][0])[:n]
+        return [(value, count, error) for value, (count, error) in ranked]
+
+class ChatAggregates:
+    """Chat statistics updated once per ingested message, read without scanning the history"""
+
+    def __init__(self):
+        # Distinguishes this session's aggregates in memoized figures
+        self.key = uuid.uuid4().hex
+        self.version = 0
+        self.total = 0
+        self.by_type = {}
+        self.chatters = HyperLogLog()
+        self.top_chatters = SpaceSaving()
+        self.super_chats = {}
+        # [minute, messages, membership events], oldest first
+        self.minutes = deque(maxlen=CHAT_RATE_MINUTES)
+
+    @classmethod
+    def from_messages(cls, messages):
+        """Aggregates of an existing history, built once when a session has none yet, timed by the messages' own clock"""
+        aggregates = cls()
+        now = datetime.now()
+        for message in messages:
+            aggregates.add(message, minute=message_minute(message, now))
+        return aggregates
+
+    def add(self, message, minute=None):
+        """Count one message, in the current minute unless given another"""
+        kind = message.get("type", "regular")
+        self.total += 1
+        self.version += 1
+        self.by_type[kind] = self.by_type.get(kind, 0) + 1
+
+        if kind != "owner_message":
+            author = message.get("channel_id") or message.get("author", "Anonymous")
+            self.chatters.add(author)
+            self.top_chatters.add(message.get("author", "Anonymous"))
+
+        if kind == "super_chat" and message.get("currency"):
+            totals = self.super_chats.setdefault(message["currency"], [0, 0])
+            totals[0] += 1
+            totals[1] += message.get("amount_micros", 0)
+
+        bucket = self._bucket(minute_of(datetime.now()) if minute is None else minute)
+        if bucket is not None:
+            bucket[1] += 1
+            if kind == "membership":
+                bucket[2] += 1
+
+    def _bucket(self, minute):
+        if self.minutes and self.minutes[-1][0] == minute:
+            return self.minutes[-1]
+        if not self.minutes or minute > self.minutes[-1][0]:
+            self.minutes.append([minute, 0, 0])
+            return self.minutes[-1]
+        # Polled messages can arrive slightly out of order; look back a little
+        for bucket in reversed(self.minutes):
+            if bucket[0] == minute:
+                return bucket
+            if bucket[0] < minute:
+                break
+        # Older than the window kept, or in a minute nobody chatted at the time
+        return None
+
+    def messages_per_minute(self, minutes=5, now=None):
+        """Average rate over the last `minutes` minutes"""
+        current = minute_of(now or datetime.now())
+        recent = sum(b[1] for b in reversed(self.minutes) if b[0] > current - minutes)
+        return recent / minutes
+
+    def rate_series(self):
+        """Per-minute times, message counts and membership events, with quiet minutes filled in"""
+        times, messages, memberships = [], [], []
+        previous = None
+        for minute, count, joined in self.minutes:
+            if previous is not None:
+                for gap in range(previous + 1, min(minute, previous + CHAT_RATE_MINUTES)):
+                    times.append(minute_time(gap))
+                    messages.append(0)
+                    memberships.append(0)
+            times.append(minute_time(minute))
+            messages.append(count)
+            memberships.append(joined)
+            previous = minute
+        return times, messages, memberships
+
+    def summary(self, top=10):
+        return {
+            "messages": self.total,
+            "by_type": dict(self.by_type),
+            "unique_chatters": self.chatters.count(),
+            "top_chatters": self.top_chatters.top(top),
+            "super_chats": {currency: {"count": c, "amount": micros / 1e6} for currency, (c, micros) in self.super_chats.items()},
+            "memberships": self.by_type.get("membership", 0)
+        }
+
+def minute_of(moment):
+    return int(moment.timestamp() // 60)
+
+def minute_time(minute):
+    return datetime.fromtimestamp(minute * 60)
+
+def message_minute(message, now=None):
+    """Minute a message was sent, from its HH:MM:SS time on the latest day that is not in the future"""
+    now = now or datetime.now()
+    try:
+        sent = datetime.strptime(message.get("timestamp", ""), "%H:%M:%S")
+    except ValueError:
+        return minute_of(now)
+    moment = now.replace(hour=sent.hour, minute=sent.minute, second=sent.second, microsecond=0)
+    if moment > now + timedelta(minutes=1):
+        moment -= timedelta(days=1)
+    return minute_of(moment)
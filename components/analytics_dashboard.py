@@ -1,17 +1,28 @@
 import streamlit as st
-import plotly.graph_objects as go
-from streamlit_utils import get_stream_analytics
+from datetime import datetime, timedelta
+from streamlit_utils import get_stream_analytics, session_chat_aggregates, EMPTY_ANALYTICS
+from data_access import fetch
+from chart_utils import line_trace, data_version
+from encoder_metrics import get_recorder, format_elapsed
+from bitrate_control import get_controller
+from history_store import HISTORY_COLUMNS, REDUCERS, load_catalog, catalog_version, aggregate, load_series
+from import_utils import lazy_import
+from metrics import timed
 
+# Plotly is only loaded once a chart is first drawn
+go = lazy_import("plotly.graph_objects")
+
+@timed("render_seconds", "Wall time of one render function", function="render_analytics_dashboard")
 def render_analytics_dashboard():
     """Render the analytics dashboard tab content"""
     
     st.header("Stream Analytics")
     
     # Tabs for different analysis views
-    tab1, tab2, tab3 = st.tabs(["Overview", "Audience", "Performance"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Overview", "Audience", "Performance", "History"])
     
-    # Get analytics data
-    analytics = get_stream_analytics()
+    # Get analytics data, or the last known analytics if the API is slow
+    analytics = fetch("stream_analytics", get_stream_analytics, default=EMPTY_ANALYTICS).result()
     
     with tab1:
         render_overview_tab(analytics)
@@ -21,6 +32,9 @@ def render_analytics_dashboard():
     
     with tab3:
         render_performance_tab(analytics)
+    
+    with tab4:
+        render_history_tab()
 
 def render_overview_tab(analytics):
     """Render the overview analytics tab"""
@@ -44,56 +58,19 @@ def render_overview_tab(analytics):
     st.markdown("### Viewer Trends")
     
     if analytics.get("times") and analytics.get("viewers") and analytics.get("likes"):
-        # Create a Plotly line chart for viewers and likes
-        fig = go.Figure()
-        
-        # Add viewers line
-        fig.add_trace(go.Scatter(
-            x=analytics["times"],
-            y=analytics["viewers"],
-            mode='lines+markers',
-            name='Viewers',
-            line=dict(color='#FF0000', width=3),
-        ))
-        
-        # Add likes line
-        fig.add_trace(go.Scatter(
-            x=analytics["times"],
-            y=analytics["likes"],
-            mode='lines+markers',
-            name='Likes',
-            line=dict(color='#4CAF50', width=3),
-        ))
-        
-        # Layout configuration
-        fig.update_layout(
-            height=400,
-            margin=dict(l=0, r=0, t=30, b=0),
-            xaxis_title="Time",
-            yaxis_title="Count",
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            )
+        fig = build_viewer_trends_figure(
+            data_version(analytics["times"], analytics["viewers"], analytics["likes"]),
+            analytics["times"],
+            analytics["viewers"],
+            analytics["likes"]
         )
         
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Start streaming to see analytics data")
     
+    render_chat_activity()
+    
     # Key moments
     st.markdown("### Key Moments")
     
@@ -147,6 +124,168 @@ def render_overview_tab(analytics):
     else:
         st.info("Start streaming to see key moments and recommendations")
 
+def render_chat_activity():
+    """Render chat rates, chatters and super chats from the session's chat aggregates"""
+    
+    st.markdown("### Chat Activity")
+    
+    aggregates = session_chat_aggregates()
+    if not aggregates.total:
+        st.info("Chat statistics appear here once messages arrive")
+        return
+    
+    summary = aggregates.summary()
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        render_metric_card("Messages / Min", f"{aggregates.messages_per_minute():.1f}")
+    
+    with col2:
+        render_metric_card("Unique Chatters", f"≈{summary['unique_chatters']:,}")
+    
+    with col3:
+        render_metric_card("Super Chats", sum(totals["count"] for totals in summary["super_chats"].values()))
+    
+    with col4:
+        render_metric_card("Memberships", summary["memberships"])
+    
+    fig = build_chat_rate_figure((aggregates.key, aggregates.version), aggregates)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        with st.container(border=True):
+            st.markdown("#### Top Chatters")
+            
+            top_chatters = summary["top_chatters"]
+            if top_chatters:
+                st.markdown("\n".join(
+                    f"{rank}. **{author}** — {count:,}" + (f" (±{error:,})" if error else "")
+                    for rank, (author, count, error) in enumerate(top_chatters, 1)
+                ))
+            else:
+                st.info("No viewer messages yet")
+    
+    with col2:
+        with st.container(border=True):
+            st.markdown("#### Super Chat Totals")
+            
+            if summary["super_chats"]:
+                st.markdown("\n".join(
+                    f"- **{currency}:** {totals['amount']:,.2f} from {totals['count']:,}"
+                    for currency, totals in sorted(summary["super_chats"].items(), key=lambda item: -item[1]["amount"])
+                ))
+            else:
+                st.info("No super chats yet")
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def build_chat_rate_figure(version, _aggregates):
+    """Build the per-minute chat messages and membership events figure, memoized on the aggregates' version"""
+    
+    times, messages, memberships = _aggregates.rate_series()
+    
+    fig = go.Figure()
+    
+    fig.add_trace(line_trace(
+        times,
+        messages,
+        mode='lines',
+        name='Messages / min',
+        line=dict(color='#4285F4', width=3),
+    ))
+    
+    fig.add_trace(go.Bar(
+        x=times,
+        y=memberships,
+        name='Memberships',
+        marker_color='#34A853',
+        yaxis='y2'
+    ))
+    
+    fig.update_layout(
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis_title="Time",
+        yaxis_title="Messages",
+        yaxis2=dict(
+            title="Memberships",
+            overlaying='y',
+            side='right'
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        )
+    )
+    
+    return fig
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def build_viewer_trends_figure(version, _times, _viewers, _likes):
+    """Build the viewers and likes trend figure, memoized on the data version"""
+    
+    fig = go.Figure()
+    
+    # Add viewers line
+    fig.add_trace(line_trace(
+        _times,
+        _viewers,
+        mode='lines+markers',
+        name='Viewers',
+        line=dict(color='#FF0000', width=3),
+    ))
+    
+    # Add likes line
+    fig.add_trace(line_trace(
+        _times,
+        _likes,
+        mode='lines+markers',
+        name='Likes',
+        line=dict(color='#4CAF50', width=3),
+    ))
+    
+    # Layout configuration
+    fig.update_layout(
+        height=400,
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis_title="Time",
+        yaxis_title="Count",
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
+        ),
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        )
+    )
+    
+    return fig
+
 def render_audience_tab(analytics):
     """Render the audience analytics tab"""
     
@@ -158,6 +297,46 @@ def render_audience_tab(analytics):
     # Device breakdown
     st.markdown("#### Viewing Devices")
     
+    fig = build_devices_figure()
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Traffic sources
+    st.markdown("#### Traffic Sources")
+    
+    col1, col2 = st.columns([2, 1])
+    
+    with col1:
+        fig = build_traffic_sources_figure()
+        
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        st.markdown("#### Top External Sources")
+        
+        # Sample external sources
+        external_sources = [
+            {"source": "Google Search", "percentage": "45%"},
+            {"source": "Twitter", "percentage": "25%"},
+            {"source": "Facebook", "percentage": "15%"},
+            {"source": "Reddit", "percentage": "10%"},
+            {"source": "Other", "percentage": "5%"}
+        ]
+        
+        for source in external_sources:
+            st.markdown(f"**{source['source']}**: {source['percentage']}")
+    
+    # Geographic distribution
+    st.markdown("#### Geographic Distribution")
+    
+    fig = build_locations_figure()
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_resource(show_spinner=False)
+def build_devices_figure():
+    """Build the viewing devices pie chart (static, built once per process)"""
+    
     # Sample device data
     devices = {
         "Mobile": 45,
@@ -187,10 +366,11 @@ def render_audience_tab(analytics):
         )
     )
     
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Traffic sources
-    st.markdown("#### Traffic Sources")
+    return fig
+
+@st.cache_resource(show_spinner=False)
+def build_traffic_sources_figure():
+    """Build the traffic sources bar chart (static, built once per process)"""
     
     # Sample traffic source data
     sources = {
@@ -201,48 +381,31 @@ def render_audience_tab(analytics):
         "Notifications": 10
     }
     
-    col1, col2 = st.columns([2, 1])
+    # Create a horizontal bar chart
+    fig = go.Figure(go.Bar(
+        x=list(sources.values()),
+        y=list(sources.keys()),
+        orientation='h',
+        marker_color=['#FF0000', '#4285F4', '#34A853', '#FBBC05', '#EA4335']
+    ))
     
-    with col1:
-        # Create a horizontal bar chart
-        fig = go.Figure(go.Bar(
-            x=list(sources.values()),
-            y=list(sources.keys()),
-            orientation='h',
-            marker_color=['#FF0000', '#4285F4', '#34A853', '#FBBC05', '#EA4335']
-        ))
-        
-        fig.update_layout(
-            height=300,
-            margin=dict(l=0, r=0, t=30, b=0),
-            xaxis_title="Percentage",
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            )
+    fig.update_layout(
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis_title="Percentage",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
-    
-    with col2:
-        st.markdown("#### Top External Sources")
-        
-        # Sample external sources
-        external_sources = [
-            {"source": "Google Search", "percentage": "45%"},
-            {"source": "Twitter", "percentage": "25%"},
-            {"source": "Facebook", "percentage": "15%"},
-            {"source": "Reddit", "percentage": "10%"},
-            {"source": "Other", "percentage": "5%"}
-        ]
-        
-        for source in external_sources:
-            st.markdown(f"**{source['source']}**: {source['percentage']}")
+    )
     
-    # Geographic distribution
-    st.markdown("#### Geographic Distribution")
+    return fig
+
+@st.cache_resource(show_spinner=False)
+def build_locations_figure():
+    """Build the geographic distribution bar chart (static, built once per process)"""
     
     # Sample location data
     locations = {
@@ -277,63 +440,67 @@ def render_audience_tab(analytics):
         )
     )
     
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def render_performance_tab(analytics):
-    """Render the performance analytics tab"""
-    
-    st.markdown("### Stream Performance")
-    
-    # Stream health over time
-    st.markdown("#### Stream Health Metrics")
-    
-    # Sample health metrics over time
-    times = analytics.get("times", [])
-    if not times:
-        st.info("Start streaming to see performance metrics")
-        return
-    
-    # Generate some mock health metrics
-    health_metrics = {
-        "Resolution": [1080 if random.random() > 0.1 else 720 for _ in range(len(times))],
-        "FPS": [60 if random.random() > 0.05 else int(60 * random.random() * 0.9) for _ in range(len(times))],
-        "Bitrate (Mbps)": [5 + random.random() * 2 for _ in range(len(times))],
-        "Buffer Health (%)": [95 + random.random() * 5 for _ in range(len(times))]
-    }
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        # Resolution and FPS
-        fig = go.Figure()
-        
-        # Add Resolution line
-        fig.add_trace(go.Scatter(
-            x=times,
-            y=health_metrics["Resolution"],
-            mode='lines',
-            name='Resolution',
-            line=dict(color='#4285F4', width=3),
-        ))
-        
-        # Add second y-axis for FPS
-        fig.add_trace(go.Scatter(
-            x=times,
-            y=health_metrics["FPS"],
-            mode='lines',
-            name='FPS',
-            line=dict(color='#34A853', width=3),
-            yaxis='y2'
-        ))
-        
-        # Layout with dual y-axes
+@st.cache_resource(max_entries=32, show_spinner=False)
+def build_encoder_figures(version, _recorder):
+    """Build the encoder metric figures, memoized on the recorder's sample count"""
+    
+    series = _recorder.snapshot()
+    times = series["times"]
+    
+    # Resolution and FPS
+    resolution_fig = go.Figure()
+    
+    resolution_fig.add_trace(line_trace(
+        times,
+        series["height"],
+        mode='lines',
+        name='Resolution',
+        line=dict(color='#4285F4', width=3),
+    ))
+    
+    resolution_fig.add_trace(line_trace(
+        times,
+        series["fps"],
+        mode='lines',
+        name='FPS',
+        line=dict(color='#34A853', width=3),
+        yaxis='y2'
+    ))
+    
+    # Bitrate and encode speed
+    bitrate_fig = go.Figure()
+    
+    bitrate_fig.add_trace(line_trace(
+        times,
+        series["bitrate_mbps"],
+        mode='lines',
+        name='Bitrate',
+        line=dict(color='#FBBC05', width=3),
+    ))
+    
+    bitrate_fig.add_trace(line_trace(
+        times,
+        series["speed"],
+        mode='lines',
+        name='Speed',
+        line=dict(color='#EA4335', width=3),
+        yaxis='y2'
+    ))
+    
+    # Layout with dual y-axes
+    for fig, y_title, y2_title in (
+        (resolution_fig, "Resolution (p)", "FPS"),
+        (bitrate_fig, "Bitrate (Mbps)", "Speed (x realtime)")
+    ):
         fig.update_layout(
             height=300,
             margin=dict(l=0, r=0, t=30, b=0),
             xaxis_title="Time",
-            yaxis_title="Resolution (p)",
+            yaxis_title=y_title,
             yaxis2=dict(
-                title="FPS",
+                title=y2_title,
                 overlaying='y',
                 side='right'
             ),
@@ -355,93 +522,76 @@ def render_performance_tab(analytics):
                 gridcolor='rgba(0,0,0,0.1)'
             )
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
+    
+    return resolution_fig, bitrate_fig
+
+def render_performance_tab(analytics):
+    """Render the performance analytics tab"""
+    
+    st.markdown("### Stream Performance")
+    
+    # Stream health over time
+    st.markdown("#### Stream Health Metrics")
+    
+    # Per-second samples recorded from the encoder's progress output
+    recorder = get_recorder(st.session_state.get("stream_id"))
+    if recorder is None or not recorder.version:
+        st.info("Start streaming to see performance metrics")
+        return
+    
+    resolution_fig, bitrate_fig = build_encoder_figures(
+        (recorder.stream_id, recorder.version),
+        recorder
+    )
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.plotly_chart(resolution_fig, use_container_width=True)
     
     with col2:
-        # Bitrate and Buffer Health
-        fig = go.Figure()
-        
-        # Add Bitrate line
-        fig.add_trace(go.Scatter(
-            x=times,
-            y=health_metrics["Bitrate (Mbps)"],
-            mode='lines',
-            name='Bitrate',
-            line=dict(color='#FBBC05', width=3),
-        ))
-        
-        # Add second y-axis for Buffer Health
-        fig.add_trace(go.Scatter(
-            x=times,
-            y=health_metrics["Buffer Health (%)"],
-            mode='lines',
-            name='Buffer Health',
-            line=dict(color='#EA4335', width=3),
-            yaxis='y2'
-        ))
-        
-        # Layout with dual y-axes
-        fig.update_layout(
-            height=300,
-            margin=dict(l=0, r=0, t=30, b=0),
-            xaxis_title="Time",
-            yaxis_title="Bitrate (Mbps)",
-            yaxis2=dict(
-                title="Buffer Health (%)",
-                overlaying='y',
-                side='right'
-            ),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="right",
-                x=1
-            ),
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(bitrate_fig, use_container_width=True)
     
-    # Playback performance
-    st.markdown("#### Playback Performance")
+    # Encoder performance
+    st.markdown("#### Encoder Performance")
     
-    # Sample playback metrics
-    playback_metrics = {
-        "Average Watch Time": "8:45",
-        "Play Rate": "92%",
-        "Buffering Ratio": "1.2%",
-        "Average Resolution": "1080p"
-    }
+    summary = recorder.summary()
+    resolution = summary["resolution"]
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        render_metric_card("Avg. Watch Time", playback_metrics["Average Watch Time"])
+        render_metric_card("Avg. FPS", f"{summary['avg_fps']:.1f}")
     
     with col2:
-        render_metric_card("Play Rate", playback_metrics["Play Rate"])
+        render_metric_card("Avg. Bitrate", f"{summary['avg_bitrate_mbps']:.2f} Mbps")
     
     with col3:
-        render_metric_card("Buffering Ratio", playback_metrics["Buffering Ratio"])
+        render_metric_card("Dropped Frames", summary["dropped_frames"])
     
     with col4:
-        render_metric_card("Avg. Resolution", playback_metrics["Average Resolution"])
+        render_metric_card("Resolution", f"{resolution[0]}x{resolution[1]}" if resolution else "Unknown")
+    
+    # Adaptive bitrate ladder, when the stream uses it
+    controller = get_controller(recorder.stream_id)
+    if controller is not None:
+        ladder = controller.summary()
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            render_metric_card("Ladder Rung", ladder["rung"])
+        
+        with col2:
+            render_metric_card("Ladder Changes", ladder["ladder_changes"])
+        
+        with col3:
+            render_metric_card("Below Realtime", format_elapsed(ladder["seconds_below_realtime"]))
     
     # Stream stability score
     st.markdown("#### Stream Stability Score")
     
-    stability_score = 92  # Sample score out of 100
+    stability_score = recorder.stability.value
     
     # Determine color based on score
     if stability_score > 90:
@@ -500,8 +650,8 @@ def render_performance_tab(analytics):
                 
                 **Strengths:**
                 - Consistent resolution and bitrate
-                - Low buffering ratio
-                - High play rate
+                - Few dropped frames
+                - Encoding keeps up with realtime
             """)
         elif stability_score > 60:
             st.warning("""
@@ -523,6 +673,125 @@ def render_performance_tab(analytics):
                 - Consider using a wired connection
             """)
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_aggregate(column, reducer, version):
+    """Cross-stream aggregation, memoized until the catalog changes"""
+    return [
+        (entry["id"], entry.get("title", entry["id"]), entry["started_at"], value)
+        for entry, value in aggregate(column, reducer)
+    ]
+
+def render_history_tab():
+    """Render the cross-stream history tab"""
+    
+    st.markdown("### Stream History")
+    
+    catalog = load_catalog()
+    if not catalog:
+        st.info("Finished streams will appear here for comparison")
+        return
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        column = st.selectbox(
+            "Metric",
+            options=HISTORY_COLUMNS,
+            format_func=lambda c: c.replace("_", " ").title()
+        )
+    
+    with col2:
+        reducer = st.selectbox("Aggregate", options=list(REDUCERS.keys()), index=1)
+    
+    results = cached_aggregate(column, reducer, catalog_version())
+    if not results:
+        st.info("No archived stream recorded this metric yet")
+        return
+    
+    # This week against last week
+    now = datetime.now()
+    week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    last_week_start = week_start - timedelta(days=7)
+    
+    this_week = [v for _, _, started, v in results if datetime.fromisoformat(started) >= week_start]
+    last_week = [v for _, _, started, v in results if last_week_start <= datetime.fromisoformat(started) < week_start]
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        render_metric_card("Archived Streams", len(catalog))
+    
+    with col2:
+        render_metric_card("This Week (avg)", f"{sum(this_week) / len(this_week):.1f}" if this_week else "-")
+    
+    with col3:
+        render_metric_card("Last Week (avg)", f"{sum(last_week) / len(last_week):.1f}" if last_week else "-")
+    
+    # Per-stream comparison, oldest first
+    fig = go.Figure(go.Bar(
+        x=[started for _, _, started, _ in reversed(results)],
+        y=[value for _, _, _, value in reversed(results)],
+        hovertext=[title for _, title, _, _ in reversed(results)],
+        marker_color='#FF0000'
+    ))
+    
+    fig.update_layout(
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis_title="Stream start",
+        yaxis_title=f"{reducer} {column}",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        )
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Single stream drill-down
+    st.markdown("#### Stream Detail")
+    
+    entries = {entry["id"]: entry for entry in catalog}
+    stream_id = st.selectbox(
+        "Stream",
+        options=list(entries.keys()),
+        format_func=lambda i: f"{entries[i].get('title', i)} ({entries[i]['started_at']})"
+    )
+    
+    seconds, values = load_series(stream_id, column)
+    if values is None:
+        st.info("This stream did not record the selected metric")
+        return
+    
+    fig = go.Figure()
+    fig.add_trace(line_trace(
+        [format_elapsed(s) for s in seconds],
+        values.tolist(),
+        mode='lines',
+        name=column,
+        line=dict(color='#4285F4', width=2)
+    ))
+    
+    fig.update_layout(
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis_title="Time",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        )
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+
 def render_metric_card(title, value):
     """Render a metric card for analytics"""
     
@@ -1,10 +1,15 @@
 import streamlit as st
 import random
 import time
-from datetime import datetime
-from streamlit_utils import get_live_chat_messages, send_chat_message
+from streamlit_utils import get_live_chat_messages, send_chat_message, add_chat_message
+from data_access import fetch
 from constants import CHAT_MESSAGE_TYPES, MODERATION_ACTIONS
+from metrics import timed, timer, counter
 
+CHAT_INGESTED = counter("chat_messages_ingested_total", "Chat messages added to a session's history")
+CHAT_DEDUP_RUNS = counter("chat_dedup_runs_total", "Passes deduplicating fetched chat against the history")
+
+@timed("render_seconds", "Wall time of one render function", function="render_chat_manager")
 def render_chat_manager():
     """Render the live chat manager tab content"""
     
@@ -29,6 +34,9 @@ def render_chat_manager():
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
     
+    # Started now and collected below, so the API call overlaps rendering the settings
+    chat_fetch = fetch("live_chat", get_live_chat_messages, default=[]) if st.session_state.streaming else None
+    
     # Moderation Settings
     with st.expander("Chat Moderation Settings", expanded=False):
         col1, col2 = st.columns(2)
@@ -51,11 +59,14 @@ def render_chat_manager():
         
         # Get the latest chat messages
         if st.session_state.streaming:
-            new_messages = get_live_chat_messages()
-            # Add new messages to history
-            for msg in new_messages:
-                if msg not in st.session_state.chat_history:
-                    st.session_state.chat_history.append(msg)
+            with timer("chat_ingest_seconds", "Time to fetch and merge new chat messages"):
+                new_messages = chat_fetch.result()
+                history_size = len(st.session_state.chat_history)
+                # Add new messages to history; messages seen before are skipped by id
+                CHAT_DEDUP_RUNS.inc()
+                for msg in new_messages:
+                    add_chat_message(msg)
+                CHAT_INGESTED.inc(len(st.session_state.chat_history) - history_size)
         
         # Display chat container
         with st.container(height=400, border=True):
@@ -76,12 +87,12 @@ def render_chat_manager():
         if st.session_state.streaming:
             with st.form("chat_form", clear_on_submit=True):
                 chat_input = st.text_input("Type your message", key="chat_input", max_chars=200)
-                col1, col2 = st.columns([1, 4])
+                form_col1, form_col2 = st.columns([1, 4])
                 
-                with col1:
+                with form_col1:
                     submit = st.form_submit_button("Send", use_container_width=True)
                 
-                with col2:
+                with form_col2:
                     st.markdown("""
                         <style>
                             .streaming-tag {
@@ -108,18 +119,11 @@ def render_chat_manager():
                 
                 if submit and chat_input:
                     with st.spinner("Sending message..."):
-                        success = send_chat_message(chat_input)
+                        sent = send_chat_message(chat_input)
                         
-                        if success:
-                            # Add the message to our history
-                            new_msg = {
-                                "id": f"owner_msg_{int(time.time())}",
-                                "author": "You (Channel Owner)",
-                                "message": chat_input,
-                                "timestamp": datetime.now().strftime("%H:%M:%S"),
-                                "type": "owner_message"
-                            }
-                            st.session_state.chat_history.append(new_msg)
+                        if sent:
+                            # Added under its API id, so the copy polling returns is recognized
+                            add_chat_message(sent)
                             st.experimental_rerun()
                         else:
                             st.error("Failed to send message. Please try again.")
@@ -144,18 +148,11 @@ def render_chat_manager():
             if st.button(msg, key=f"quick_{msg}", use_container_width=True):
                 if st.session_state.streaming:
                     with st.spinner("Sending message..."):
-                        success = send_chat_message(msg)
+                        sent = send_chat_message(msg)
                         
-                        if success:
-                            # Add the message to our history
-                            new_msg = {
-                                "id": f"quick_msg_{int(time.time())}",
-                                "author": "You (Channel Owner)",
-                                "message": msg,
-                                "timestamp": datetime.now().strftime("%H:%M:%S"),
-                                "type": "owner_message"
-                            }
-                            st.session_state.chat_history.append(new_msg)
+                        if sent:
+                            # Added under its API id, so the copy polling returns is recognized
+                            add_chat_message(sent)
                             st.experimental_rerun()
                 else:
                     st.warning("Start streaming to send messages.")
@@ -0,0 +1,52 @@
+import os
+import streamlit as st
+from prep_farm import PRIORITY_INTERACTIVE
+from stream_prep import cached_manifest
+from video_library import list_videos
+from metrics import timed
+
+STATUS_ICONS = {
+    "queued": "🕒",
+    "running": "⚙️",
+    "done": "✅",
+    "failed": "❌",
+    "cancelled": "🚫"
+}
+
+# Jobs listed below the summary; the rest are only counted
+JOBS_SHOWN = 20
+
+@timed("render_seconds", "Wall time of one render function", function="render_library_prep")
+def render_library_prep(farm, video_path):
+    """Render the selected video's poster, the batch prepare button and the farm's job queue"""
+    if video_path:
+        # Whatever is queued for the selected file runs next
+        farm.prioritize(video_path, PRIORITY_INTERACTIVE)
+        manifest = cached_manifest(video_path)
+        if manifest and manifest["outputs"].get("poster"):
+            st.image(manifest["outputs"]["poster"], caption=os.path.basename(video_path), width=320)
+
+    videos = list_videos()
+    if st.button(f"Prepare Library ({len(videos)} videos)", disabled=not videos, use_container_width=True):
+        for path in videos:
+            farm.submit(path)
+        st.success(f"Queued {len(videos)} videos on {farm.workers} workers")
+
+    summary = farm.summary()
+    if not summary:
+        st.caption("Nothing prepared in this session yet.")
+        return
+
+    st.caption(", ".join(f"{STATUS_ICONS.get(status, '')} {count} {status}" for status, count in sorted(summary.items())))
+    for job in farm.jobs()[:JOBS_SHOWN]:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            label = f"{STATUS_ICONS.get(job['status'], '')} {os.path.basename(job['video_path'])}"
+            if job["status"] == "running":
+                st.progress(job["progress"], text=f"{label}: {job['task'] or 'starting'}")
+            else:
+                st.write(label + (f": {job['error']}" if job["error"] and job["status"] == "failed" else ""))
+        with col2:
+            if job["status"] in ("queued", "running") and st.button("Cancel", key=f"cancel_prep_{job['id']}"):
+                farm.cancel(job["id"])
+                st.experimental_rerun()
@@ -0,0 +1,102 @@
+import json
+import streamlit.components.v1 as components
+from constants import LIVE_EVENTS_URL, CHAT_MESSAGE_TYPES
+from live_events import YOUTUBE_CHANNEL, stream_channel
+
+# Points kept per live chart, about ten minutes at one sample a second
+LIVE_CHART_POINTS = 600
+
+# Subscribes to the live events server and patches the page in place: counters
+# are rewritten, charts grow with Plotly.extendTraces and chat is appended, so
+# nothing reruns on the Streamlit side while the panel is open.
+LIVE_PANEL_HTML = """
+<div style="font-family: sans-serif;">
+  <div style="display: flex; gap: 12px; margin-bottom: 8px;">
+    __COUNTERS__
+  </div>
+  <div style="display: flex; gap: 12px;">
+    <div id="viewers-chart" style="flex: 1; height: 220px;"></div>
+    <div id="encoder-chart" style="flex: 1; height: 220px;"></div>
+  </div>
+  <div id="chat" style="height: 150px; overflow-y: auto; font-size: 13px; border-top: 1px solid #ddd; margin-top: 8px;"></div>
+  <div id="connection" style="font-size: 11px; color: #999;"></div>
+</div>
+<script src="__URL__/plotly.min.js"></script>
+<script>
+const config = __CONFIG__;
+const layout = (title, yTitle) => ({
+  title: {text: title, font: {size: 13}}, margin: {l: 40, r: 10, t: 30, b: 30},
+  xaxis: {type: "date"}, yaxis: {title: yTitle}, showlegend: false
+});
+const toDate = (t) => new Date(t * 1000);
+const setCounter = (name, text) => { const el = document.getElementById(name); if (el) el.textContent = text; };
+
+Plotly.newPlot("viewers-chart", [{x: config.viewers.times.map(toDate), y: config.viewers.values, mode: "lines", line: {color: "#ff0000"}}],
+  layout("Viewers", ""), {displayModeBar: false, responsive: true});
+Plotly.newPlot("encoder-chart", [{x: [], y: [], mode: "lines", name: "speed", line: {color: "#1f77b4"}}],
+  layout("Encode speed", "x realtime"), {displayModeBar: false, responsive: true});
+
+function addChat(messages) {
+  const chat = document.getElementById("chat");
+  for (const m of messages) {
+    const line = document.createElement("div");
+    const label = config.chatLabels[m.type] || "";
+    line.textContent = `${m.timestamp} ${m.author}${m.type !== "regular" ? " [" + label + "]" : ""}: ${m.message}`;
+    chat.appendChild(line);
+  }
+  while (chat.childNodes.length > 100) chat.removeChild(chat.firstChild);
+  chat.scrollTop = chat.scrollHeight;
+}
+
+const source = new EventSource(`${config.url}/events?channels=${encodeURIComponent(config.channels.join(","))}`);
+source.onopen = () => setCounter("connection", "Live");
+source.onerror = () => setCounter("connection", "Reconnecting...");
+source.onmessage = (message) => {
+  const event = JSON.parse(message.data);
+  if (event.type === "stats") {
+    setCounter("viewers", event.viewers.toLocaleString());
+    setCounter("likes", event.likes.toLocaleString());
+    Plotly.extendTraces("viewers-chart", {x: [[toDate(event.t)]], y: [[event.viewers]]}, [0], config.maxPoints);
+  } else if (event.type === "encoder") {
+    setCounter("fps", event.fps.toFixed(1));
+    setCounter("bitrate", `${Math.round(event.bitrate)} kbit/s`);
+    setCounter("speed", `${event.speed.toFixed(2)}x`);
+    Plotly.extendTraces("encoder-chart", {x: [[toDate(event.t)]], y: [[event.speed]]}, [0], config.maxPoints);
+  } else if (event.type === "chat") {
+    addChat(event.messages);
+  }
+};
+</script>
+"""
+
+COUNTER_HTML = """
+<div style="flex: 1; border: 1px solid #ddd; border-radius: 6px; padding: 6px; text-align: center;">
+  <div id="{id}" style="font-size: 1.6rem; font-weight: bold;">{value}</div>
+  <div style="font-size: 12px; color: #666;">{label}</div>
+</div>
+"""
+
+def render_live_panel(stream_id, analytics, url=LIVE_EVENTS_URL):
+    """Render counters, charts and chat that update in place from the live events server"""
+    counters = [
+        ("viewers", "Viewers", f"{analytics['viewers'][-1]:,}" if analytics.get("viewers") else "-"),
+        ("likes", "Likes", f"{analytics.get('total_likes', 0):,}"),
+        ("fps", "FPS", "-"),
+        ("bitrate", "Bitrate", "-"),
+        ("speed", "Speed", "-")
+    ]
+    config = {
+        "url": url,
+        "channels": [YOUTUBE_CHANNEL] + ([stream_channel(stream_id)] if stream_id else []),
+        "maxPoints": LIVE_CHART_POINTS,
+        "chatLabels": CHAT_MESSAGE_TYPES,
+        # The server only pushes changes, so the page starts from the last render's data
+        "viewers": {
+            "times": list(analytics.get("epochs", []))[-LIVE_CHART_POINTS:],
+            "values": list(analytics.get("viewers", []))[-LIVE_CHART_POINTS:]
+        }
+    }
+
+    html = LIVE_PANEL_HTML.replace("__COUNTERS__", "".join(COUNTER_HTML.format(id=i, label=label, value=value) for i, label, value in counters))
+    html = html.replace("__URL__", url).replace("__CONFIG__", json.dumps(config))
+    components.html(html, height=480)
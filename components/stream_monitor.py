@@ -1,9 +1,19 @@
 import streamlit as st
 import time
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from streamlit_utils import get_stream_health, get_stream_analytics
+from streamlit_utils import get_stream_health, get_stream_analytics, EMPTY_ANALYTICS
+from data_access import fetch
+from chart_utils import line_trace, data_version
+from import_utils import lazy_import
+from live_events import start_live_server
+from components.live_panel import render_live_panel
+from resource_governor import get_governor
+from metrics import timed
 
+# Plotly is only loaded once a chart is first drawn
+go = lazy_import("plotly.graph_objects")
+
+@timed("render_seconds", "Wall time of one render function", function="render_stream_monitor")
 def render_stream_monitor():
     """Render the stream monitor tab content"""
     
@@ -16,8 +26,11 @@ def render_stream_monitor():
     # Stream Health and Stats section
     col1, col2, col3 = st.columns(3)
     
-    stream_health = get_stream_health()
-    analytics = get_stream_analytics()
+    # Fetched side by side, so the slowest one bounds the wait rather than their sum
+    health_fetch = fetch("stream_health", get_stream_health, st.session_state.streaming, default={"status": "offline", "health": 0})
+    analytics_fetch = fetch("stream_analytics", get_stream_analytics, default=EMPTY_ANALYTICS)
+    stream_health = health_fetch.result()
+    analytics = analytics_fetch.result()
     
     with col1:
         render_health_card(stream_health)
@@ -50,76 +63,17 @@ def render_stream_monitor():
     st.markdown("### Viewer Trend")
     
     if analytics.get("times") and analytics.get("viewers"):
-        # Create a Plotly line chart for viewers
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=analytics["times"],
-            y=analytics["viewers"],
-            mode='lines+markers',
-            name='Viewers',
-            line=dict(color='#FF0000', width=3),
-            fill='tozeroy',
-            fillcolor='rgba(255, 0, 0, 0.1)'
-        ))
-        
-        # Layout configuration
-        fig.update_layout(
-            height=300,
-            margin=dict(l=0, r=0, t=30, b=0),
-            xaxis_title="Time",
-            yaxis_title="Viewers",
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            )
+        fig = build_viewer_trend_figure(
+            data_version(analytics["times"], analytics["viewers"]),
+            analytics["times"],
+            analytics["viewers"]
         )
         
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Start streaming to see viewer trends")
         
-        # Create a placeholder chart
-        fig = go.Figure()
-        
-        # Create some sample data
-        x = [f"{i:02d}:00" for i in range(24)]
-        y = [0 for _ in range(24)]
-        
-        fig.add_trace(go.Scatter(
-            x=x,
-            y=y,
-            mode='lines',
-            line=dict(color='#e0e0e0', width=2),
-            fill='tozeroy',
-            fillcolor='rgba(224, 224, 224, 0.1)'
-        ))
-        
-        # Layout configuration
-        fig.update_layout(
-            height=300,
-            margin=dict(l=0, r=0, t=30, b=0),
-            xaxis_title="Time",
-            yaxis_title="Viewers",
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            xaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            ),
-            yaxis=dict(
-                showgrid=True,
-                gridcolor='rgba(0,0,0,0.1)'
-            )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(build_placeholder_trend_figure(), use_container_width=True)
     
     # Technical Info Section
     st.markdown("### Technical Stream Info")
@@ -155,23 +109,17 @@ def render_stream_monitor():
                 st.markdown("#### Server Information")
                 st.markdown("*Stream not active*")
     
-    # Auto-refresh section
-    st.markdown("### Auto-refresh")
-    auto_refresh = st.checkbox("Enable auto-refresh (10 seconds)", value=True)
+    render_host_resources(get_governor())
     
-    if auto_refresh and st.session_state.streaming:
-        # Add a progress bar that resets every 10 seconds
-        progress_bar = st.progress(0)
-        
-        # This would normally be implemented with JavaScript, but in Streamlit we can't do that
-        # In a real app, we'd use a periodic callback or JavaScript for this
-        for i in range(10):
-            # Update progress bar
-            progress_bar.progress((i+1)/10)
-            time.sleep(1)
-            
-        # Uncomment below in a real app to trigger page refresh
-        # st.experimental_rerun()
+    # Live updates are pushed into the page, so nothing reruns while it is open
+    st.markdown("### Live Updates")
+    live_updates = st.checkbox("Enable live updates", value=True)
+    
+    if live_updates and st.session_state.streaming:
+        if start_live_server() is not None:
+            render_live_panel(st.session_state.get("stream_id"), analytics)
+        else:
+            st.warning("The live events server could not start; is its port already in use?")
     
     # End streaming button
     if st.session_state.streaming:
@@ -183,6 +131,84 @@ def render_stream_monitor():
                 st.success("Stream ended successfully")
                 st.experimental_rerun()
 
+def render_host_resources(governor):
+    """Render the host budget and where each running stream was placed"""
+    
+    st.markdown("### Host Resources")
+    status = governor.status()
+    st.caption(
+        f"{status['used']:g} of {status['budget']:g} encode units in use on cores {status['cores']}"
+        + (f"; cores {status['reserved']} reserved for the app" if status["reserved"] else "")
+    )
+    for p in status["streams"]:
+        speed = f"{p['speed']:.2f}x" if p["speed"] is not None else "-"
+        margin = f"{p['margin']:+.2f}x" if p["margin"] is not None else "-"
+        st.markdown(
+            f"**{p['stream_id']}**: cores {p['cores']}, {p['threads'] or 'default'} threads, "
+            f"nice {p['nice']}, speed {speed}, margin {margin}"
+        )
+
+def apply_trend_layout(fig):
+    """Apply the shared layout of the viewer trend charts"""
+    
+    fig.update_layout(
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0),
+        xaxis_title="Time",
+        yaxis_title="Viewers",
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        xaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        ),
+        yaxis=dict(
+            showgrid=True,
+            gridcolor='rgba(0,0,0,0.1)'
+        )
+    )
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def build_viewer_trend_figure(version, _times, _viewers):
+    """Build the live viewer trend figure, memoized on the data version"""
+    
+    fig = go.Figure()
+    
+    fig.add_trace(line_trace(
+        _times,
+        _viewers,
+        mode='lines+markers',
+        name='Viewers',
+        line=dict(color='#FF0000', width=3),
+        fill='tozeroy',
+        fillcolor='rgba(255, 0, 0, 0.1)'
+    ))
+    
+    apply_trend_layout(fig)
+    return fig
+
+@st.cache_resource(show_spinner=False)
+def build_placeholder_trend_figure():
+    """Build the empty trend chart shown while offline (static, built once per process)"""
+    
+    fig = go.Figure()
+    
+    # Create some sample data
+    x = [f"{i:02d}:00" for i in range(24)]
+    y = [0 for _ in range(24)]
+    
+    fig.add_trace(go.Scatter(
+        x=x,
+        y=y,
+        mode='lines',
+        line=dict(color='#e0e0e0', width=2),
+        fill='tozeroy',
+        fillcolor='rgba(224, 224, 224, 0.1)'
+    ))
+    
+    apply_trend_layout(fig)
+    return fig
+
 def render_health_card(health_data):
     """Render a health status card"""
     
@@ -0,0 +1,72 @@
+import streamlit as st
+from datetime import datetime, timedelta
+from scheduler import ACTIVE_STATUSES, format_time
+from metrics import timed
+
+STATUS_ICONS = {
+    "scheduled": "🕒",
+    "preparing": "⚙️",
+    "ready": "✅",
+    "running": "🔴",
+    "done": "✔️",
+    "failed": "❌",
+    "cancelled": "🚫",
+    "skipped": "⏭️"
+}
+
+@timed("render_seconds", "Wall time of one render function", function="render_stream_scheduler")
+def render_stream_scheduler(scheduler, video_path, stream_key, options):
+    """Render the scheduling form and job queue for the current stream settings"""
+
+    if scheduler.last_error:
+        st.warning(scheduler.last_error)
+
+    next_hour = (datetime.now() + timedelta(hours=1)).replace(minute=0, second=0, microsecond=0)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start_date = st.date_input("Start date", value=next_hour.date())
+    with col2:
+        start_time = st.time_input("Start time", value=next_hour.time())
+    with col3:
+        duration = st.number_input("Duration (minutes, 0 to run until the video ends)", min_value=0, value=60)
+
+    transcode = st.checkbox(
+        "Transcode ahead of time",
+        value=True,
+        help="Encodes the video before its slot, so the stream only copies it out and costs little CPU"
+    )
+
+    if st.button("Schedule Stream", use_container_width=True):
+        if not video_path or not stream_key:
+            st.error("A video file and stream key are required to schedule a stream!")
+        else:
+            start_at = datetime.combine(start_date, start_time).timestamp()
+            stop_at = start_at + duration * 60 if duration else None
+            job_id = scheduler.store.add(video_path, stream_key, start_at, stop_at, transcode=transcode, **options)
+            st.success(f"Scheduled for {format_time(start_at)} (job {job_id})")
+
+    jobs = scheduler.store.list()
+    if not jobs:
+        st.info("No scheduled streams")
+        return
+
+    governor = scheduler.governor
+    st.caption(f"Host budget: {governor.used():g} of {governor.budget:g} encode units in use ({scheduler.budget_used():g} by scheduled streams)")
+    # Upcoming and running jobs first, then the most recent finished ones
+    jobs = [j for j in jobs if j["status"] in ACTIVE_STATUSES] + [j for j in reversed(jobs) if j["status"] not in ACTIVE_STATUSES][:10]
+
+    for job in jobs:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            line = f"{STATUS_ICONS[job['status']]} **{format_time(job['start_at'])}** → {format_time(job['stop_at'])} · {job['video_path'].rsplit('/', 1)[-1]} · {job['status']}"
+            if job["error"]:
+                line += f" · {job['error']}"
+            st.markdown(line)
+            if job["prepared"] and job["prepared"]["steps"]:
+                st.caption("Prepared: " + ", ".join(f"{name} {ms} ms" for name, ms in job["prepared"]["steps"].items()))
+        with col2:
+            if job["status"] in ACTIVE_STATUSES:
+                label = "Stop" if job["status"] == "running" else "Cancel"
+                if st.button(label, key=f"cancel_job_{job['id']}"):
+                    scheduler.cancel(job["id"])
+                    st.experimental_rerun()
@@ -1,7 +1,9 @@
 import streamlit as st
 from constants import RTMP_URL, SUPPORTED_VIDEO_FORMATS, MAX_VIDEO_SIZE
 from streamlit_utils import validate_video_file, save_uploaded_video
+from metrics import timed
 
+@timed("render_seconds", "Wall time of one render function", function="render_stream_setup")
 def render_stream_setup(rtmp_url):
     """Render the stream setup tab content"""
     
@@ -19,7 +21,7 @@ def render_stream_setup(rtmp_url):
         if source_type == "Upload Video":
             st.markdown(f"""
                 Supported formats: {", ".join(SUPPORTED_VIDEO_FORMATS)}  
-                Maximum file size: {MAX_VIDEO_SIZE // (1024 * 1024)}MB
+                Maximum file size: {MAX_VIDEO_SIZE // (1024 * 1024)}MB (use Large Files for bigger videos)
             """)
             
             uploaded_file = st.file_uploader(
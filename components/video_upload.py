@@ -0,0 +1,92 @@
+import json
+import streamlit.components.v1 as components
+from constants import UPLOAD_URL, UPLOAD_CHUNK_SIZE
+
+# Browser side of the resumable upload protocol in upload_server.py. Chunks are
+# sliced from the file on disk, so the browser never holds more than one; the
+# upload id is kept in localStorage so a reload or a new tab picks up where
+# the last attempt stopped.
+UPLOADER_HTML = """
+<div style="font-family: sans-serif; font-size: 14px;">
+  <input type="file" id="file" accept="video/*">
+  <button id="start">Upload</button>
+  <div style="margin-top: 8px; background: #eee; border-radius: 4px; height: 10px;">
+    <div id="bar" style="background: #ff0000; width: 0; height: 10px; border-radius: 4px;"></div>
+  </div>
+  <div id="status" style="margin-top: 6px; color: #555;"></div>
+</div>
+<script>
+const config = __CONFIG__;
+const status = (text) => document.getElementById("status").textContent = text;
+const headers = {"X-Upload-Token": config.token};
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+async function call(path, options = {}) {
+  const response = await fetch(config.url + path, {...options, headers: {...headers, ...(options.headers || {})}});
+  return [response.status, await response.json()];
+}
+
+async function upload(file) {
+  const key = `upload:${file.name}:${file.size}:${file.lastModified}`;
+  let id = localStorage.getItem(key), offset = 0, body;
+
+  if (id) {
+    const [code, found] = await call(`/uploads/${id}`);
+    if (code === 200) offset = found.offset; else id = null;
+  }
+  if (!id) {
+    const [code, created] = await call("/uploads", {
+      method: "POST",
+      headers: {"Content-Type": "application/json"},
+      body: JSON.stringify({name: file.name, size: file.size})
+    });
+    if (code >= 400) throw new Error(created.error);
+    id = created.id;
+    offset = created.offset;
+    localStorage.setItem(key, id);
+  }
+
+  let failures = 0;
+  while (true) {
+    document.getElementById("bar").style.width = `${offset / file.size * 100}%`;
+    status(`${(offset / 1e9).toFixed(2)} of ${(file.size / 1e9).toFixed(2)} GB`);
+    try {
+      const [code, result] = await call(`/uploads/${id}`, {
+        method: "PATCH",
+        headers: {"Upload-Offset": String(offset), "Content-Type": "application/offset+octet-stream"},
+        body: file.slice(offset, offset + config.chunkSize)
+      });
+      if (code >= 400 && code !== 409) throw new Error(result.error);
+      if (result.complete) { body = result; break; }
+      if (code === 409 && result.offset === offset) await sleep(1000);
+      offset = result.offset;
+      failures = 0;
+    } catch (e) {
+      if (e instanceof TypeError && failures < 8) {
+        // Network error: back off, then ask the server where it got to
+        failures += 1;
+        status(`Connection lost, retrying in ${2 ** failures}s...`);
+        await sleep(1000 * Math.min(30, 2 ** failures));
+        try { offset = (await call(`/uploads/${id}`))[1].offset; } catch (_) {}
+      } else {
+        throw e;
+      }
+    }
+  }
+
+  localStorage.removeItem(key);
+  document.getElementById("bar").style.width = "100%";
+  status(`Stored as ${body.path}. Rerun the app to select it.`);
+}
+
+document.getElementById("start").onclick = () => {
+  const file = document.getElementById("file").files[0];
+  if (file) upload(file).catch((e) => status(`Upload failed: ${e.message}`));
+};
+</script>
+"""
+
+def render_video_upload(token, url=UPLOAD_URL):
+    """Render the resumable uploader, for videos too large for the regular file uploader"""
+    config = {"url": url, "token": token, "chunkSize": UPLOAD_CHUNK_SIZE}
+    components.html(UPLOADER_HTML.replace("__CONFIG__", json.dumps(config)), height=110)
@@ -1,8 +1,213 @@
+import os
+from dotenv import load_dotenv
+
+# Settings can come from the environment or a local .env file
+load_dotenv()
+
 # YouTube RTMP streaming configuration
 RTMP_URL = "rtmp://a.rtmp.youtube.com/live2"
 
 # Supported video formats
 SUPPORTED_VIDEO_FORMATS = ["mp4", "flv"]
 
-# Maximum video file size (100MB)
+# Maximum size of a video uploaded through the browser form (100MB); larger
+# files go through the resumable upload server or the drop folder
 MAX_VIDEO_SIZE = 100 * 1024 * 1024
+
+# Line charts longer than this are drawn with WebGL and downsampled
+WEBGL_POINT_THRESHOLD = 1000
+
+# Number of points kept per trace when a series is downsampled
+CHART_POINT_BUDGET = 1500
+
+# Local data directory for archives, caches and state
+DATA_DIR = os.getenv("STREAM_DATA_DIR", "data")
+
+# Per-stream columnar analytics history
+HISTORY_DIR = os.path.join(DATA_DIR, "history")
+
+# Chat message types and their display labels
+CHAT_MESSAGE_TYPES = {
+    "regular": "Message",
+    "owner_message": "Channel Owner",
+    "super_chat": "Super Chat",
+    "membership": "Membership"
+}
+
+# Moderation actions offered in the chat manager
+MODERATION_ACTIONS = {
+    "delete": "Delete message",
+    "timeout": "Timeout user (5 minutes)",
+    "ban": "Ban user",
+    "add_moderator": "Make moderator"
+}
+
+# YouTube Data API; point the endpoint at a local fake server to work offline
+YOUTUBE_API_ENDPOINT = os.getenv("YOUTUBE_API_ENDPOINT")
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+YOUTUBE_BROADCAST_ID = os.getenv("YOUTUBE_BROADCAST_ID")
+
+# Daily quota of the API project, in units
+YOUTUBE_DAILY_QUOTA = int(os.getenv("YOUTUBE_DAILY_QUOTA", "10000"))
+
+# How long API responses are shared between sessions, in seconds
+LIVE_STATS_TTL = 15
+BROADCAST_TTL = 60
+
+# Viewer samples kept per broadcast: a day of them at one per LIVE_STATS_TTL
+VIEWER_SERIES_SAMPLES = 24 * 60 * 60 // LIVE_STATS_TTL
+
+# OAuth client and cached user token for the YouTube account
+YOUTUBE_CLIENT_SECRETS_FILE = os.getenv("YOUTUBE_CLIENT_SECRETS", "client_secret.json")
+YOUTUBE_TOKEN_FILE = os.path.join(DATA_DIR, "youtube_token.json")
+YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube.force-ssl"]
+
+# Refresh the access token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = 300
+
+# Hot-path instrumentation, scraped from http://127.0.0.1:<port>/metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+# Fast start: input burst read ahead of realtime (one 60-frame GOP at 30fps)
+# and the time of the early second keyframe, both in seconds
+FAST_START_BURST = 2
+FAST_START_FIRST_GOP = 0.5
+
+# How much of the selected video the kernel is asked to read ahead on preflight;
+# enough for the burst at high bitrates without flushing the page cache for a
+# multi-GB file
+FAST_START_WARM_BYTES = 32 * 1024 * 1024
+
+# Adaptive bitrate ladder, best first; a height of None keeps the source
+# resolution (Shorts use the height as the short side). Bitrates in kbit/s.
+BITRATE_LADDER = [
+    {"name": "source", "video_bitrate": 2500, "height": None},
+    {"name": "720p", "video_bitrate": 1800, "height": 720},
+    {"name": "480p", "video_bitrate": 1000, "height": 480},
+    {"name": "360p", "video_bitrate": 600, "height": 360}
+]
+AUDIO_BITRATE = 128
+
+# Loudness normalization: library audio is measured once (EBU R128) and brought
+# to this integrated loudness in LUFS with a fixed gain, keeping true peaks
+# below LOUDNESS_TRUE_PEAK dBTP. Audio within LOUDNESS_TOLERANCE LU of the
+# target is left untouched, and copied rather than re-encoded when it is AAC.
+LOUDNESS_TARGET = float(os.getenv("STREAM_LOUDNESS_TARGET", "-14"))
+LOUDNESS_TRUE_PEAK = -1.0
+LOUDNESS_TOLERANCE = 1.0
+
+# Step down after this long below the speed threshold, in seconds
+ABR_DOWN_SPEED = 0.95
+ABR_DOWN_SECONDS = 5
+
+# Step back up after this long at realtime; doubled after each failed step up
+ABR_UP_SPEED = 0.99
+ABR_UP_SECONDS = 60
+
+# Encoder keyframe interval, in seconds; ladder switches happen on this grid
+ABR_GOP_SECONDS = 2
+
+# Stream overlays: rendered images, how often their data is polled and how
+# long a super chat stays on screen, in seconds
+OVERLAY_DIR = os.path.join(DATA_DIR, "overlays")
+OVERLAY_POLL_SECONDS = 2
+SUPER_CHAT_DISPLAY_SECONDS = 15
+
+# Times per second ffmpeg re-reads the overlay image; the overlay filter holds
+# video frames until the next image arrives, so 1 would add up to a second of lag
+OVERLAY_FRAMERATE = 5
+
+# Stream scheduler: persistent job queue and the cache of prepared videos
+SCHEDULE_DB = os.path.join(DATA_DIR, "schedule.db")
+PREP_CACHE_DIR = os.path.join(DATA_DIR, "prep_cache")
+
+# Library preparation farm: worker processes, one per core by default, each
+# running its own single-threaded ffmpeg
+PREP_WORKERS = int(os.getenv("STREAM_PREP_WORKERS", os.cpu_count() or 1))
+
+# Prepare a job this long before its slot, and give up on starting it this
+# long after, in seconds
+SCHEDULER_PREP_AHEAD = 15 * 60
+SCHEDULER_START_GRACE = 5 * 60
+
+# Cores kept free of ffmpeg for the Streamlit server and API calls, and the
+# niceness streams run at so the UI also wins on the cores it shares
+STREAM_RESERVED_CORES = int(os.getenv("STREAM_RESERVED_CORES", 1 if (os.cpu_count() or 1) > 2 else 0))
+STREAM_NICENESS = int(os.getenv("STREAM_NICENESS", 5))
+
+# Concurrent streams admitted per host, counted in encode units of one core
+# each (the cores left after the reserved ones by default): a live re-encode
+# costs STREAM_ENCODE_COST, tuned with benchmarks/bench_pipeline.py; sending a
+# prepared file costs much less
+STREAM_HOST_BUDGET = float(os.getenv("STREAM_HOST_BUDGET", max(1, (os.cpu_count() or 1) - STREAM_RESERVED_CORES)))
+STREAM_COSTS = {"encode": float(os.getenv("STREAM_ENCODE_COST", 1.0)), "passthrough": 0.1}
+
+# How long a new stream waits for the budget to free up before it is refused, in seconds
+STREAM_ADMISSION_TIMEOUT = 30
+
+# Video library: uploads and imports land here; files put in the drop folder
+# are moved in once they have not changed for DROP_SETTLE_SECONDS
+LIBRARY_DIR = os.getenv("STREAM_LIBRARY_DIR", os.path.join(DATA_DIR, "library"))
+DROP_DIR = os.getenv("STREAM_DROP_DIR", os.path.join(DATA_DIR, "drop"))
+DROP_SETTLE_SECONDS = 10
+
+# Resumable upload server, and the address browsers use to reach it
+UPLOAD_HOST = os.getenv("UPLOAD_HOST", "127.0.0.1")
+UPLOAD_PORT = int(os.getenv("UPLOAD_PORT", "8766"))
+UPLOAD_URL = os.getenv("UPLOAD_URL", f"http://localhost:{UPLOAD_PORT}")
+UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Resume after an ffmpeg crash: where each stream's last confirmed position is
+# checkpointed and how often, and the cached keyframe index of each video
+RESUME_DIR = os.path.join(DATA_DIR, "resume")
+KEYFRAME_DIR = os.path.join(DATA_DIR, "keyframes")
+RESUME_CHECKPOINT_SECONDS = 5
+
+# Checkpoints older than this are ignored, so a stream started long after a
+# crash or app restart begins at the start again, in seconds
+RESUME_MAX_AGE = float(os.getenv("STREAM_RESUME_MAX_AGE", 60 * 60))
+
+# Restarts tried after ffmpeg fails, reset once a restart runs this long, in seconds
+RESUME_MAX_RESTARTS = 5
+RESUME_STABLE_SECONDS = 60
+RESUME_RETRY_DELAY = 2
+
+# Split publishing: the encoder writes FLV into an in-memory ring of its last
+# few keyframe intervals, and a copy-only ffmpeg sends the ring to the ingest.
+# A dropped connection restarts only the publisher, from the latest keyframe.
+SPLIT_PUBLISHER = os.getenv("STREAM_SPLIT_PUBLISHER", "1") == "1"
+PACKET_RING_GOPS = 3
+PACKET_RING_MAX_BYTES = 32 * 1024 * 1024
+
+# Publisher restarts in a row before the encoder is restarted too, and the
+# longest wait between them, in seconds; the first restart is immediate
+PUBLISHER_MAX_FAILURES = 5
+PUBLISHER_RETRY_MAX = 4
+
+# Local recording of exactly what is published, copied from the packet ring
+# into MPEG-TS segments of DVR_SEGMENT_SECONDS. Segments older than
+# DVR_RETENTION_HOURS are deleted in the background, oldest first once all of
+# them together pass DVR_MAX_GB.
+DVR_DIR = os.getenv("STREAM_DVR_DIR", os.path.join(DATA_DIR, "dvr"))
+DVR_SEGMENT_SECONDS = int(os.getenv("STREAM_DVR_SEGMENT_SECONDS", "60"))
+DVR_RETENTION_HOURS = float(os.getenv("STREAM_DVR_RETENTION_HOURS", "72"))
+DVR_MAX_GB = float(os.getenv("STREAM_DVR_MAX_GB", "50"))
+DVR_SWEEP_SECONDS = 60
+
+# Live dashboard events (server-sent events), the address browsers use to reach
+# them, and how often YouTube stats and chat are polled while a dashboard is open
+LIVE_EVENTS_HOST = os.getenv("LIVE_EVENTS_HOST", "127.0.0.1")
+LIVE_EVENTS_PORT = int(os.getenv("LIVE_EVENTS_PORT", "8767"))
+LIVE_EVENTS_URL = os.getenv("LIVE_EVENTS_URL", f"http://localhost:{LIVE_EVENTS_PORT}")
+LIVE_POLL_SECONDS = 2
+
+# Data fetched for rendering runs concurrently on this many shared threads; a
+# fetch not done within FETCH_TIMEOUT seconds is answered with its last value
+FETCH_WORKERS = 8
+FETCH_TIMEOUT = float(os.getenv("STREAM_FETCH_TIMEOUT", "2"))
+
+# Chat analytics: per-minute chat rates are kept this many minutes, and the
+# top chatters are picked from this many tracked candidates
+CHAT_RATE_MINUTES = 24 * 60
+CHAT_TOP_CHATTERS_TRACKED = 100
@@ -0,0 +1,79 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from constants import FETCH_WORKERS, FETCH_TIMEOUT
+from metrics import counter, histogram
+
+FETCH_SECONDS = histogram("fetch_seconds", "Time a render's data fetch took, by name")
+FETCH_STALE = counter("fetch_stale_total", "Fetches answered with the last good value instead, by name and reason")
+
+# Fetches in flight and the last value each returned, by key; shared by all sessions
+_inflight = {}
+_last = {}
+_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_fetch_pool():
+    """Threads that render functions' data fetches run on"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+        return _pool
+
+class Fetch:
+    """A fetch started ahead of the render code that needs its result"""
+
+    def __init__(self, key, future, deadline, default):
+        self.key = key
+        self.future = future
+        self.deadline = deadline
+        self.default = default
+
+    def result(self):
+        """The fetched value, or the last good one if it fails or is not done by its deadline
+
+        A late fetch keeps running and refreshes the value for the next rerun.
+        """
+        try:
+            return self.future.result(timeout=max(0, self.deadline - time.monotonic()))
+        except TimeoutError:
+            reason = "timeout"
+        except Exception:
+            reason = "error"
+        FETCH_STALE.inc(name=self.key[0], reason=reason)
+        with _lock:
+            return _last.get(self.key, self.default)
+
+def fetch(name, func, *args, timeout=FETCH_TIMEOUT, default=None):
+    """Start `func(*args)` on the shared pool; call result() on the returned Fetch when the data is needed
+
+    A fetch of the same name and arguments still in flight, say from a
+    previous rerun that gave up on it, is joined rather than repeated.
+    """
+    key = (name,) + args
+    with _lock:
+        future = _inflight.get(key)
+        if future is None or future.done():
+            future = get_fetch_pool().submit(_run, key, func, args)
+            _inflight[key] = future
+    return Fetch(key, future, time.monotonic() + timeout, default)
+
+def fetch_all(calls, timeout=FETCH_TIMEOUT):
+    """Run `{name: func}` concurrently; results by name, in at most `timeout` seconds overall"""
+    fetches = {name: fetch(name, func, timeout=timeout) for name, func in calls.items()}
+    return {name: f.result() for name, f in fetches.items()}
+
+def _run(key, func, args):
+    start = time.perf_counter()
+    try:
+        value = func(*args)
+        with _lock:
+            _last[key] = value
+        return value
+    finally:
+        FETCH_SECONDS.observe(time.perf_counter() - start, name=key[0])
+        with _lock:
+            _inflight.pop(key, None)
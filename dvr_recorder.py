@@ -0,0 +1,142 @@
+import os
+import time
+import itertools
+import threading
+from constants import DVR_DIR, DVR_SEGMENT_SECONDS, DVR_RETENTION_HOURS, DVR_MAX_GB, DVR_SWEEP_SECONDS
+from packet_ring import CopyRelay
+from metrics import counter, gauge
+
+DVR_BYTES = gauge("dvr_bytes", "Recorded segments kept on disk")
+DVR_SEGMENTS_DELETED = counter("dvr_segments_deleted_total", "Recorded segments deleted by retention, by reason")
+
+SEGMENT_EXTENSION = ".ts"
+
+def recording_dir(stream_id, dvr_dir=DVR_DIR):
+    return os.path.join(dvr_dir, stream_id)
+
+# Recorder processes started per stream, numbering their segment files
+_parts = {}
+_parts_lock = threading.Lock()
+
+def next_part(stream_id):
+    with _parts_lock:
+        counter = _parts.setdefault(stream_id, itertools.count(1))
+        return next(counter)
+
+def recording_command(directory, prefix, segment_seconds=DVR_SEGMENT_SECONDS):
+    """Copy-only ffmpeg cutting FLV from stdin into timestamped MPEG-TS segments named after `prefix`"""
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-probesize", "32768", "-analyzeduration", "0",
+        "-f", "flv", "-i", "pipe:0",
+        "-c", "copy", "-f", "segment",
+        # Cut on the first keyframe after each interval; MPEG-TS stays playable if recording stops mid-segment
+        "-segment_time", str(segment_seconds), "-segment_format", "mpegts", "-reset_timestamps", "1",
+        "-strftime", "1", os.path.join(directory, prefix + "-%Y%m%d-%H%M%S" + SEGMENT_EXTENSION)
+    ]
+
+def start_recording(ring, stream_id, log, on_start=None):
+    """Record a packet ring into the stream's DVR directory; returns the running relay
+
+    A failed recorder restarts from the latest keyframe like the publisher
+    does, but never stops the stream. Every recorder process, including
+    those of the stream's own restarts, writes under a new part number, so
+    one started within the same second never overwrites a segment.
+    """
+    directory = recording_dir(stream_id)
+    os.makedirs(directory, exist_ok=True)
+    log(f"Recording to {directory} in {DVR_SEGMENT_SECONDS}s segments")
+    relay = CopyRelay(
+        ring,
+        lambda: recording_command(directory, f"{stream_id}-{next_part(stream_id):03d}"),
+        f"dvr-{stream_id}",
+        log,
+        on_start=on_start
+    )
+    relay.start()
+    get_dvr_retention().start()
+    return relay
+
+def list_segments(dvr_dir=DVR_DIR):
+    """Every recorded segment as (mtime, size, path), oldest first"""
+    segments = []
+    for root, _, files in os.walk(dvr_dir):
+        for name in files:
+            if not name.endswith(SEGMENT_EXTENSION):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            segments.append((stat.st_mtime, stat.st_size, path))
+    return sorted(segments)
+
+class DvrRetention:
+    """Deletes recorded segments past the retention age or the disk cap, in the background"""
+
+    def __init__(self, dvr_dir=DVR_DIR, retention_hours=DVR_RETENTION_HOURS, max_gb=DVR_MAX_GB):
+        self.dvr_dir = dvr_dir
+        self.retention_hours = retention_hours
+        self.max_gb = max_gb
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background sweeper once"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="dvr-retention", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except OSError:
+                # The disk or directory vanished; try again next time
+                pass
+            time.sleep(DVR_SWEEP_SECONDS)
+
+    def sweep(self, now=None):
+        """Delete what retention no longer covers; returns the bytes kept"""
+        now = now or time.time()
+        segments = list_segments(self.dvr_dir)
+        total = sum(size for _, size, _ in segments)
+        max_bytes = self.max_gb * 1024 ** 3
+
+        for mtime, size, path in segments:
+            if now - mtime < DVR_SEGMENT_SECONDS * 2:
+                # Possibly still being written, and everything after it is newer
+                break
+            if now - mtime > self.retention_hours * 3600:
+                reason = "age"
+            elif total > max_bytes:
+                reason = "disk"
+            else:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+            DVR_SEGMENTS_DELETED.inc(reason=reason)
+
+        # Directories of recordings whose segments are all gone, left alone while a recording may be starting
+        for entry in os.scandir(self.dvr_dir) if os.path.isdir(self.dvr_dir) else []:
+            if entry.is_dir() and now - entry.stat().st_mtime > DVR_SEGMENT_SECONDS * 2 and not os.listdir(entry.path):
+                os.rmdir(entry.path)
+
+        DVR_BYTES.set(total)
+        return total
+
+_retention = None
+_retention_lock = threading.Lock()
+
+def get_dvr_retention():
+    global _retention
+    with _retention_lock:
+        if _retention is None:
+            _retention = DvrRetention()
+        return _retention
@@ -0,0 +1,253 @@
+import re
+import time
+import threading
+from array import array
+
+# Matches the output video stream header ffmpeg logs, e.g. "Video: h264 ..., 1280x720"
+OUTPUT_RESOLUTION_PATTERN = re.compile(r"Video:.*?\b(\d{2,5})x(\d{2,5})\b")
+
+# Registry of recorders by stream id, shared by every session of the process
+_recorders = {}
+_recorders_lock = threading.Lock()
+
+def parse_number(value):
+    """Parse a numeric ffmpeg progress value such as '2500.1kbits/s' or '1.01x'"""
+    match = re.match(r"\s*(-?\d+(?:\.\d+)?)", value or "")
+    return float(match.group(1)) if match else None
+
+class StabilityScore:
+    """Stream stability score computed incrementally from encoder samples"""
+
+    def __init__(self):
+        self.samples = 0
+        self.frames = 0
+        self.dropped_frames = 0
+        self.speed_deviation_sum = 0.0
+        # Welford running mean and variance of the output bitrate
+        self.bitrate_samples = 0
+        self.bitrate_mean = 0.0
+        self.bitrate_m2 = 0.0
+
+    def update(self, frames, dropped_frames, speed, bitrate):
+        """Fold one sample into the score in O(1)"""
+        self.samples += 1
+        self.frames = frames
+        self.dropped_frames = dropped_frames
+
+        if speed is not None:
+            self.speed_deviation_sum += abs(speed - 1.0)
+
+        if bitrate is not None:
+            self.bitrate_samples += 1
+            delta = bitrate - self.bitrate_mean
+            self.bitrate_mean += delta / self.bitrate_samples
+            self.bitrate_m2 += delta * (bitrate - self.bitrate_mean)
+
+    @property
+    def drop_ratio(self):
+        return self.dropped_frames / self.frames if self.frames else 0.0
+
+    @property
+    def mean_speed_deviation(self):
+        return self.speed_deviation_sum / self.samples if self.samples else 0.0
+
+    @property
+    def bitrate_variation(self):
+        """Coefficient of variation of the output bitrate"""
+        if self.bitrate_samples < 2 or self.bitrate_mean <= 0:
+            return 0.0
+        variance = self.bitrate_m2 / (self.bitrate_samples - 1)
+        return variance ** 0.5 / self.bitrate_mean
+
+    @property
+    def value(self):
+        """Score out of 100; each factor can take away a bounded share"""
+        if not self.samples:
+            return 100
+
+        drop_penalty = min(40.0, self.drop_ratio * 400)
+        speed_penalty = min(30.0, self.mean_speed_deviation * 150)
+        bitrate_penalty = min(30.0, self.bitrate_variation * 100)
+
+        return round(max(0.0, 100 - drop_penalty - speed_penalty - bitrate_penalty))
+
+class EncoderRecorder:
+    """Per-second encoder samples for the whole lifetime of a stream"""
+
+    def __init__(self, stream_id):
+        self.stream_id = stream_id
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+
+        # One entry per second of stream time, stored compactly
+        self.seconds = array("l")
+        self.fps = array("f")
+        self.bitrate = array("f")
+        self.speed = array("f")
+        self.dropped_frames = array("l")
+        self.height = array("l")
+
+        self.stability = StabilityScore()
+        self.totals = {"fps": 0.0, "bitrate": 0.0, "speed": 0.0}
+        self.resolution = None
+        self.out_time = 0.0
+        self.total_size = 0
+
+        self._block = {}
+        self._output_seen = False
+        # Frame and drop counters of the current process, and those of the processes before it
+        self._counts = (0, 0)
+        self._count_offsets = (0, 0)
+        # Wall and media time of the last sample, to measure speed between samples
+        self._mark = None
+
+    @property
+    def version(self):
+        return len(self.seconds)
+
+    def restart(self):
+        """Prepare for the output of a new ffmpeg process continuing this stream"""
+        with self.lock:
+            self.resolution = None
+            self.out_time = 0.0
+            self.total_size = 0
+            self._block = {}
+            self._output_seen = False
+            # The new process counts frames and drops from zero again
+            self._count_offsets = tuple(o + c for o, c in zip(self._count_offsets, self._counts))
+            self._counts = (0, 0)
+            self._mark = None
+
+    def feed_line(self, line):
+        """Consume a line of ffmpeg output; return True if it was progress data"""
+        line = line.strip()
+
+        if not self._output_seen:
+            self._output_seen = line.startswith("Output #0")
+        elif self.resolution is None:
+            match = OUTPUT_RESOLUTION_PATTERN.search(line)
+            if match:
+                self.resolution = (int(match.group(1)), int(match.group(2)))
+
+        key, sep, value = line.partition("=")
+        if not sep or " " in key:
+            return False
+
+        if key == "progress":
+            self.record(self._block)
+            self._block = {}
+        else:
+            self._block[key] = value
+        return True
+
+    def record(self, block):
+        """Record one progress block, keeping at most one sample per second"""
+        now = time.monotonic()
+        second = int(now - self.started_at)
+
+        with self.lock:
+            out_time_us = parse_number(block.get("out_time_us"))
+            if out_time_us is not None and out_time_us >= 0:
+                self.out_time = out_time_us / 1_000_000
+
+            total_size = parse_number(block.get("total_size"))
+            if total_size is not None and total_size >= 0:
+                self.total_size = int(total_size)
+
+            self._counts = (
+                int(parse_number(block.get("frame")) or 0),
+                int(parse_number(block.get("drop_frames")) or 0)
+            )
+
+            if self.seconds and self.seconds[-1] >= second:
+                return
+
+            # ffmpeg's speed= averages over the whole process, so a stall would
+            # barely show; measure media time against wall time since the last
+            # sample instead, falling back to it on a process's first sample
+            speed = parse_number(block.get("speed"))
+            if self._mark is not None and now > self._mark[0]:
+                speed = max(0.0, self.out_time - self._mark[1]) / (now - self._mark[0])
+            self._mark = (now, self.out_time)
+
+            self.add_sample(
+                second,
+                frames=self._count_offsets[0] + self._counts[0],
+                dropped=self._count_offsets[1] + self._counts[1],
+                fps=parse_number(block.get("fps")),
+                bitrate=parse_number(block.get("bitrate")),
+                speed=speed
+            )
+
+    def add_sample(self, second, frames, dropped, fps, bitrate, speed):
+        """Append one per-second sample; the caller holds the lock"""
+        self.seconds.append(second)
+        self.fps.append(fps or 0.0)
+        self.bitrate.append(bitrate or 0.0)
+        self.speed.append(speed or 0.0)
+        self.dropped_frames.append(dropped)
+        self.height.append(self.resolution[1] if self.resolution else 0)
+        self.totals["fps"] += fps or 0.0
+        self.totals["bitrate"] += bitrate or 0.0
+        self.totals["speed"] += speed or 0.0
+
+        self.stability.update(frames, dropped, speed, bitrate)
+
+    def snapshot(self):
+        """Copy the recorded series for charting"""
+        with self.lock:
+            return {
+                "times": [format_elapsed(s) for s in self.seconds],
+                "fps": list(self.fps),
+                "bitrate_mbps": [b / 1000 for b in self.bitrate],
+                "speed": list(self.speed),
+                "dropped_frames": list(self.dropped_frames),
+                "height": list(self.height)
+            }
+
+    def columns(self):
+        """Recorded series in the `(seconds, values)` form used by the history store"""
+        with self.lock:
+            return {
+                "fps": (array("l", self.seconds), array("f", self.fps)),
+                "bitrate": (array("l", self.seconds), array("f", self.bitrate)),
+                "speed": (array("l", self.seconds), array("f", self.speed)),
+                "dropped_frames": (array("l", self.seconds), array("l", self.dropped_frames))
+            }
+
+    def summary(self):
+        """Lifetime averages for the metric cards"""
+        with self.lock:
+            samples = len(self.seconds)
+            if not samples:
+                return {}
+            return {
+                "avg_fps": self.totals["fps"] / samples,
+                "avg_bitrate_mbps": self.totals["bitrate"] / samples / 1000,
+                "avg_speed": self.totals["speed"] / samples,
+                "dropped_frames": self.dropped_frames[-1],
+                "resolution": self.resolution
+            }
+
+def format_elapsed(seconds):
+    """Format elapsed stream seconds as HH:MM:SS"""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def create_recorder(stream_id):
+    """Create and register a fresh recorder for a stream"""
+    recorder = EncoderRecorder(stream_id)
+    with _recorders_lock:
+        _recorders[stream_id] = recorder
+    return recorder
+
+def get_recorder(stream_id):
+    """Look up the recorder of a stream, if any"""
+    with _recorders_lock:
+        return _recorders.get(stream_id)
+
+def remove_recorder(stream_id):
+    """Drop a finished stream's recorder once its series has been archived"""
+    with _recorders_lock:
+        _recorders.pop(stream_id, None)
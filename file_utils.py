@@ -0,0 +1,28 @@
+import os
+import json
+
+def read_json(path, default=None):
+    """Read a JSON file, returning the default when it does not exist"""
+    if not os.path.exists(path):
+        return default
+
+    with open(path) as f:
+        return json.load(f)
+
+def write_json_atomic(path, data):
+    """Write JSON so readers never see a partially written file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def write_bytes_atomic(path, data):
+    """Write bytes so readers never see a partially written file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
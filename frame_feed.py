@@ -0,0 +1,197 @@
+import os
+import time
+import fcntl
+import queue
+import threading
+import traceback
+from import_utils import lazy_import
+from metrics import counter
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+FRAMES_WRITTEN = counter("frame_feed_frames_total", "Raw frames written to ffmpeg")
+BACKPRESSURE_SECONDS = counter("frame_feed_backpressure_seconds_total", "Time producers waited for the encoder")
+
+# Linux only: grow the pipe so a whole frame fits in fewer writes
+F_SETPIPE_SZ = 1031
+PIPE_SIZE = 1024 * 1024
+
+# A producer is called as `producer(buffer, index)`; it fills a preallocated
+# (height, width, 3) uint8 BGR buffer in place and returns False when done.
+# Buffers are recycled, so a producer ahead of the encoder waits for one.
+class FrameFeed:
+    """Feeds raw frames from a Python producer into ffmpeg through a pipe"""
+
+    def __init__(self, producer, width, height, fps=30, pool_size=3, paced=True, fifo_path=None, name="frames"):
+        self.producer = producer
+        self.width = width
+        self.height = height
+        self.fps = fps
+        # Generated content is paced to realtime; capture devices pace themselves
+        self.paced = paced
+        self.fifo_path = fifo_path
+        self.name = name
+
+        self.frames_written = 0
+        self.late_frames = 0
+        self.backpressure_seconds = 0.0
+        self.error = None
+        self._log = None
+
+        self._free = queue.Queue()
+        self._filled = queue.Queue()
+        for _ in range(pool_size):
+            self._free.put(np.empty((height, width, 3), dtype=np.uint8))
+
+        self._write_fd = None
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def input_args(self):
+        """ffmpeg input options reading this feed"""
+        return [
+            "-f", "rawvideo", "-pix_fmt", "bgr24",
+            "-s", f"{self.width}x{self.height}", "-r", str(self.fps),
+            "-i", self.fifo_path or "pipe:0"
+        ]
+
+    def open(self):
+        """Create the pipe; returns the read end to pass as ffmpeg's stdin, or None for a named pipe"""
+        if self.fifo_path:
+            if not os.path.exists(self.fifo_path):
+                os.mkfifo(self.fifo_path)
+            return None
+
+        read_fd, self._write_fd = os.pipe()
+        try:
+            fcntl.fcntl(self._write_fd, F_SETPIPE_SZ, PIPE_SIZE)
+        except OSError:
+            pass
+        return read_fd
+
+    def start(self, log=None):
+        """Start producing and writing frames, once ffmpeg is running; a failing producer is reported to `log`"""
+        self._log = log
+        self._threads = [
+            threading.Thread(target=self._produce, name=f"{self.name}-producer", daemon=True),
+            threading.Thread(target=self._write, name=f"{self.name}-writer", daemon=True)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop producing; the writer ends once ffmpeg stops reading"""
+        self._stopped.set()
+        self._free.put(None)
+        self._filled.put(None)
+
+    def _produce(self):
+        started = time.monotonic()
+        index = 0
+
+        while not self._stopped.is_set():
+            waited = time.monotonic()
+            buffer = self._free.get()
+            if buffer is None:
+                break
+
+            # Waiting for a free buffer means the encoder is behind
+            blocked = time.monotonic() - waited
+            self.backpressure_seconds += blocked
+            BACKPRESSURE_SECONDS.inc(blocked)
+
+            if self.paced:
+                delay = started + index / self.fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -1 / self.fps:
+                    self.late_frames += 1
+
+            try:
+                more = self.producer(buffer, index)
+            except Exception as e:
+                # Ends the feed, and with it the stream, so say why
+                self.error = f"{type(e).__name__}: {e}"
+                if self._log is not None:
+                    self._log(f"Frame feed {self.name}: producer failed at frame {index}\n{traceback.format_exc().rstrip()}")
+                more = False
+            if not more:
+                break
+
+            self._filled.put(buffer)
+            index += 1
+
+        self._filled.put(None)
+
+    def _write(self):
+        try:
+            if self._write_fd is None:
+                # Blocks until ffmpeg opens the named pipe
+                self._write_fd = os.open(self.fifo_path, os.O_WRONLY)
+
+            while True:
+                buffer = self._filled.get()
+                if buffer is None:
+                    break
+
+                # Written straight from the numpy buffer, without a copy
+                view = memoryview(buffer).cast("B")
+                while view:
+                    view = view[os.write(self._write_fd, view):]
+
+                self._free.put(buffer)
+                self.frames_written += 1
+                FRAMES_WRITTEN.inc()
+        except OSError:
+            # ffmpeg exited or was stopped
+            pass
+        finally:
+            if self._write_fd is not None:
+                os.close(self._write_fd)
+                self._write_fd = None
+            self._stopped.set()
+            self._free.put(None)
+
+    def stats(self):
+        stats = {
+            "frames_written": self.frames_written,
+            "late_frames": self.late_frames,
+            "backpressure_seconds": round(self.backpressure_seconds, 2)
+        }
+        if self.error:
+            stats["error"] = self.error
+        return stats
+
+def capture_producer(source, width, height):
+    """Producer reading a camera, capture device, file or URL with OpenCV"""
+    capture = cv2.VideoCapture(source)
+    scratch = None
+
+    def produce(buffer, index):
+        nonlocal scratch
+
+        # Decode straight into the feed's buffer when the sizes match
+        ok, frame = capture.read(buffer if scratch is None else scratch)
+        if not ok:
+            capture.release()
+            return False
+
+        if frame is not buffer:
+            scratch = frame
+            cv2.resize(frame, (width, height), dst=buffer)
+        return True
+
+    return produce
+
+def pattern_producer(width, height):
+    """Producer drawing a moving test bar, for checking the pipeline end to end"""
+    bar_width = max(1, width // 20)
+
+    def produce(buffer, index):
+        x = (index * 8) % (width - bar_width)
+        buffer.fill(16)
+        buffer[:, x:x + bar_width] = 235
+        return True
+
+    return produce
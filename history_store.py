@@ -0,0 +1,112 @@
+import os
+import threading
+from constants import HISTORY_DIR
+from file_utils import read_json, write_json_atomic
+from import_utils import lazy_import
+
+np = lazy_import("numpy")
+
+# Series kept for every archived stream
+HISTORY_COLUMNS = ["viewers", "likes", "chat_rate", "fps", "bitrate", "speed", "dropped_frames"]
+
+CATALOG_FILE = "catalog.json"
+
+# Reductions available to cross-stream aggregations
+REDUCERS = {
+    "max": lambda values: np.max(values),
+    "mean": lambda values: np.mean(values),
+    "sum": lambda values: np.sum(values),
+    "last": lambda values: values[-1]
+}
+
+_catalog_lock = threading.Lock()
+
+def stream_dir(stream_id, history_dir=HISTORY_DIR):
+    """Directory holding the column files of one archived stream"""
+    return os.path.join(history_dir, stream_id)
+
+def load_catalog(history_dir=HISTORY_DIR):
+    """Load the catalog of archived streams, newest first"""
+    return read_json(os.path.join(history_dir, CATALOG_FILE), default=[])
+
+def catalog_version(history_dir=HISTORY_DIR):
+    """Modification time of the catalog, used as a cache key for aggregations"""
+    path = os.path.join(history_dir, CATALOG_FILE)
+    return os.path.getmtime(path) if os.path.exists(path) else 0
+
+def archive_stream(stream_id, series, metadata, history_dir=HISTORY_DIR):
+    """Write a finished stream's series as column files and add it to the catalog"""
+    # `series` maps a column name to (seconds since start, values)
+    directory = stream_dir(stream_id, history_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    entry = dict(metadata, id=stream_id, columns={})
+
+    for column, (seconds, values) in series.items():
+        if not len(values):
+            continue
+
+        values = np.asarray(values, dtype=np.float32)
+        np.save(os.path.join(directory, f"{column}.npy"), values)
+        np.save(os.path.join(directory, f"{column}.t.npy"), np.asarray(seconds, dtype=np.int32))
+
+        # Keep the common summaries in the catalog so listings never touch columns
+        entry["columns"][column] = {
+            "samples": int(len(values)),
+            "max": float(values.max()),
+            "mean": float(values.mean())
+        }
+
+    with _catalog_lock:
+        catalog = [e for e in load_catalog(history_dir) if e["id"] != stream_id]
+        catalog.insert(0, entry)
+        write_json_atomic(os.path.join(history_dir, CATALOG_FILE), catalog)
+
+    return entry
+
+def load_column(stream_id, column, history_dir=HISTORY_DIR):
+    """Memory-map one column of an archived stream, or None if it was not recorded"""
+    path = os.path.join(stream_dir(stream_id, history_dir), f"{column}.npy")
+    if not os.path.exists(path):
+        return None
+
+    return np.load(path, mmap_mode="r")
+
+def load_series(stream_id, column, history_dir=HISTORY_DIR):
+    """Memory-map a column together with its time axis"""
+    values = load_column(stream_id, column, history_dir)
+    if values is None:
+        return None, None
+
+    seconds = np.load(os.path.join(stream_dir(stream_id, history_dir), f"{column}.t.npy"), mmap_mode="r")
+    return seconds, values
+
+def aggregate(column, reducer="mean", stream_ids=None, history_dir=HISTORY_DIR):
+    """Reduce one column across archived streams, reading only that column"""
+    reduce = REDUCERS[reducer]
+    results = []
+
+    for entry in load_catalog(history_dir):
+        if stream_ids is not None and entry["id"] not in stream_ids:
+            continue
+
+        values = load_column(entry["id"], column, history_dir)
+        if values is None or not len(values):
+            continue
+
+        results.append((entry, float(reduce(values))))
+
+    return results
+
+def delete_stream(stream_id, history_dir=HISTORY_DIR):
+    """Remove an archived stream and its catalog entry"""
+    directory = stream_dir(stream_id, history_dir)
+
+    with _catalog_lock:
+        catalog = [e for e in load_catalog(history_dir) if e["id"] != stream_id]
+        write_json_atomic(os.path.join(history_dir, CATALOG_FILE), catalog)
+
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
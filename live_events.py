@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import queue
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from constants import LIVE_EVENTS_HOST, LIVE_EVENTS_PORT, LIVE_POLL_SECONDS
+from youtube_api import get_client
+from metrics import counter, gauge
+
+SUBSCRIBERS = gauge("live_event_subscribers", "Open dashboard event streams")
+EVENTS_SENT = counter("live_events_sent_total", "Events pushed to dashboards, by type")
+
+# Channel of broadcast-wide YouTube stats and chat; encoder stats go to "stream:<id>"
+YOUTUBE_CHANNEL = "youtube"
+
+# Events buffered per dashboard; one that falls further behind loses the oldest
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Idle connections get a comment line this often, so proxies keep them open
+HEARTBEAT_SECONDS = 15
+
+def stream_channel(stream_id):
+    return f"stream:{stream_id}"
+
+class EventHub:
+    """Fans events out to the dashboards subscribed to their channel"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._connections = 0
+
+    def has_subscribers(self, channel):
+        return bool(self._subscribers.get(channel))
+
+    def subscribe(self, channels):
+        """Queue receiving the events of all `channels`"""
+        events = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            for channel in channels:
+                self._subscribers.setdefault(channel, set()).add(events)
+            self._connections += 1
+            SUBSCRIBERS.set(self._connections)
+        if YOUTUBE_CHANNEL in channels:
+            get_youtube_poller().start()
+        return events
+
+    def unsubscribe(self, channels, events):
+        with self._lock:
+            for channel in channels:
+                self._subscribers.get(channel, set()).discard(events)
+            self._connections -= 1
+            SUBSCRIBERS.set(self._connections)
+
+    def publish(self, channel, event):
+        """Send an event to the channel's subscribers; free when nobody is watching"""
+        subscribers = self._subscribers.get(channel)
+        if not subscribers:
+            return
+
+        with self._lock:
+            targets = list(subscribers)
+        for events in targets:
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                try:
+                    events.get_nowait()
+                    events.put_nowait(event)
+                except (queue.Empty, queue.Full):
+                    pass
+
+_hub = EventHub()
+
+def get_event_hub():
+    """The process-wide event hub"""
+    return _hub
+
+def publish_encoder_stats(stream_id, recorder):
+    """Push a stream's latest encoder sample to its dashboards"""
+    channel = stream_channel(stream_id)
+    if not _hub.has_subscribers(channel) or not recorder.version:
+        return
+
+    _hub.publish(channel, {
+        "type": "encoder",
+        "t": time.time(),
+        "fps": recorder.fps[-1],
+        "bitrate": recorder.bitrate[-1],
+        "speed": recorder.speed[-1],
+        "dropped_frames": recorder.dropped_frames[-1],
+        "out_time": recorder.out_time
+    })
+
+class YouTubePoller:
+    """Polls the shared API client's caches while a dashboard is open, pushing only changes"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_stats = None
+        self._last_message_id = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="live-youtube-poller", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            # Ends with the last subscriber; the next one starts it again
+            with self._lock:
+                if not self.hub.has_subscribers(YOUTUBE_CHANNEL):
+                    self._thread = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                # Missing credentials, exhausted quota or an unreachable API
+                pass
+            time.sleep(LIVE_POLL_SECONDS)
+
+    def poll(self):
+        # Imported here so the engine does not load Streamlit when run headless
+        from streamlit_utils import get_broadcast
+
+        broadcast = get_broadcast()
+        if not broadcast:
+            return
+
+        client = get_client()
+        stats = client.get_live_stats(broadcast["id"])
+        current = {"viewers": stats.get("viewers", 0), "likes": stats.get("likes", 0), "comments": stats.get("comments", 0)}
+        if current != self._last_stats:
+            self._last_stats = current
+            self.hub.publish(YOUTUBE_CHANNEL, dict(current, type="stats", t=time.time()))
+
+        if broadcast.get("live_chat_id"):
+            messages = client.get_chat_messages(broadcast["live_chat_id"])
+            ids = [m["id"] for m in messages]
+            start = ids.index(self._last_message_id) + 1 if self._last_message_id in ids else 0
+            if messages[start:]:
+                self._last_message_id = ids[-1]
+                self.hub.publish(YOUTUBE_CHANNEL, {"type": "chat", "messages": messages[start:][-50:]})
+
+_poller = None
+_poller_lock = threading.Lock()
+
+def get_youtube_poller():
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = YouTubePoller(_hub)
+        return _poller
+
+def plotly_js_path():
+    """plotly.js as bundled with the Python package, so the dashboard needs no CDN"""
+    import plotly
+    return os.path.join(os.path.dirname(plotly.__file__), "package_data", "plotly.min.js")
+
+class LiveEventsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/events":
+            channels = [c for c in parse_qs(url.query).get("channels", [""])[0].split(",") if c]
+            return self.stream_events(channels)
+        if url.path == "/plotly.min.js":
+            return self.send_file(plotly_js_path(), "application/javascript")
+        self.send_error(404)
+
+    def send_file(self, path, content_type):
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self, channels):
+        """Server-sent events until the dashboard goes away"""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+
+        events = _hub.subscribe(channels)
+        try:
+            # Sleeps in the queue between events, so an idle dashboard costs nothing
+            while True:
+                try:
+                    event = events.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    self.wfile.write(b": keepalive\n\n")
+                else:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                    EVENTS_SENT.inc(type=event["type"])
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            _hub.unsubscribe(channels, events)
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_live_server(host=LIVE_EVENTS_HOST, port=LIVE_EVENTS_PORT):
+    """Serve dashboard events once per process; None if the port is taken"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), LiveEventsHandler)
+            except OSError:
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="live-events-server", daemon=True).start()
+        return _server
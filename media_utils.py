@@ -0,0 +1,205 @@
+import os
+import re
+import json
+import time
+import bisect
+import hashlib
+import threading
+import subprocess
+from constants import KEYFRAME_DIR, FAST_START_WARM_BYTES
+from file_utils import read_json, write_json_atomic
+
+# Preflight results and keyframe indexes by path, reused until the file changes
+_preflights = {}
+_preflights_lock = threading.Lock()
+_keyframes = {}
+
+# Option names the installed ffmpeg accepts, read once from its help
+_ffmpeg_options = None
+_ffmpeg_options_lock = threading.Lock()
+
+def file_signature(path):
+    """Size and modification time, enough to notice a replaced file"""
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+def parse_rate(rate):
+    """Parse an ffprobe frame rate such as "30000/1001" """
+    numerator, _, denominator = (rate or "").partition("/")
+    try:
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def probe_media(path, timeout=10):
+    """Container and stream details of a media file, from ffprobe"""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise ValueError(result.stderr.strip() or f"ffprobe exited with code {result.returncode}")
+
+    data = json.loads(result.stdout or "{}")
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+    return {
+        "format": data.get("format", {}).get("format_name"),
+        "duration": float(data.get("format", {}).get("duration") or 0),
+        "video_codec": video.get("codec_name"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": parse_rate(video.get("avg_frame_rate")),
+        "audio_codec": audio.get("codec_name")
+    }
+
+def ffmpeg_has_option(name):
+    """Whether the installed ffmpeg accepts `-name`; e.g. -readrate_initial_burst needs 6.1 or later"""
+    global _ffmpeg_options
+    with _ffmpeg_options_lock:
+        if _ffmpeg_options is None:
+            try:
+                result = subprocess.run(["ffmpeg", "-hide_banner", "-h", "long"], capture_output=True, text=True, timeout=10)
+                _ffmpeg_options = set(re.findall(r"^-(\w+)", result.stdout, re.MULTILINE))
+            except (OSError, subprocess.SubprocessError):
+                _ffmpeg_options = set()
+        return name in _ffmpeg_options
+
+def warm_page_cache(path, length=FAST_START_WARM_BYTES):
+    """Ask the kernel to start reading the start of the file before the encoder needs it"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+def preflight_input(path):
+    """Probe a video and warm its first blocks ahead of Start; cached per file version
+
+    A file that cannot be read gives a result with its error, like one that cannot be probed.
+    """
+    try:
+        signature = file_signature(path)
+    except OSError as e:
+        return {"signature": None, "info": None, "error": str(e), "elapsed_ms": 0.0}
+    with _preflights_lock:
+        cached = _preflights.get(path)
+    if cached and cached["signature"] == signature:
+        return cached
+
+    start = time.perf_counter()
+    info, error = None, None
+    try:
+        info = probe_media(path)
+        if not info["video_codec"]:
+            info, error = None, "No video stream found"
+        warm_page_cache(path)
+    except (OSError, ValueError, subprocess.SubprocessError) as e:
+        error = str(e)
+
+    preflight = {
+        "signature": signature,
+        "info": info,
+        "error": error,
+        "elapsed_ms": (time.perf_counter() - start) * 1000
+    }
+    with _preflights_lock:
+        _preflights[path] = preflight
+    return preflight
+
+def describe_media(info):
+    """One-line summary of probed media for the UI"""
+    parts = [info["video_codec"]]
+    if info["width"] and info["height"]:
+        parts.append(f"{info['width']}x{info['height']}")
+    if info["fps"]:
+        parts.append(f"{info['fps']:.0f}fps")
+    if info["audio_codec"]:
+        parts.append(info["audio_codec"])
+    minutes, seconds = divmod(int(info["duration"]), 60)
+    parts.append(f"{minutes}:{seconds:02d}")
+    return ", ".join(parts)
+
+def needs_faststart(path):
+    """True for an MP4 whose index (moov) comes after the media data, so players must seek to the end first"""
+    if not path.lower().endswith((".mp4", ".m4v", ".mov")):
+        return False
+
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return False
+
+            size = int.from_bytes(header[:4], "big")
+            box = header[4:]
+            if box == b"moov":
+                return False
+            if box == b"mdat":
+                return True
+
+            if size == 1:
+                # 64-bit size follows the box type
+                size = int.from_bytes(f.read(8), "big") - 8
+            elif size == 0:
+                return False
+            f.seek(size - 8, os.SEEK_CUR)
+
+def probe_keyframes(path, timeout=600):
+    """Timestamps of the video keyframes, read from the packets without decoding"""
+    result = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        raise ValueError(result.stderr.strip() or f"ffprobe exited with code {result.returncode}")
+
+    times = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    return sorted(times)
+
+def keyframe_index(path, build=True):
+    """Sorted keyframe times of a video, cached in memory and on disk per file version; None if not built yet and `build` is off"""
+    signature = file_signature(path)
+    with _preflights_lock:
+        cached = _keyframes.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    key = hashlib.sha1(repr((os.path.abspath(path),) + signature).encode()).hexdigest()[:20]
+    cache_file = os.path.join(KEYFRAME_DIR, f"{key}.json")
+    times = read_json(cache_file)
+    if times is None:
+        if not build:
+            return None
+        # One pass over the file, so it is built ahead of time where possible
+        times = probe_keyframes(path)
+        write_json_atomic(cache_file, times)
+
+    with _preflights_lock:
+        _keyframes[path] = (signature, times)
+    return times
+
+def keyframe_before(path, position):
+    """Latest keyframe at or before `position`, or None if the index has not been built"""
+    try:
+        times = keyframe_index(path, build=False)
+    except (OSError, ValueError):
+        return None
+    if not times:
+        return None
+
+    i = bisect.bisect_right(times, position)
+    return times[i - 1] if i else 0.0
@@ -0,0 +1,220 @@
+import os
+import time
+import threading
+from constants import OVERLAY_DIR, OVERLAY_POLL_SECONDS, SUPER_CHAT_DISPLAY_SECONDS
+from file_utils import write_bytes_atomic
+from import_utils import lazy_import
+from youtube_api import get_client
+from metrics import counter
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
+
+LAYER_RENDERS = counter("overlay_layer_renders_total", "Overlay layers rasterized after a data change")
+OVERLAY_WRITES = counter("overlay_writes_total", "Composited overlay images written for ffmpeg")
+
+# Colors are BGRA, as OpenCV draws them
+RED = (0, 0, 255, 255)
+GOLD = (7, 193, 255, 235)
+SHADE = (0, 0, 0, 170)
+WHITE = (255, 255, 255, 255)
+BLACK = (0, 0, 0, 255)
+
+FONT = 0  # cv2.FONT_HERSHEY_SIMPLEX
+
+# Key of a layer that has not been drawn yet
+UNSET = object()
+
+# Layout is designed for 720 lines and scaled to the video
+BASE_HEIGHT = 720
+MARGIN = 24
+
+def draw_label(text, scale, color=WHITE, background=SHADE):
+    """Rasterize a line of text on a padded box as an RGBA image"""
+    # Hershey fonts only cover ASCII
+    text = text.encode("ascii", "replace").decode()
+    font_scale = 0.8 * scale
+    thickness = max(1, round(2 * scale))
+    padding = round(10 * scale)
+
+    (text_width, text_height), baseline = cv2.getTextSize(text, FONT, font_scale, thickness)
+    image = np.zeros((text_height + baseline + 2 * padding, text_width + 2 * padding, 4), dtype=np.uint8)
+    image[:] = background
+    cv2.putText(image, text, (padding, padding + text_height), FONT, font_scale, color, thickness, cv2.LINE_AA)
+    return image
+
+class OverlayLayer:
+    """One overlay element, rasterized again only when its data changes"""
+
+    def __init__(self):
+        self.key = UNSET
+        self.image = None
+
+    def data_key(self, data):
+        raise NotImplementedError
+
+    def draw(self, data, scale):
+        raise NotImplementedError
+
+    def place(self, image, width, height, scale):
+        raise NotImplementedError
+
+    def update(self, data, scale):
+        """Re-rasterize if the data behind this layer changed; True if it did"""
+        key = self.data_key(data)
+        if key == self.key:
+            return False
+
+        self.key = key
+        self.image = None if key is None else self.draw(data, scale)
+        LAYER_RENDERS.inc(layer=type(self).__name__)
+        return True
+
+class LiveBadgeLayer(OverlayLayer):
+    """Red LIVE badge, as in the chat manager, in the top left corner"""
+
+    def data_key(self, data):
+        return True if data.get("live", True) else None
+
+    def draw(self, data, scale):
+        return draw_label("LIVE", scale, WHITE, RED)
+
+    def place(self, image, width, height, scale):
+        return round(MARGIN * scale), round(MARGIN * scale)
+
+class ViewerCountLayer(OverlayLayer):
+    """Concurrent viewers in the top right corner"""
+
+    def data_key(self, data):
+        return data.get("viewers")
+
+    def draw(self, data, scale):
+        return draw_label(f"{data['viewers']:,} watching", scale)
+
+    def place(self, image, width, height, scale):
+        return width - image.shape[1] - round(MARGIN * scale), round(MARGIN * scale)
+
+class SuperChatLayer(OverlayLayer):
+    """Latest super chat along the bottom, while it is recent"""
+
+    # Longest message shown before it is cut short
+    MAX_CHARS = 60
+
+    def data_key(self, data):
+        message = data.get("super_chat")
+        return message["id"] if message else None
+
+    def draw(self, data, scale):
+        message = data["super_chat"]
+        text = f"{message.get('amount') or ''} {message['author']}: {message['message']}".strip()
+        if len(text) > self.MAX_CHARS:
+            text = text[:self.MAX_CHARS - 3] + "..."
+        return draw_label(text, scale, BLACK, GOLD)
+
+    def place(self, image, width, height, scale):
+        return round(MARGIN * scale), height - image.shape[0] - round(MARGIN * scale)
+
+def default_layers():
+    return [LiveBadgeLayer(), ViewerCountLayer(), SuperChatLayer()]
+
+class OverlayCompositor:
+    """Composites the overlay layers into one transparent PNG that ffmpeg re-reads"""
+
+    def __init__(self, path, width, height, layers=None):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.scale = height / BASE_HEIGHT
+        self.layers = layers if layers is not None else default_layers()
+        self.writes = 0
+
+    def update(self, data):
+        """Redraw changed layers and rewrite the image; False when nothing changed"""
+        changed = [layer.update(data, self.scale) for layer in self.layers]
+        if not any(changed) and self.writes:
+            return False
+
+        self.write()
+        return True
+
+    def compose(self):
+        canvas = np.zeros((self.height, self.width, 4), dtype=np.uint8)
+        for layer in self.layers:
+            if layer.image is None:
+                continue
+
+            x, y = layer.place(layer.image, self.width, self.height, self.scale)
+            # Clip layers that do not fit a small video
+            x, y = max(0, x), max(0, y)
+            image = layer.image[:self.height - y, :self.width - x]
+            canvas[y:y + image.shape[0], x:x + image.shape[1]] = image
+        return canvas
+
+    def write(self):
+        ok, png = cv2.imencode(".png", self.compose())
+        if not ok:
+            return
+        # Replaced atomically, so ffmpeg never reads a half-written image
+        write_bytes_atomic(self.path, png.tobytes())
+        self.writes += 1
+        OVERLAY_WRITES.inc()
+
+def fetch_overlay_data(super_chats_seen):
+    """Viewer count and latest recent super chat from the shared API client's caches"""
+    # Imported here so the engine does not load Streamlit when run headless
+    from streamlit_utils import get_broadcast
+
+    broadcast = get_broadcast()
+    if not broadcast:
+        return {"live": True}
+
+    client = get_client()
+    data = {"live": True, "viewers": client.get_live_stats(broadcast["id"]).get("viewers")}
+
+    if broadcast.get("live_chat_id"):
+        messages = client.get_chat_messages(broadcast["live_chat_id"])
+        latest = next((m for m in reversed(messages) if m["type"] == "super_chat"), None)
+        if latest is not None:
+            first_seen = super_chats_seen.setdefault(latest["id"], time.monotonic())
+            if time.monotonic() - first_seen < SUPER_CHAT_DISPLAY_SECONDS:
+                data["super_chat"] = latest
+    return data
+
+class OverlayUpdater:
+    """Polls analytics and chat on a background thread and refreshes a stream's overlay"""
+
+    def __init__(self, stream_id, width, height, fetch=None):
+        self.compositor = OverlayCompositor(os.path.join(OVERLAY_DIR, f"{stream_id}.png"), width, height)
+        self.fetch = fetch or fetch_overlay_data
+        self._super_chats_seen = {}
+        self._stopped = threading.Event()
+
+    @property
+    def path(self):
+        return self.compositor.path
+
+    def refresh(self):
+        try:
+            data = self.fetch(self._super_chats_seen)
+        except Exception:
+            # Keep showing the last overlay while the API is unavailable
+            return
+        self.compositor.update(data)
+
+    def start(self):
+        """Write the first image, which ffmpeg needs to open, then keep it current"""
+        self.compositor.update({"live": True})
+        threading.Thread(target=self._run, name=f"overlay-{os.path.basename(self.path)}", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _run(self):
+        while True:
+            self.refresh()
+            if self._stopped.wait(OVERLAY_POLL_SECONDS):
+                return
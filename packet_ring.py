@@ -0,0 +1,297 @@
+import time
+import threading
+import subprocess
+from collections import deque
+from itertools import islice
+from constants import PACKET_RING_GOPS, PACKET_RING_MAX_BYTES, PUBLISHER_MAX_FAILURES, PUBLISHER_RETRY_MAX
+from pipe_reader import get_pipe_reader
+from metrics import counter, gauge, histogram
+
+RING_BYTES = gauge("packet_ring_bytes", "Encoded stream held in memory for republishing")
+RELAY_RESTARTS = counter("relay_restarts_total", "Copy processes restarted from the packet ring, by name")
+RELAY_RESUME_SECONDS = histogram("relay_resume_seconds", "Time from a copy process failing to its replacement being fed")
+RELAY_SKIPPED_TAGS = counter("relay_skipped_tags_total", "Tags a copy process fell too far behind to send, by name")
+
+FLV_HEADER_SIZE = 13
+FLV_TAG_HEADER_SIZE = 11
+FLV_AUDIO, FLV_VIDEO, FLV_SCRIPT = 8, 9, 18
+
+# A copy process that ran this long counts as recovered, in seconds
+RELAY_STABLE_SECONDS = 10
+
+# How often a relay waiting for packets checks on its process, in seconds
+RELAY_POLL_SECONDS = 0.2
+
+class PacketRing:
+    """An encoder's FLV output: its header and codec setup, plus every tag since the oldest kept keyframe
+
+    Fed on the shared pipe reader thread; read by relays, each at its own cursor.
+    """
+
+    def __init__(self, stream_id, gops=PACKET_RING_GOPS, max_bytes=PACKET_RING_MAX_BYTES):
+        self.stream_id = stream_id
+        self.gops = gops
+        self.max_bytes = max_bytes
+        self.header = b""
+        self.setup = []
+        self.bytes = 0
+        self.closed = False
+        self._buffer = b""
+        self._tags = deque()
+        self._keyframes = deque()
+        self._first = 0
+        self._next = 0
+        self._cond = threading.Condition()
+
+    def feed(self, data):
+        """Split encoder output into FLV tags"""
+        buffer = self._buffer + data
+        offset = 0
+        if not self.header:
+            if len(buffer) < FLV_HEADER_SIZE:
+                self._buffer = buffer
+                return
+            self.header = buffer[:FLV_HEADER_SIZE]
+            offset = FLV_HEADER_SIZE
+
+        while len(buffer) - offset >= FLV_TAG_HEADER_SIZE:
+            size = int.from_bytes(buffer[offset + 1:offset + 4], "big")
+            end = offset + FLV_TAG_HEADER_SIZE + size + 4
+            if end > len(buffer):
+                break
+            self._add(buffer[offset:end])
+            offset = end
+        self._buffer = buffer[offset:]
+
+    def _add(self, tag):
+        kind = tag[0] & 0x1f
+        body = tag[FLV_TAG_HEADER_SIZE:FLV_TAG_HEADER_SIZE + 2]
+        # Metadata and the AVC/AAC sequence headers have to lead every new connection
+        if kind == FLV_SCRIPT or is_sequence_header(kind, body):
+            with self._cond:
+                self.setup.append(tag)
+            return
+
+        keyframe = kind == FLV_VIDEO and len(body) > 0 and body[0] >> 4 == 1
+        with self._cond:
+            if keyframe:
+                self._keyframes.append(self._next)
+            self._tags.append(tag)
+            self._next += 1
+            self.bytes += len(tag)
+            self._evict()
+            self._cond.notify_all()
+        RING_BYTES.set(self.bytes, stream=self.stream_id)
+
+    def _evict(self):
+        # Keep the last `gops` keyframe intervals, and never more than max_bytes
+        while len(self._keyframes) > self.gops or (self.bytes > self.max_bytes and len(self._keyframes) > 1):
+            self._keyframes.popleft()
+            while self._first < self._keyframes[0]:
+                self.bytes -= len(self._tags.popleft())
+                self._first += 1
+        # Nothing to resume from yet, so only the byte cap applies
+        while self.bytes > self.max_bytes and not self._keyframes:
+            self.bytes -= len(self._tags.popleft())
+            self._first += 1
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        RING_BYTES.remove(stream=self.stream_id)
+
+    def wait_ready(self, timeout):
+        """Wait for the first keyframe, which comes after the header and setup tags; False if it has not"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._keyframes or self.closed, timeout) and bool(self._keyframes)
+
+    def start_cursor(self, latest=True):
+        """Where a new reader starts: the latest keyframe, or the oldest one kept"""
+        with self._cond:
+            if not self._keyframes:
+                return self._first
+            return self._keyframes[-1] if latest else self._keyframes[0]
+
+    def read(self, cursor, timeout):
+        """Tags from `cursor` on as one chunk, the cursor after them, and how many tags were skipped
+
+        Waits up to `timeout` for new tags; a reader that fell behind what the
+        ring still holds skips ahead to the latest keyframe. Returns
+        (b"", cursor, 0) when there is nothing new.
+        """
+        skipped = 0
+        with self._cond:
+            self._cond.wait_for(lambda: cursor < self._next or self.closed, timeout)
+            if cursor < self._first:
+                skipped_to = self._keyframes[-1] if self._keyframes else self._first
+                skipped, cursor = skipped_to - cursor, skipped_to
+            tags = list(islice(self._tags, cursor - self._first, None))
+            return b"".join(tags), cursor + len(tags), skipped
+
+    def ended(self, cursor):
+        return self.closed and cursor >= self._next
+
+    def behind(self, cursor):
+        """Seconds of media between `cursor` and the newest tag"""
+        with self._cond:
+            if cursor >= self._next or not self._tags:
+                return 0.0
+            index = max(0, cursor - self._first)
+            return (flv_timestamp(self._tags[-1]) - flv_timestamp(self._tags[index])) / 1000
+
+def is_sequence_header(kind, body):
+    """Whether a tag carries AVC or AAC decoder configuration rather than media"""
+    if len(body) < 2 or body[1] != 0:
+        return False
+    if kind == FLV_VIDEO:
+        return body[0] & 0x0f == 7
+    return kind == FLV_AUDIO and body[0] >> 4 == 10
+
+def flv_timestamp(tag):
+    """A tag's timestamp in milliseconds"""
+    return int.from_bytes(tag[4:7], "big") | tag[7] << 24
+
+def last_tag_timestamp(chunk):
+    """Timestamp of the last tag of a chunk of whole tags, found from its trailing previous-tag-size"""
+    size = int.from_bytes(chunk[-4:], "big")
+    return flv_timestamp(chunk[len(chunk) - 4 - size:])
+
+class CopyRelay:
+    """Feeds a packet ring into a copying ffmpeg, replacing the process from the latest keyframe when it fails
+
+    `cmd` is the ffmpeg command, or a function building a fresh one for each
+    process, as the DVR recorder needs so a replacement never reuses a file name.
+    """
+
+    def __init__(self, ring, cmd, name, log, on_start=None, on_give_up=None):
+        self.ring = ring
+        self.cmd = cmd
+        self.name = name
+        self.log = log
+        self.on_start = on_start
+        self.on_give_up = on_give_up
+        self.restarts = 0
+        self.skipped = 0
+        # Media seconds and bytes actually taken by the copy process: it reads
+        # only as fast as its output goes, so for a publisher this is the uplink
+        self.sent_time = 0.0
+        self.sent_bytes = 0
+        self._sent_until = None
+        self.process = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def join(self, timeout=None):
+        """Wait for the relay to send what the ring still holds; False if it did not finish in time"""
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def stop(self):
+        self._stopped.set()
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+        self._thread.join(5)
+
+    def _launch(self):
+        cmd = self.cmd() if callable(self.cmd) else self.cmd
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=0)
+        get_pipe_reader().register(
+            process.stderr,
+            lambda line: self.log(f"{self.name}: {line.decode(errors='replace').strip()}"),
+            process.stderr.close,
+            self.log
+        )
+        if self.on_start:
+            self.on_start(process.pid)
+        self.process = process
+        return process
+
+    def _run(self):
+        failures = 0
+        failed_at = None
+        while not self.ring.wait_ready(RELAY_POLL_SECONDS):
+            if self._stopped.is_set() or self.ring.closed:
+                return
+        # The first connection starts as far back as the ring goes, so nothing is skipped
+        cursor = self.ring.start_cursor(latest=False)
+
+        while not self._stopped.is_set():
+            process = self._launch()
+            started = time.monotonic()
+            try:
+                process.stdin.write(self.ring.header + b"".join(self.ring.setup))
+                if failed_at is not None:
+                    behind = self.ring.behind(cursor)
+                    RELAY_RESUME_SECONDS.observe(time.monotonic() - failed_at, name=self.name.split("-")[0])
+                    self.log(
+                        f"{self.name}: resumed from a keyframe {behind:.1f}s behind live, "
+                        f"{(time.monotonic() - failed_at) * 1000:.0f} ms after the failure"
+                    )
+                while not self._stopped.is_set() and process.poll() is None:
+                    data, cursor, skipped = self.ring.read(cursor, RELAY_POLL_SECONDS)
+                    if skipped:
+                        self._skipped(skipped, "fell behind the packet ring")
+                    if data:
+                        process.stdin.write(data)
+                        self._sent(data)
+                    elif self.ring.ended(cursor):
+                        # Everything sent; let ffmpeg flush and finish cleanly
+                        process.stdin.close()
+                        process.wait()
+                        return
+            except (BrokenPipeError, ConnectionResetError, ValueError):
+                pass
+            finally:
+                if process.poll() is None and self._stopped.is_set():
+                    process.kill()
+
+            returncode = process.wait()
+            if self._stopped.is_set() or self.ring.closed:
+                return
+
+            failed_at = time.monotonic()
+            failures = 1 if failed_at - started >= RELAY_STABLE_SECONDS else failures + 1
+            if failures > PUBLISHER_MAX_FAILURES:
+                self.log(f"{self.name}: ffmpeg failed {failures - 1} times in a row (exit code {returncode}); giving up")
+                if self.on_give_up:
+                    self.on_give_up()
+                return
+
+            self.restarts += 1
+            RELAY_RESTARTS.inc(name=self.name.split("-")[0])
+            self.log(f"{self.name}: ffmpeg exited with code {returncode}; restarting from the latest keyframe")
+            self._sent_until = None
+            # The first retry is immediate, so a dropped connection costs milliseconds
+            self._stopped.wait(min(PUBLISHER_RETRY_MAX, 0.25 * (2 ** (failures - 1)) - 0.25))
+            latest = self.ring.start_cursor(latest=True)
+            if latest > cursor:
+                self._skipped(latest - cursor, "restarted")
+            cursor = latest
+
+    def _skipped(self, count, reason):
+        self.skipped += count
+        self._sent_until = None
+        RELAY_SKIPPED_TAGS.inc(count, name=self.name.split("-")[0])
+        self.log(f"{self.name}: {reason}; skipped {count} tags to the latest keyframe")
+
+    def _sent(self, data):
+        # Only time covered without a gap counts; skips and restarts jump ahead
+        first = flv_timestamp(data) if self._sent_until is None else self._sent_until
+        self._sent_until = last_tag_timestamp(data)
+        self.sent_time += max(0, self._sent_until - first) / 1000
+        self.sent_bytes += len(data)
+
+def publisher_command(output_url):
+    """Copy-only ffmpeg sending FLV from stdin to an RTMP URL"""
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        # Streams are declared by the FLV header and setup tags, so skip probing
+        "-probesize", "32768", "-analyzeduration", "0",
+        "-f", "flv", "-i", "pipe:0",
+        "-c", "copy", "-f", "flv", output_url
+    ]
@@ -0,0 +1,156 @@
+import os
+import sys
+import selectors
+import threading
+import traceback
+from metrics import counter, gauge
+
+READER_PIPES = gauge("pipe_reader_pipes", "ffmpeg output pipes multiplexed by the shared reader")
+READER_BYTES = counter("pipe_reader_bytes_total", "Bytes of ffmpeg output read by the shared reader")
+HANDLER_ERRORS = counter("pipe_reader_handler_errors_total", "Line handlers that raised")
+
+# Bytes read per ready pipe and wakeup
+READ_SIZE = 64 * 1024
+
+# Longest line kept; a longer run without a line break is cut, so memory stays bounded
+MAX_LINE = 64 * 1024
+
+class _Pipe:
+    def __init__(self, on_line, on_close, on_data=None, on_error=None):
+        self.on_line = on_line
+        self.on_close = on_close
+        self.on_data = on_data
+        self.on_error = on_error
+        self.failed = False
+        self.buffer = b""
+
+class PipeReader:
+    """One selector thread reading every registered pipe as bytes, split into lines on \\r and \\n"""
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._thread = None
+
+        # Registrations from other threads are handed to the loop through this pipe
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+
+    def register(self, pipe, on_line, on_close, on_error=None):
+        """Call `on_line(bytes)` for each non-empty line of `pipe`, then `on_close()` at end of file
+
+        Both run on the reader thread, so they must not block. The first
+        traceback of a handler raising is passed to `on_error(text)`, or
+        written to stderr without one; later ones are only counted.
+        """
+        self._add(pipe, _Pipe(on_line, on_close, on_error=on_error))
+
+    def register_data(self, pipe, on_data, on_close, on_error=None):
+        """Call `on_data(bytes)` with each chunk read from `pipe` as is, then `on_close()` at end of file"""
+        self._add(pipe, _Pipe(None, on_close, on_data, on_error))
+
+    def _add(self, pipe, entry):
+        fd = pipe.fileno()
+        os.set_blocking(fd, False)
+        with self._lock:
+            self._pending.append((fd, entry))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="pipe-reader", daemon=True)
+                self._thread.start()
+        os.write(self._wake_write, b"\0")
+
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    self._add_pending()
+                else:
+                    self._read(key.fd, key.data)
+
+    def _add_pending(self):
+        try:
+            os.read(self._wake_read, 4096)
+        except BlockingIOError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for fd, pipe in pending:
+            self._selector.register(fd, selectors.EVENT_READ, pipe)
+        READER_PIPES.set(len(self._selector.get_map()) - 1)
+
+    def _read(self, fd, pipe):
+        try:
+            data = os.read(fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+
+        if not data:
+            self._selector.unregister(fd)
+            READER_PIPES.set(len(self._selector.get_map()) - 1)
+            self._emit(pipe, [pipe.buffer])
+            self._call(pipe, pipe.on_close)
+            return
+
+        READER_BYTES.inc(len(data))
+        if pipe.on_data is not None:
+            self._call(pipe, pipe.on_data, data)
+            return
+
+        data = pipe.buffer + data
+        if b"\r" in data:
+            # ffmpeg rewrites status lines with \r; treat it as a line break
+            data = data.replace(b"\r", b"\n")
+        lines = data.split(b"\n")
+        pipe.buffer = lines.pop()
+        if len(pipe.buffer) > MAX_LINE:
+            lines.append(pipe.buffer[:MAX_LINE])
+            pipe.buffer = b""
+        self._emit(pipe, lines)
+
+    def _emit(self, pipe, lines):
+        on_line = pipe.on_line
+        for line in lines:
+            if not line:
+                continue
+            # One stream's handler failing must not stop the others being read
+            try:
+                on_line(line)
+            except Exception:
+                self._failed(pipe)
+
+    def _call(self, pipe, handler, *args):
+        try:
+            handler(*args)
+        except Exception:
+            self._failed(pipe)
+
+    @staticmethod
+    def _failed(pipe):
+        HANDLER_ERRORS.inc()
+        if pipe.failed:
+            return
+        pipe.failed = True
+
+        report = f"Pipe handler failed; further errors on this pipe are not reported\n{traceback.format_exc().rstrip()}"
+        try:
+            if pipe.on_error is not None:
+                pipe.on_error(report)
+                return
+        except Exception:
+            pass
+        print(report, file=sys.stderr)
+
+_reader = None
+_reader_lock = threading.Lock()
+
+def get_pipe_reader():
+    """The process-wide pipe reader"""
+    global _reader
+    with _reader_lock:
+        if _reader is None:
+            _reader = PipeReader()
+        return _reader
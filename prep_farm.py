@@ -0,0 +1,324 @@
+"""Library preparation farm: probes, remuxes, transcodes and extracts posters on a process pool
+
+Prepare files or whole folders ahead of time with
+`python prep_farm.py PATH... [--workers N] [--tasks probe transcode ...]`.
+Work is keyed by content hash, so files already prepared cost only a lookup.
+"""
+import os
+import sys
+import time
+import heapq
+import signal
+import argparse
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, CancelledError, wait
+from constants import PREP_WORKERS
+from stream_prep import prepare_file, PREP_TASKS
+from video_library import is_video_file
+from metrics import counter, gauge
+
+PREP_JOBS = counter("prep_jobs_total", "Preparation jobs finished, by status")
+PREP_QUEUED = gauge("prep_jobs_queued", "Preparation jobs waiting for a worker")
+
+# Lower runs first: the file a user just selected, then scheduled streams, then batch runs
+PRIORITY_INTERACTIVE = 0
+PRIORITY_SCHEDULED = 1
+PRIORITY_BATCH = 2
+
+# Finished jobs kept for progress reporting
+FINISHED_JOBS_KEPT = 1000
+
+_progress_queue = None
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+    # Ctrl+C is for the parent, which shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _run_job(job_id, video_path, tasks, is_shorts, threads):
+    def report(task, fraction, pid=None):
+        _progress_queue.put((job_id, task, fraction, pid))
+    return prepare_file(video_path, tasks, is_shorts, threads, report)
+
+class PrepJob:
+    def __init__(self, job_id, video_path, tasks, is_shorts, priority):
+        self.id = job_id
+        self.video_path = video_path
+        self.tasks = tasks
+        self.is_shorts = is_shorts
+        self.priority = priority
+        self.status = "queued"
+        self.task = None
+        self.progress = 0.0
+        self.error = None
+        self.pid = None
+        self.cancel_requested = False
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = Future()
+
+    def result(self, timeout=None):
+        """The file's manifest once prepared; raises if the job failed or was cancelled"""
+        return self.future.result(timeout)
+
+    def describe(self):
+        return {
+            "id": self.id,
+            "video_path": self.video_path,
+            "status": self.status,
+            "priority": self.priority,
+            "task": self.task,
+            "progress": self.progress,
+            "error": self.error,
+            "elapsed": (self.finished_at or time.time()) - self.started_at if self.started_at else None
+        }
+
+class PrepFarm:
+    """Priority queue of preparation jobs drained by a pool of worker processes"""
+
+    def __init__(self, workers=PREP_WORKERS):
+        self.workers = workers
+        # Share the cores between the workers' encoders rather than oversubscribing them
+        self.threads = max(1, (os.cpu_count() or 1) // workers)
+        self._cond = threading.Condition()
+        self._heap = []
+        self._order = itertools.count()
+        self._ids = itertools.count(1)
+        self._jobs = {}
+        self._active = {}
+        self._running = 0
+        self._pool = None
+        self._progress = None
+
+    def _start(self):
+        if self._pool is not None:
+            return
+        # Spawned, not forked: the parent is a threaded Streamlit server
+        context = multiprocessing.get_context("spawn")
+        self._progress = context.Queue()
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker, initargs=(self._progress,))
+        threading.Thread(target=self._dispatch, name="prep-dispatch", daemon=True).start()
+        threading.Thread(target=self._collect_progress, name="prep-progress", daemon=True).start()
+
+    def submit(self, video_path, tasks=PREP_TASKS, is_shorts=False, priority=PRIORITY_BATCH):
+        """Queue a file for preparation; the same work already queued is reused and raised to `priority`"""
+        key = (os.path.abspath(video_path), tuple(tasks), is_shorts)
+        with self._cond:
+            self._start()
+            job = self._active.get(key)
+            if job is None:
+                job = PrepJob(next(self._ids), key[0], key[1], is_shorts, priority)
+                self._jobs[job.id] = job
+                self._active[key] = job
+            elif job.status != "queued" or priority >= job.priority:
+                return job
+
+            # Re-pushed rather than moved; the stale entry is skipped when popped
+            job.priority = priority
+            heapq.heappush(self._heap, (priority, next(self._order), job.id))
+            self._update_queued()
+            self._cond.notify_all()
+            return job
+
+    def prioritize(self, video_path, priority=PRIORITY_INTERACTIVE):
+        """Move every queued job of a file ahead of the others"""
+        path = os.path.abspath(video_path)
+        with self._cond:
+            jobs = [job for key, job in self._active.items() if key[0] == path and job.status == "queued"]
+        for job in jobs:
+            self.submit(job.video_path, job.tasks, job.is_shorts, priority)
+        return jobs
+
+    def cancel(self, job_id):
+        """Drop a queued job or stop a running one's ffmpeg; False if it already finished"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ("queued", "running"):
+                return False
+            job.cancel_requested = True
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+                job.future.set_exception(CancelledError())
+                self._update_queued()
+                return True
+            pid = job.pid
+
+        # Steps in Python (hashing, probing) run to the end of the step
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        return True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Every known job, newest first"""
+        with self._cond:
+            return [job.describe() for job in sorted(self._jobs.values(), key=lambda j: j.id, reverse=True)]
+
+    def summary(self):
+        """Job counts by status"""
+        counts = {}
+        with self._cond:
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def wait(self, jobs, on_progress=None, interval=1.0):
+        """Block until all `jobs` have finished, calling `on_progress()` every `interval` seconds"""
+        pending = [job.future for job in jobs]
+        while pending:
+            if on_progress:
+                on_progress()
+            pending = wait(pending, timeout=interval).not_done
+
+    def shutdown(self):
+        """Stop the worker processes, dropping queued work"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    def _update_queued(self):
+        PREP_QUEUED.set(sum(1 for job in self._active.values() if job.status == "queued"))
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                # Only as many jobs as workers are handed to the pool, so priorities hold
+                while not (self._heap and self._running < self.workers):
+                    self._cond.wait()
+                priority, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is None or job.status != "queued" or job.priority != priority:
+                    continue
+                job.status = "running"
+                job.started_at = time.time()
+                self._running += 1
+                self._update_queued()
+
+            try:
+                future = self._pool.submit(_run_job, job.id, job.video_path, job.tasks, job.is_shorts, self.threads)
+            except Exception as e:
+                # A broken pool fails the job instead of stopping the dispatcher
+                future = Future()
+                future.set_exception(e)
+            future.add_done_callback(lambda f, job=job: self._done(job, f))
+
+    def _done(self, job, future):
+        with self._cond:
+            self._running -= 1
+            try:
+                manifest = future.result()
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                self._finish(job, "cancelled" if job.cancel_requested else "failed")
+                job.future.set_exception(CancelledError() if job.cancel_requested else e)
+            else:
+                if job.cancel_requested:
+                    # Cancelled during a step in Python, which ran to its end; what
+                    # it prepared stays cached, but the job still ends cancelled
+                    self._finish(job, "cancelled")
+                    job.future.set_exception(CancelledError())
+                else:
+                    job.progress = 1.0
+                    self._finish(job, "done")
+                    job.future.set_result(manifest)
+            self._cond.notify_all()
+
+    def _finish(self, job, status):
+        job.status = status
+        job.pid = None
+        job.finished_at = time.time()
+        PREP_JOBS.inc(status=status)
+        key = (job.video_path, job.tasks, job.is_shorts)
+        if self._active.get(key) is job:
+            del self._active[key]
+
+        finished = [j for j in self._jobs.values() if j.finished_at]
+        for old in sorted(finished, key=lambda j: j.id)[:-FINISHED_JOBS_KEPT]:
+            del self._jobs[old.id]
+
+    def _collect_progress(self):
+        while True:
+            job_id, task, fraction, pid = self._progress.get()
+            # Under the lock, so a job finishing at the same time is not given a pid again
+            with self._cond:
+                job = self._jobs.get(job_id)
+                if job is None or job.status != "running":
+                    continue
+                job.task = task
+                job.pid = pid if fraction < 1.0 else None
+                if task in job.tasks:
+                    job.progress = (job.tasks.index(task) + fraction) / len(job.tasks)
+                # A cancel that came during a step in Python stops the next step's ffmpeg
+                stop = job.pid if job.cancel_requested else None
+
+            if stop:
+                try:
+                    os.kill(stop, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+_farm = None
+_farm_lock = threading.Lock()
+
+def get_prep_farm():
+    """The process-wide preparation farm; worker processes start with the first job"""
+    global _farm
+    with _farm_lock:
+        if _farm is None:
+            _farm = PrepFarm()
+        return _farm
+
+def find_videos(paths):
+    """Video files among `paths`, searching folders recursively"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if is_video_file(name):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare videos ahead of streaming them")
+    parser.add_argument("paths", nargs="+", help="Video files or folders")
+    parser.add_argument("--workers", type=int, default=PREP_WORKERS)
+    parser.add_argument("--tasks", nargs="+", choices=PREP_TASKS, default=list(PREP_TASKS))
+    parser.add_argument("--shorts", action="store_true", help="Transcode for Shorts (720x1280)")
+    args = parser.parse_args()
+
+    farm = PrepFarm(args.workers)
+    tasks = tuple(t for t in PREP_TASKS if t in args.tasks)
+    jobs = [farm.submit(path, tasks, args.shorts) for path in find_videos(args.paths)]
+
+    start = time.monotonic()
+
+    def show():
+        counts = farm.summary()
+        print(", ".join(f"{status} {count}" for status, count in sorted(counts.items())), file=sys.stderr)
+
+    try:
+        farm.wait(jobs, show, interval=5.0)
+    except KeyboardInterrupt:
+        for job in jobs:
+            farm.cancel(job.id)
+        farm.wait(jobs)
+
+    elapsed = time.monotonic() - start
+    farm.shutdown()
+    for job in jobs:
+        print(f"{job.status:<9} {job.video_path}" + (f": {job.error}" if job.error else ""))
+    print(f"{len(jobs)} files in {elapsed:.1f} s with {args.workers} workers")
+    if any(job.status != "done" for job in jobs):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
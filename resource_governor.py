@@ -0,0 +1,223 @@
+import os
+import math
+import time
+import threading
+from constants import STREAM_HOST_BUDGET, STREAM_RESERVED_CORES, STREAM_NICENESS
+from metrics import counter, gauge, histogram
+
+BUDGET_USED = gauge("governor_budget_used", "Encode units taken by running streams")
+STREAM_CORES = gauge("stream_cores", "Cores a stream's ffmpeg is pinned to")
+ADMISSION_WAIT = histogram("governor_admission_wait_seconds", "Time new streams waited for the host budget")
+REFUSALS = counter("governor_refusals_total", "Streams refused because the host budget stayed exhausted")
+SPEED_MARGIN = gauge("stream_speed_margin", "How much faster than realtime a stream could run on its share of cores")
+
+# Below this speed a stream is behind rather than paced at realtime
+PACED_SPEED = 0.98
+
+# Weight of the newest CPU sample in the smoothed usage
+CPU_SMOOTHING = 0.3
+
+def process_cpu_seconds(pid):
+    """User plus system CPU time of a process, or None once it has exited"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def format_cores(cores):
+    """CPU ids as ranges, like "0-3,6" """
+    ranges = []
+    for core in sorted(cores):
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+class Placement:
+    """Where one stream's ffmpeg runs: its cores, encoder threads and niceness"""
+
+    def __init__(self, stream_id, cost, cores, threads, nice):
+        self.stream_id = stream_id
+        self.cost = cost
+        self.cores = cores
+        self.threads = threads
+        self.nice = nice
+        self.placed_at = time.time()
+        self.pid = None
+        self.speed = None
+        self.cpu = None
+        self._sample = None
+
+    def observe(self, speed):
+        """Record the encoder's latest speed alongside the CPU its ffmpeg used since the last call"""
+        self.speed = speed
+        cpu_seconds = process_cpu_seconds(self.pid) if self.pid else None
+        now = time.monotonic()
+        if cpu_seconds is not None and self._sample and now > self._sample[0]:
+            rate = max(0.0, cpu_seconds - self._sample[1]) / (now - self._sample[0])
+            self.cpu = rate if self.cpu is None else self.cpu + CPU_SMOOTHING * (rate - self.cpu)
+        self._sample = (now, cpu_seconds) if cpu_seconds is not None else None
+
+    def margin(self, share):
+        """Speed above realtime the stream could reach on `share` cores; negative when it is behind"""
+        if self.speed is None:
+            return None
+        if self.speed < PACED_SPEED or not self.cpu:
+            return self.speed - 1.0
+        # Paced at realtime, so its headroom shows in the CPU it leaves unused
+        return self.speed * share / self.cpu - 1.0
+
+    def describe(self, share):
+        margin = self.margin(share)
+        if margin is not None:
+            SPEED_MARGIN.set(margin, stream=self.stream_id)
+        return {
+            "stream_id": self.stream_id,
+            "cost": self.cost,
+            "cores": format_cores(self.cores) or "any",
+            "threads": self.threads,
+            "nice": self.nice,
+            "speed": self.speed,
+            "cpu": self.cpu,
+            "share": share,
+            # Near zero means the stream needs more cores before it falls behind
+            "margin": margin
+        }
+
+class ResourceGovernor:
+    """Admits streams within the host budget and gives each its own cores, away from the reserved ones"""
+
+    def __init__(self, budget=STREAM_HOST_BUDGET, reserved=STREAM_RESERVED_CORES, nice=STREAM_NICENESS, pin=True):
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.budget = budget
+        self.nice = nice
+        # Without pinning, streams are only admitted and ffmpeg picks its own threads
+        self.pin = pin
+        self.reserved = cpus[:reserved] if reserved < len(cpus) else []
+        self.cores = cpus[len(self.reserved):]
+        self._load = {core: 0.0 for core in self.cores}
+        self._placements = {}
+        self._cond = threading.Condition()
+
+    def used(self):
+        return sum(p.cost for p in self._placements.values())
+
+    def available(self):
+        return self.budget - self.used()
+
+    def acquire(self, stream_id, cost, timeout=0):
+        """Place a stream, waiting up to `timeout` seconds for budget; None if it stays exhausted
+
+        A stream already placed keeps its placement, so a caller can reserve
+        one before handing the stream to the engine.
+        """
+        start = time.monotonic()
+        with self._cond:
+            if stream_id in self._placements:
+                return self._placements[stream_id]
+
+            # An empty host takes any one stream, however costly
+            if not self._cond.wait_for(lambda: not self._placements or self.used() + cost <= self.budget, timeout):
+                REFUSALS.inc()
+                return None
+            ADMISSION_WAIT.observe(time.monotonic() - start)
+
+            if self.pin:
+                # The least loaded cores; re-encodes get a whole core per encode unit
+                count = min(max(1, math.ceil(cost)), len(self.cores))
+                cores = sorted(self.cores, key=lambda core: (self._load[core], core))[:count]
+                for core in cores:
+                    self._load[core] += cost / count
+                placement = Placement(stream_id, cost, cores, count if cost >= 1 else None, self.nice)
+            else:
+                placement = Placement(stream_id, cost, [], None, 0)
+            self._placements[stream_id] = placement
+            BUDGET_USED.set(self.used())
+            STREAM_CORES.set(len(placement.cores), stream=stream_id)
+            return placement
+
+    def release(self, stream_id):
+        with self._cond:
+            placement = self._placements.pop(stream_id, None)
+            if placement is None:
+                return
+            for core in placement.cores:
+                self._load[core] = max(0.0, self._load[core] - placement.cost / len(placement.cores))
+            BUDGET_USED.set(self.used())
+            STREAM_CORES.remove(stream=stream_id)
+            SPEED_MARGIN.remove(stream=stream_id)
+            self._cond.notify_all()
+
+    def apply(self, placement, pid, helper=False):
+        """Pin a started ffmpeg's threads to its cores and lower their priority
+
+        Threads ffmpeg starts later inherit both from its main thread. A
+        helper, like the stream's publisher, shares the placement without
+        being the process whose CPU use is measured.
+        """
+        if not helper:
+            placement.pid = pid
+            placement.cpu = None
+            placement._sample = None
+        try:
+            threads = [int(tid) for tid in os.listdir(f"/proc/{pid}/task")]
+        except OSError:
+            threads = [pid]
+        for tid in threads:
+            try:
+                if placement.cores and hasattr(os, "sched_setaffinity"):
+                    os.sched_setaffinity(tid, placement.cores)
+                if placement.nice:
+                    # Per thread on Linux, hence every task rather than just the pid
+                    os.setpriority(os.PRIO_PROCESS, tid, placement.nice)
+            except OSError:
+                # Exited meanwhile, or not permitted; the stream runs unpinned
+                pass
+
+    def observe(self, stream_id, speed):
+        placement = self._placements.get(stream_id)
+        if placement is not None:
+            placement.observe(speed)
+
+    def share(self, placement):
+        """Cores' worth of CPU a stream can count on while its cores are shared by cost"""
+        if not placement.cores:
+            return len(self.cores + self.reserved) * placement.cost / max(self.used(), placement.cost)
+        part = placement.cost / len(placement.cores)
+        return sum(part / max(self._load[core], part) for core in placement.cores)
+
+    def placements(self):
+        """Every running stream's placement and speed margin"""
+        with self._cond:
+            shares = [(p, self.share(p)) for p in self._placements.values()]
+        return [p.describe(share) for p, share in shares]
+
+    def status(self):
+        return {
+            "budget": self.budget,
+            "used": self.used(),
+            "cores": format_cores(self.cores),
+            "reserved": format_cores(self.reserved),
+            "streams": self.placements()
+        }
+
+_governor = None
+_governor_lock = threading.Lock()
+
+def get_governor():
+    """The process-wide resource governor"""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ResourceGovernor()
+        return _governor
+
+def configure_governor(**settings):
+    """Replace the process-wide governor before any stream starts, as the benchmarks do"""
+    global _governor
+    with _governor_lock:
+        _governor = ResourceGovernor(**settings)
+        return _governor
@@ -0,0 +1,93 @@
+import os
+import time
+import hashlib
+import threading
+from constants import RESUME_DIR, RESUME_CHECKPOINT_SECONDS, RESUME_MAX_AGE
+from file_utils import read_json, write_json_atomic
+from media_utils import file_signature
+
+def checkpoint_path(stream_key, video_path, resume_dir=RESUME_DIR):
+    """Checkpoint file of one video streamed to one stream key"""
+    key = hashlib.sha1(f"{stream_key}\0{os.path.abspath(video_path)}".encode()).hexdigest()[:20]
+    return os.path.join(resume_dir, f"{key}.json")
+
+def load_checkpoint(stream_key, video_path, resume_dir=RESUME_DIR, max_age=RESUME_MAX_AGE):
+    """Position a crashed stream of this video reached, or None if it ended cleanly, the file changed or it is older than `max_age`"""
+    checkpoint = read_json(checkpoint_path(stream_key, video_path, resume_dir))
+    if checkpoint is None or tuple(checkpoint["signature"]) != file_signature(video_path):
+        return None
+    if time.time() - checkpoint.get("updated_at", 0) > max_age:
+        return None
+    return checkpoint["position"]
+
+class CheckpointWriter:
+    """Writes and removes checkpoint files on a thread of its own
+
+    Positions arrive on the shared pipe reader thread, which must not wait on
+    the disk. Only the latest pending operation per file is kept, so a slow
+    disk delays checkpoints rather than queueing them.
+    """
+
+    def __init__(self):
+        # Path to the data to write, or None to remove the file
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path, data):
+        with self._cond:
+            self._pending[path] = data
+            self._cond.notify()
+
+    def remove(self, path):
+        self.write(path, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                path = next(iter(self._pending))
+                data = self._pending.pop(path)
+            try:
+                if data is None:
+                    if os.path.exists(path):
+                        os.remove(path)
+                else:
+                    write_json_atomic(path, data)
+            except OSError:
+                # The next checkpoint of the stream tries again
+                pass
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_checkpoint_writer():
+    """The process-wide checkpoint writer"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = CheckpointWriter()
+        return _writer
+
+class Checkpointer:
+    """Persists a stream's source position at most every RESUME_CHECKPOINT_SECONDS, off the calling thread"""
+
+    def __init__(self, stream_key, video_path, resume_dir=RESUME_DIR):
+        self.path = checkpoint_path(stream_key, video_path, resume_dir)
+        self.signature = file_signature(video_path)
+        self.position = None
+        self._written_at = 0.0
+
+    def update(self, position):
+        self.position = position
+        now = time.monotonic()
+        if now - self._written_at < RESUME_CHECKPOINT_SECONDS:
+            return
+
+        self._written_at = now
+        get_checkpoint_writer().write(self.path, {"position": position, "signature": self.signature, "updated_at": time.time()})
+
+    def clear(self):
+        get_checkpoint_writer().remove(self.path)
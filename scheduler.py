@@ -0,0 +1,406 @@
+"""Stream scheduler: starts and stops streams at set times, preparing each ahead of its slot
+
+Run headless with `python scheduler.py run`, or let the Streamlit app start it.
+Jobs live in SQLite, so they survive restarts; one scheduler should run per
+data directory.
+"""
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from constants import (
+    SCHEDULE_DB,
+    SCHEDULER_PREP_AHEAD,
+    SCHEDULER_START_GRACE,
+    STREAM_COSTS
+)
+from stream_prep import prepare_video, prep_tasks
+from prep_farm import get_prep_farm, PRIORITY_SCHEDULED
+from resource_governor import get_governor
+from youtube_auth import get_credential_manager
+from import_utils import lazy_import
+from metrics import counter, gauge, histogram
+
+# ffmpeg and everything streaming needs is only loaded once a job runs
+engine = lazy_import("stream_engine")
+
+JOBS_STARTED = counter("scheduler_jobs_started_total", "Scheduled streams started")
+JOB_FAILURES = counter("scheduler_job_failures_total", "Scheduled streams that failed, by stage")
+START_DELAY = histogram("scheduler_start_delay_seconds", "Time from a job's slot to launching its stream")
+BUDGET_USED = gauge("scheduler_budget_used", "Encode units taken by running scheduled streams")
+
+# How often the queue is checked, in seconds
+TICK_SECONDS = 1
+
+# ffmpeg output kept per job for the UI
+JOB_LOG_LINES = 50
+
+# Jobs not yet finished; "running" jobs are owned by a live stream thread
+ACTIVE_STATUSES = ("scheduled", "preparing", "ready", "running")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_path TEXT NOT NULL,
+    stream_key TEXT NOT NULL,
+    start_at REAL NOT NULL,
+    stop_at REAL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'scheduled',
+    prepared TEXT,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_start ON jobs (status, start_at);
+"""
+
+class JobStore:
+    """Persistent queue of scheduled streams"""
+
+    def __init__(self, path=SCHEDULE_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Autocommit; every status change is a single statement
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+        # Stream keys are stored here
+        os.chmod(path, 0o600)
+
+    def _row(self, row):
+        job = dict(row)
+        job["options"] = json.loads(job["options"])
+        job["prepared"] = json.loads(job["prepared"]) if job["prepared"] else None
+        return job
+
+    def add(self, video_path, stream_key, start_at, stop_at=None, **options):
+        """Queue a stream; returns the job id"""
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (video_path, stream_key, start_at, stop_at, options, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(video_path), stream_key, start_at, stop_at, json.dumps(options), time.time())
+            )
+            return cursor.lastrowid
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, statuses=None, before=None):
+        """Jobs in slot order, optionally only those in `statuses` starting by `before`"""
+        query, params = "SELECT * FROM jobs WHERE 1", []
+        if statuses:
+            query += f" AND status IN ({', '.join('?' * len(statuses))})"
+            params += list(statuses)
+        if before is not None:
+            query += " AND start_at <= ?"
+            params.append(before)
+
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY start_at, id", params).fetchall()
+        return [self._row(row) for row in rows]
+
+    def claim(self, job_id, from_statuses, to_status, **fields):
+        """Move a job to `to_status` only if it is still in one of `from_statuses`"""
+        assignments = ", ".join(["status = ?"] + [f"{name} = ?" for name in fields])
+        values = [to_status] + [self._encode(name, value) for name, value in fields.items()]
+        with self.lock:
+            cursor = self.conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status IN ({', '.join('?' * len(from_statuses))})",
+                values + [job_id] + list(from_statuses)
+            )
+        return cursor.rowcount == 1
+
+    def update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        values = [self._encode(name, value) for name, value in fields.items()]
+        with self.lock:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", values + [job_id])
+
+    @staticmethod
+    def _encode(name, value):
+        return json.dumps(value) if name in ("options", "prepared") and value is not None else value
+
+def job_stream_id(job_id):
+    return f"job-{job_id}"
+
+def job_cost(job):
+    """Share of the host budget a job takes while streaming"""
+    prepared = job["prepared"] or {}
+    return STREAM_COSTS["passthrough"] if prepared.get("passthrough") else STREAM_COSTS["encode"]
+
+class StreamScheduler:
+    """Prepares queued streams ahead of their slot, then starts and stops them through the engine"""
+
+    def __init__(self, store=None, governor=None, prep_workers=2):
+        self.store = store or JobStore()
+        # Shared with streams started from the UI, so the host budget covers both
+        self.governor = governor or get_governor()
+        self.last_error = None
+        self.logs = {}
+
+        # Streams launched by this process: job id -> (stream id, cost)
+        self._running = {}
+        self._stop_requested = set()
+        self._lock = threading.Lock()
+        self._prep_pool = ThreadPoolExecutor(max_workers=prep_workers, thread_name_prefix="stream-prep")
+        self._thread = None
+
+    def start(self):
+        """Recover interrupted jobs and start the scheduling thread once"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="stream-scheduler", daemon=True)
+        self.recover()
+        self._thread.start()
+
+    def recover(self):
+        """Requeue jobs a previous process left half-done while their window is still open"""
+        now = time.time()
+        for job in self.store.list(("preparing", "running")):
+            if job["status"] == "preparing":
+                self.store.update(job["id"], status="scheduled")
+            elif now - job["start_at"] <= SCHEDULER_START_GRACE:
+                # The engine resumes it from its checkpoint; the prepared file is still valid
+                self.store.update(job["id"], status="ready")
+            else:
+                self.store.update(job["id"], status="failed", error="Interrupted by a restart")
+
+    def _run(self):
+        while True:
+            try:
+                self.tick()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"Scheduler tick failed: {e}"
+            time.sleep(TICK_SECONDS)
+
+    def tick(self, now=None):
+        now = now or time.time()
+        self.prepare_due(now)
+        self.start_due(now)
+        self.stop_due(now)
+
+    def prepare_due(self, now):
+        """Hand jobs entering the preparation window to the prep workers"""
+        for job in self.store.list(("scheduled",), before=now + SCHEDULER_PREP_AHEAD):
+            if self.store.claim(job["id"], ("scheduled",), "preparing"):
+                self._prep_pool.submit(self.prepare, job)
+
+    def prepare(self, job):
+        """Probe, transcode or remux and refresh credentials, so the slot only launches ffmpeg"""
+        options = job["options"]
+        is_shorts = options.get("is_shorts", False)
+        transcode_video = options.get("transcode", True)
+        try:
+            # Shares the farm's workers and cache, ahead of batch library runs
+            manifest = get_prep_farm().submit(
+                job["video_path"], prep_tasks(transcode_video), is_shorts, priority=PRIORITY_SCHEDULED
+            ).result()
+            prepared = prepare_video(job["video_path"], is_shorts, transcode_video, manifest=manifest)
+        except Exception as e:
+            self.store.claim(job["id"], ("preparing",), "failed", error=f"Preparation failed: {e}")
+            JOB_FAILURES.inc(stage="prepare")
+            return
+
+        self.refresh_credentials(job)
+        # A job cancelled meanwhile stays cancelled
+        self.store.claim(job["id"], ("preparing",), "ready", prepared=prepared)
+
+    def refresh_credentials(self, job):
+        """Refresh the YouTube token now if it would otherwise expire during the stream"""
+        manager = get_credential_manager()
+        try:
+            remaining = manager.seconds_until_refresh()
+            ends_at = job["stop_at"] or job["start_at"]
+            if remaining is not None and time.time() + remaining < ends_at:
+                manager.refresh()
+        except Exception as e:
+            # The stream itself only needs its key; analytics will retry on their own
+            self.log(job["id"], f"Credential refresh failed: {e}")
+
+    def start_due(self, now):
+        """Launch ready jobs whose slot has come, while the host budget allows"""
+        for job in self.store.list(("preparing", "ready"), before=now):
+            if now - job["start_at"] > SCHEDULER_START_GRACE or (job["stop_at"] and job["stop_at"] <= now):
+                reason = "still preparing" if job["status"] == "preparing" else "no capacity on this host"
+                if self.store.claim(job["id"], (job["status"],), "skipped", error=f"Missed its slot: {reason}"):
+                    JOB_FAILURES.inc(stage="start")
+                continue
+            if job["status"] != "ready":
+                continue
+
+            # Reserved here and picked up by the engine; waits for a running
+            # stream to end, until its grace period runs out
+            cost = job_cost(job)
+            stream_id = job_stream_id(job["id"])
+            if self.governor.acquire(stream_id, cost) is None:
+                continue
+            if self.store.claim(job["id"], ("ready",), "running", error=None):
+                self.launch(job, cost, now)
+            else:
+                self.governor.release(stream_id)
+
+    def stop_due(self, now):
+        with self._lock:
+            running = list(self._running)
+        for job_id in running:
+            job = self.store.get(job_id)
+            if job and job["stop_at"] and job["stop_at"] <= now:
+                self.stop_job(job_id)
+
+    def budget_used(self):
+        with self._lock:
+            return sum(cost for _, cost in self._running.values())
+
+    def launch(self, job, cost, now):
+        stream_id = job_stream_id(job["id"])
+        with self._lock:
+            self._running[job["id"]] = (stream_id, cost)
+        BUDGET_USED.set(self.budget_used())
+        JOBS_STARTED.inc()
+        START_DELAY.observe(max(0, now - job["start_at"]))
+
+        threading.Thread(target=self._stream, args=(job, stream_id), name=stream_id, daemon=True).start()
+
+    def _stream(self, job, stream_id):
+        prepared, options = job["prepared"], job["options"]
+        returncode = None
+        try:
+            returncode = engine.run_ffmpeg(
+                prepared["path"],
+                job["stream_key"],
+                prepared["is_shorts"],
+                options.get("is_loop", False),
+                lambda line: self.log(job["id"], line),
+                stream_id,
+                passthrough=prepared["passthrough"],
+                fast_start=True,
+                adaptive=options.get("adaptive", False),
+                overlays=options.get("overlays", False),
+                record=options.get("record", False),
+                loudness=prepared.get("loudness"),
+                cost=job_cost(job)
+            )
+        finally:
+            self.governor.release(stream_id)
+            with self._lock:
+                self._running.pop(job["id"], None)
+                stopped = job["id"] in self._stop_requested
+                self._stop_requested.discard(job["id"])
+            BUDGET_USED.set(self.budget_used())
+
+            if stopped or returncode == 0:
+                self.store.claim(job["id"], ("running",), "done")
+            else:
+                # run_ffmpeg returns None when ffmpeg never got going: the budget refused it or the launch failed
+                error = f"ffmpeg exited with code {returncode}" if returncode is not None else "Stream not started; see the job log"
+                self.store.claim(job["id"], ("running",), "failed", error=error)
+                JOB_FAILURES.inc(stage="stream")
+
+    def stop_job(self, job_id):
+        """Stop a running job's stream without blocking the scheduler"""
+        with self._lock:
+            if job_id not in self._running or job_id in self._stop_requested:
+                return
+            self._stop_requested.add(job_id)
+            stream_id = self._running[job_id][0]
+        threading.Thread(target=engine.stop_stream, args=(stream_id,), name=f"stop-{stream_id}", daemon=True).start()
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or stop it if it is already streaming"""
+        if self.store.claim(job_id, ("scheduled", "preparing", "ready"), "cancelled"):
+            return True
+        with self._lock:
+            running = job_id in self._running
+        if running:
+            self.stop_job(job_id)
+        return running
+
+    def log(self, job_id, line):
+        self.logs.setdefault(job_id, deque(maxlen=JOB_LOG_LINES)).append(line)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """The process-wide stream scheduler"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = StreamScheduler()
+        return _scheduler
+
+def parse_time(value):
+    """Seconds since the epoch from an ISO time, or from "+N" seconds from now"""
+    if value.startswith("+"):
+        return time.time() + float(value[1:])
+    return datetime.fromisoformat(value).timestamp()
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S") if timestamp else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("run", help="Run the scheduler in the foreground")
+
+    add = commands.add_parser("add", help="Queue a stream")
+    add.add_argument("video_path")
+    add.add_argument("stream_key")
+    add.add_argument("--start", required=True, help='ISO time, or "+SECONDS" from now')
+    add.add_argument("--stop", help='ISO time, or "+SECONDS" from now')
+    add.add_argument("--shorts", action="store_true")
+    add.add_argument("--loop", action="store_true")
+    add.add_argument("--no-transcode", action="store_true", help="Re-encode live instead of ahead of time")
+
+    commands.add_parser("list", help="Show queued and past jobs")
+
+    cancel = commands.add_parser("cancel", help="Cancel a queued job")
+    cancel.add_argument("job_id", type=int)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        scheduler = get_scheduler()
+        scheduler.start()
+        print(f"Scheduler running with a budget of {scheduler.governor.budget:g} encode units; Ctrl+C to quit")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "add":
+        job_id = JobStore().add(
+            args.video_path,
+            args.stream_key,
+            parse_time(args.start),
+            parse_time(args.stop) if args.stop else None,
+            is_shorts=args.shorts,
+            is_loop=args.loop,
+            transcode=not args.no_transcode
+        )
+        print(f"Queued job {job_id}")
+    elif args.command == "list":
+        for job in JobStore().list():
+            print(
+                f"{job['id']:>4}  {job['status']:<10} {format_time(job['start_at'])} -> {format_time(job['stop_at'])}  "
+                f"{os.path.basename(job['video_path'])}  {job['error'] or ''}"
+            )
+    elif args.command == "cancel":
+        # A running job is stopped by the scheduler that owns it
+        cancelled = JobStore().claim(args.job_id, ("scheduled", "preparing", "ready"), "cancelled")
+        print("Cancelled" if cancelled else "Job is not waiting to start")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,573 @@
+import os
+import time
+import uuid
+import queue
+import fcntl
+import signal
+import termios
+import threading
+import subprocess
+from array import array
+from datetime import datetime
+from constants import (
+    RTMP_URL,
+    METRICS_ENABLED,
+    FAST_START_BURST,
+    FAST_START_FIRST_GOP,
+    BITRATE_LADDER,
+    AUDIO_BITRATE,
+    ABR_GOP_SECONDS,
+    OVERLAY_FRAMERATE,
+    RESUME_MAX_RESTARTS,
+    RESUME_STABLE_SECONDS,
+    RESUME_RETRY_DELAY,
+    STREAM_COSTS,
+    STREAM_ADMISSION_TIMEOUT,
+    SPLIT_PUBLISHER
+)
+from encoder_metrics import create_recorder, remove_recorder
+from bitrate_control import create_controller, remove_controller, scale_filter
+from history_store import archive_stream
+from media_utils import preflight_input, keyframe_index, keyframe_before, ffmpeg_has_option
+from stream_prep import cached_manifest, loudness_gain
+from resume_store import Checkpointer, load_checkpoint
+from overlay_engine import OverlayUpdater
+from pipe_reader import get_pipe_reader
+from packet_ring import PacketRing, CopyRelay, publisher_command
+from dvr_recorder import start_recording
+from live_events import publish_encoder_stats
+from resource_governor import get_governor, format_cores
+from youtube_api import get_client
+from metrics import counter, gauge, histogram
+
+STREAMS_STARTED = counter("streams_started_total", "ffmpeg streams started")
+STREAMS_RUNNING = gauge("streams_running", "ffmpeg streams currently running")
+FFMPEG_EXITS = counter("ffmpeg_exits_total", "ffmpeg exits by return code")
+STREAM_SPEED = gauge("stream_speed", "Latest encode speed as a multiple of realtime")
+READER_BACKLOG = gauge("ffmpeg_reader_backlog_bytes", "ffmpeg output waiting unread in the pipe")
+GO_LIVE_SECONDS = histogram("go_live_seconds", "Time from launching ffmpeg to each startup milestone")
+
+# How long a publisher gets to send what is left in the ring once its encoder exits, in seconds
+PUBLISHER_DRAIN_SECONDS = 10
+
+# How ffmpeg exits after the SIGTERM of terminate(): its handler returns 255, or the signal itself if unhandled
+TERMINATED_EXIT_CODES = (255, -signal.SIGTERM)
+
+# Startup milestones in the order ffmpeg reaches them
+START_MILESTONES = ("input_opened", "output_opened", "first_frame")
+
+# Running ffmpeg processes by stream id, their frame feeds, and streams being stopped for good
+_processes = {}
+_feeds = {}
+_stopping = set()
+_processes_lock = threading.Lock()
+
+def build_ffmpeg_command(video_path, output_url, is_shorts=False, is_loop=False, passthrough=False, fast_start=False, probed=False, rung=None, start_at=0, keyframe_grid=False, frame_feed=None, overlay_path=None, threads=None, audio_gain=None, copy_audio=False):
+    """Build the ffmpeg command line for streaming a video file"""
+    rung = rung or BITRATE_LADDER[0]
+    cmd = ["ffmpeg"]
+
+    if threads and not passthrough:
+        # Sized to the stream's cores, rather than every core on the host
+        cmd += ["-filter_threads", str(threads)]
+
+    if frame_feed is not None:
+        # Raw frames from a Python producer, with silent audio for the ingest
+        cmd += frame_feed.input_args()
+        cmd += ["-f", "lavfi", "-i", "anullsrc=channel_layout=stereo:sample_rate=48000"]
+    else:
+        if fast_start and ffmpeg_has_option("readrate_initial_burst"):
+            # Send the first keyframe interval faster than realtime, then pace at 1x
+            cmd += ["-readrate", "1", "-readrate_initial_burst", str(FAST_START_BURST)]
+        else:
+            cmd += ["-re"]
+
+        if fast_start:
+            if probed:
+                # Streams are known from the preflight, so skip most of the analysis
+                cmd += ["-analyzeduration", "0", "-probesize", "1000000"]
+
+        if is_loop:
+            cmd += ["-stream_loop", "-1"]
+
+        if start_at > 0:
+            # Continue a restarted stream where the previous encode left off
+            cmd += ["-ss", f"{start_at:.3f}"]
+
+        if threads and not passthrough:
+            cmd += ["-threads", str(threads)]
+
+        cmd += ["-i", video_path]
+
+    if overlay_path and not passthrough:
+        # Re-read in realtime, so the image can be replaced while streaming
+        cmd += ["-re", "-f", "image2", "-loop", "1", "-framerate", str(OVERLAY_FRAMERATE), "-i", overlay_path]
+
+    if frame_feed is not None:
+        # End with the frames rather than the endless silence, in a pixel format the ingest takes
+        cmd += ["-shortest", "-pix_fmt", "yuv420p"]
+
+    if passthrough:
+        # Already ingest-ready content is sent as is
+        cmd += ["-c", "copy"]
+    else:
+        bitrate = rung["video_bitrate"]
+        cmd += [
+            "-c:v", "libx264", "-preset", "veryfast", "-b:v", f"{bitrate}k",
+            "-maxrate", f"{bitrate}k", "-bufsize", f"{bitrate * 2}k",
+            "-g", "60", "-keyint_min", "60"
+        ]
+        if copy_audio:
+            # Already at the target loudness and in a codec the ingest takes
+            cmd += ["-c:a", "copy"]
+        else:
+            cmd += ["-c:a", "aac", "-b:a", f"{AUDIO_BITRATE}k"]
+            if audio_gain:
+                # Precomputed from the library's loudness measurement, so a plain linear gain
+                cmd += ["-af", f"volume={audio_gain}dB"]
+        if threads:
+            cmd += ["-threads", str(threads)]
+
+        if keyframe_grid and fast_start:
+            # Keyframes at 0, the early second one, then every GOP
+            cmd += ["-force_key_frames", f"expr:if(lt(n_forced,2),gte(t,n_forced*{FAST_START_FIRST_GOP}),gte(t,(n_forced-1)*{ABR_GOP_SECONDS}))"]
+        elif keyframe_grid:
+            # A fixed keyframe grid lets ladder switches cut over on a GOP boundary
+            cmd += ["-force_key_frames", f"expr:gte(t,n_forced*{ABR_GOP_SECONDS})"]
+        elif fast_start:
+            # A short first GOP gives the ingest a second keyframe early
+            cmd += ["-force_key_frames", str(FAST_START_FIRST_GOP)]
+
+        scale = scale_filter(rung, is_shorts)
+        audio = "1:a" if frame_feed is not None else "0:a?"
+        if overlay_path:
+            # Composited at the source size, before any scaling
+            overlay_input = 2 if frame_feed is not None else 1
+            # The overlay image never ends, so the video has to end the graph
+            graph = f"[0:v][{overlay_input}:v]overlay=0:0:eof_action=repeat:shortest=1"
+            if scale:
+                graph += f",{scale}"
+            cmd += ["-filter_complex", f"{graph}[v]", "-map", "[v]", "-map", audio]
+        else:
+            if scale:
+                cmd += ["-vf", scale]
+            if frame_feed is not None:
+                cmd += ["-map", "0:v", "-map", audio]
+
+    # Machine-readable progress once per second, recorded by the encoder metrics
+    cmd += ["-progress", "pipe:1", "-stats_period", "1", "-nostats"]
+
+    if output_url.startswith("pipe:"):
+        # A pipe cannot be seeked back to fill in the header at the end
+        cmd += ["-flvflags", "no_duration_filesize"]
+
+    cmd += ["-f", "flv", output_url]
+    return cmd
+
+def run_ffmpeg(video_path, stream_key, is_shorts, is_loop, log_callback, stream_id=None, rtmp_url=RTMP_URL, passthrough=False, fast_start=False, adaptive=False, frame_feed=None, overlays=False, resume=True, cost=None, record=False, loudness=None):
+    """Run the ffmpeg stream until it ends, recording its encoder metrics; returns ffmpeg's last exit code
+
+    The stream is admitted within the host budget at `cost` encode units (by
+    default per STREAM_COSTS) and returns None without starting if the budget
+    stays exhausted for STREAM_ADMISSION_TIMEOUT. With `record`, what is
+    published is also copied into local DVR segments. Re-encoded audio is
+    normalized with the `loudness` measured by preparation, looked up in the
+    preparation cache when not given.
+    """
+    output_url = f"{rtmp_url}/{stream_key}"
+    media = None
+    if frame_feed is not None:
+        # A live producer can be neither burst nor restarted at another position
+        fast_start = adaptive = passthrough = False
+    elif fast_start or adaptive or overlays or (resume and is_loop):
+        # Normally already done when the video was selected, so this is a cache hit
+        preflight = preflight_input(video_path)
+        media = preflight["info"]
+        if preflight["error"]:
+            log_callback(f"Preflight failed, opening the input unprobed: {preflight['error']}")
+        if fast_start and not ffmpeg_has_option("readrate_initial_burst"):
+            log_callback("This ffmpeg cannot burst the first seconds (needs 6.1 or later); reading the input at realtime")
+
+    audio_gain, copy_audio = loudness_adjustment(video_path, media, loudness, log_callback) if frame_feed is None and not passthrough else (None, False)
+
+    # Names directories, files and catalog entries, so never the secret stream key
+    stream_id = stream_id or uuid.uuid4().hex
+    overlay = None
+    if overlays and not passthrough:
+        # Overlays are drawn at the input's size, known from the feed or the preflight
+        if frame_feed is not None:
+            overlay = OverlayUpdater(stream_id, frame_feed.width, frame_feed.height)
+        elif media and media["width"] and media["height"]:
+            overlay = OverlayUpdater(stream_id, media["width"], media["height"])
+        else:
+            log_callback("Overlays need the video size from the preflight; streaming without them")
+
+    recorder = create_recorder(stream_id)
+    # A copied stream cannot change bitrate, so the ladder only applies to re-encodes
+    controller = create_controller(stream_id) if adaptive and not passthrough else None
+    started_at = datetime.now()
+    milestones = {}
+    position = 0.0
+    returncode = None
+    restarts = 0
+    ended = False
+
+    # A file stream checkpoints its position, so a crash or restart continues where it stopped
+    checkpointer = None
+    if resume and frame_feed is None and os.path.exists(video_path):
+        checkpointer = Checkpointer(stream_key, video_path)
+        saved = load_checkpoint(stream_key, video_path)
+        if saved:
+            position = resume_position(video_path, saved)
+            log_callback(f"Resuming at {position:.1f}s, where a previous run of this video stopped")
+        threading.Thread(target=index_keyframes, args=(video_path,), name=f"keyframes-{stream_id}", daemon=True).start()
+
+    # Admitted within the host budget, on cores of its own
+    governor = get_governor()
+    if cost is None:
+        cost = STREAM_COSTS["passthrough"] if passthrough else STREAM_COSTS["encode"]
+    placement = governor.acquire(stream_id, cost)
+    if placement is None:
+        log_callback(
+            f"Host budget in use ({governor.used():g} of {governor.budget:g} encode units); "
+            f"waiting up to {STREAM_ADMISSION_TIMEOUT}s for a stream to end"
+        )
+        placement = governor.acquire(stream_id, cost, STREAM_ADMISSION_TIMEOUT)
+    if placement is None:
+        log_callback("Host budget still exhausted; not starting the stream")
+        if frame_feed is not None:
+            frame_feed.stop()
+        return None
+    log_callback(
+        f"Placement: cores {format_cores(placement.cores)}, "
+        f"{placement.threads or 'default'} encoder threads, nice {placement.nice}"
+    )
+
+    if record and not SPLIT_PUBLISHER:
+        log_callback("Local recording copies from the packet ring and needs STREAM_SPLIT_PUBLISHER=1; not recording")
+
+    with _processes_lock:
+        _stopping.discard(stream_id)
+        if frame_feed is not None:
+            _feeds[stream_id] = frame_feed
+
+    try:
+        STREAMS_STARTED.inc()
+        if overlay is not None:
+            overlay.start()
+
+        while True:
+            # With split publishing the encoder writes to a pipe, and a separate
+            # publisher sends its packet ring on to the ingest
+            encoder_url = output_url
+            if SPLIT_PUBLISHER:
+                ring_fd, encoder_fd = os.pipe()
+                encoder_url = f"pipe:{encoder_fd}"
+
+            cmd = build_ffmpeg_command(
+                video_path, encoder_url, is_shorts, is_loop, passthrough, fast_start,
+                probed=media is not None,
+                rung=controller.current if controller else None,
+                start_at=position,
+                keyframe_grid=controller is not None,
+                frame_feed=frame_feed,
+                overlay_path=overlay.path if overlay is not None else None,
+                threads=placement.threads,
+                audio_gain=audio_gain,
+                copy_audio=copy_audio
+            )
+            log_callback(f"Running command: {' '.join(cmd)}")
+
+            # Output is parsed on the shared reader thread; only log lines come back here
+            messages = queue.SimpleQueue()
+
+            stdin = frame_feed.open() if frame_feed is not None else None
+            launched = time.monotonic()
+            process = subprocess.Popen(
+                cmd,
+                stdin=stdin,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                bufsize=0,
+                pass_fds=(encoder_fd,) if SPLIT_PUBLISHER else ()
+            )
+            governor.apply(placement, process.pid)
+            if frame_feed is not None:
+                if stdin is not None:
+                    os.close(stdin)
+                frame_feed.start(messages.put)
+            with _processes_lock:
+                _processes[stream_id] = process
+                if stream_id in _stopping:
+                    # Stopped while switching rungs
+                    process.terminate()
+            STREAMS_RUNNING.set(len(_processes))
+
+            # Set once the controller has cut this encode for a ladder switch
+            switch_cut = threading.Event()
+
+            relays = []
+            publisher = None
+            if SPLIT_PUBLISHER:
+                os.close(encoder_fd)
+                ring = buffer_output(stream_id, ring_fd, messages.put)
+                publisher = start_publisher(ring, stream_id, output_url, placement, process, messages.put)
+                relays.append(publisher)
+                if record:
+                    # Copied from the same ring, so recording costs no second encode and never holds up publishing
+                    relays.append(start_recording(
+                        ring, stream_id, messages.put,
+                        on_start=lambda pid: governor.apply(placement, pid, helper=True)
+                    ))
+
+            def on_line(raw, process=process, launched=launched, switch_cut=switch_cut, publisher=publisher):
+                line = raw.decode(errors="replace")
+                if not recorder.feed_line(line):
+                    messages.put(line.strip())
+                elif line.startswith("progress="):
+                    if METRICS_ENABLED:
+                        update_stream_gauges(stream_id, recorder, process)
+                    publish_encoder_stats(stream_id, recorder)
+                    if recorder.version:
+                        governor.observe(stream_id, recorder.speed[-1])
+                    # Behind a publisher, the ladder follows what actually left for the ingest
+                    delivered = (publisher.sent_time, publisher.sent_bytes) if publisher is not None else None
+                    if controller and controller.update(recorder.out_time, recorder.total_size, delivered=delivered):
+                        switch_cut.set()
+                        process.terminate()
+                    if checkpointer is not None:
+                        checkpointer.update(source_position(position, recorder.out_time, media, is_loop))
+
+                if len(milestones) < len(START_MILESTONES):
+                    note_start_milestone(line, recorder, milestones, launched, fast_start, messages.put)
+
+            get_pipe_reader().register(process.stdout, on_line, lambda: messages.put(None), messages.put)
+            for message in iter(messages.get, None):
+                log_callback(message)
+            process.stdout.close()
+            returncode = process.wait()
+            if relays:
+                # Let the publisher send the end of the stream before anything restarts
+                for relay in relays:
+                    if not relay.join(PUBLISHER_DRAIN_SECONDS):
+                        log_callback(f"{relay.name} did not finish sending; stopping it")
+                    relay.stop()
+                while not messages.empty():
+                    message = messages.get()
+                    if message is not None:
+                        log_callback(message)
+            FFMPEG_EXITS.inc(code=returncode)
+
+            with _processes_lock:
+                stopping = stream_id in _stopping
+
+            if switch_cut.is_set() and returncode in TERMINATED_EXIT_CODES and not stopping:
+                # Resume from the keyframe the previous encode was cut at
+                position = source_position(position, controller.switch_at, media, is_loop)
+                change = controller.apply()
+                recorder.restart()
+                log_callback(
+                    f"Bitrate ladder: {change['from']} -> {change['to']} at {position:.1f}s "
+                    f"(speed {change['speed']:.2f}x, throughput {change['throughput']} kbit/s)"
+                )
+                continue
+
+            ended = returncode == 0 or stopping
+            if ended or checkpointer is None:
+                break
+
+            # ffmpeg failed; restart on the keyframe before the last confirmed position
+            if recorder.out_time >= RESUME_STABLE_SECONDS:
+                restarts = 0
+            if restarts >= RESUME_MAX_RESTARTS:
+                log_callback(f"ffmpeg exited with code {returncode}; giving up after {restarts} restarts")
+                break
+            restarts += 1
+            if checkpointer.position is not None:
+                position = resume_position(video_path, checkpointer.position)
+            recorder.restart()
+            log_callback(
+                f"ffmpeg exited with code {returncode}; resuming at {position:.1f}s "
+                f"(restart {restarts} of {RESUME_MAX_RESTARTS})"
+            )
+            if controller is not None and controller.pending is not None:
+                # The encode failed before reaching its cut; the restart moves to the pending rung instead
+                change = controller.apply()
+                log_callback(f"Bitrate ladder: {change['from']} -> {change['to']} with the restart")
+            time.sleep(RESUME_RETRY_DELAY)
+    except Exception as e:
+        log_callback(f"Error: {e}")
+    finally:
+        with _processes_lock:
+            _processes.pop(stream_id, None)
+            _feeds.pop(stream_id, None)
+            _stopping.discard(stream_id)
+        governor.release(stream_id)
+        STREAMS_RUNNING.set(len(_processes))
+        STREAM_SPEED.remove(stream=stream_id)
+        READER_BACKLOG.remove(stream=stream_id)
+        if frame_feed is not None:
+            frame_feed.stop()
+            log_callback(f"Frame feed: {frame_feed.stats()}")
+        if overlay is not None:
+            overlay.stop()
+        if checkpointer is not None and ended:
+            checkpointer.clear()
+        log_callback("Stream ended or stopped.")
+        archive_recording(stream_id, stream_key, recorder, controller, video_path or frame_feed.name, started_at, log_callback)
+        # The series and ladder summary live on in the history store
+        remove_recorder(stream_id)
+        remove_controller(stream_id)
+    return returncode
+
+def loudness_adjustment(video_path, media, loudness, log_callback):
+    """Gain to apply to a re-encoded file's audio, and whether it can be copied as it is instead"""
+    error = None
+    if loudness is None:
+        manifest = cached_manifest(video_path) if os.path.exists(video_path) else None
+        loudness = manifest["outputs"].get("loudness") if manifest else None
+        error = manifest.get("errors", {}).get("loudness") if manifest else None
+    gain = loudness_gain(loudness)
+
+    if gain is None:
+        if error:
+            log_callback(f"Loudness could not be measured ({error}); streaming the audio as it is")
+        else:
+            log_callback("Loudness not measured yet (Library Preparation measures it); streaming the audio as it is")
+        return None, False
+    if gain == 0:
+        media = media or preflight_input(video_path)["info"] or {}
+        if media.get("audio_codec") == "aac":
+            log_callback(f"Audio already at {loudness['integrated']:.1f} LUFS; copying it without re-encoding")
+            return None, True
+        return None, False
+    log_callback(f"Normalizing audio from {loudness['integrated']:.1f} LUFS with a {gain:+.1f} dB gain")
+    return gain, False
+
+def buffer_output(stream_id, ring_fd, log):
+    """Packet ring filled with the encoder's output from `ring_fd` on the shared reader thread"""
+    ring = PacketRing(stream_id)
+    pipe = os.fdopen(ring_fd, "rb", buffering=0)
+
+    def on_close():
+        ring.close()
+        pipe.close()
+
+    get_pipe_reader().register_data(pipe, ring.feed, on_close, log)
+    return ring
+
+def start_publisher(ring, stream_id, output_url, placement, encoder, log):
+    """Start sending a packet ring to the ingest
+
+    The publisher runs on the stream's cores. When it keeps failing, the
+    encoder is stopped too, so the stream's own restart takes over.
+    """
+    relay = CopyRelay(
+        ring, publisher_command(output_url), f"publisher-{stream_id}", log,
+        on_start=lambda pid: get_governor().apply(placement, pid, helper=True),
+        on_give_up=encoder.terminate
+    )
+    relay.start()
+    return relay
+
+def source_position(start, elapsed, media, is_loop):
+    """Position in the source video after streaming `elapsed` seconds from `start`"""
+    position = start + elapsed
+    if is_loop and media and media["duration"]:
+        position %= media["duration"]
+    return position
+
+def resume_position(video_path, position):
+    """Keyframe at or before `position`, so a restart repeats at most one GOP and loses nothing"""
+    keyframe = keyframe_before(video_path, position)
+    # Without an index yet, ffmpeg's own input seek lands on the preceding keyframe
+    return keyframe if keyframe is not None else position
+
+def index_keyframes(video_path):
+    """Build the video's keyframe index ahead of any resume; a no-op once cached"""
+    try:
+        keyframe_index(video_path)
+    except (OSError, ValueError, subprocess.SubprocessError):
+        pass
+
+def note_start_milestone(line, recorder, milestones, launched, fast_start, log_callback):
+    """Time ffmpeg's startup from its output and log the go-live timings once complete"""
+    if line.startswith("Input #0"):
+        name = "input_opened"
+    elif line.startswith("Output #0"):
+        name = "output_opened"
+    elif line.startswith("progress=") and recorder.out_time > 0:
+        # Accurate to the progress period; the pipeline benchmark times it at the sink
+        name = "first_frame"
+    else:
+        return
+
+    if name in milestones:
+        return
+    milestones[name] = time.monotonic() - launched
+    GO_LIVE_SECONDS.observe(milestones[name], stage=name, fast_start=fast_start)
+
+    if len(milestones) == len(START_MILESTONES):
+        timings = ", ".join(f"{name.replace('_', ' ')} {milestones[name] * 1000:.0f} ms" for name in START_MILESTONES)
+        log_callback(f"Go-live timings ({'fast start' if fast_start else 'standard start'}): {timings}")
+
+def update_stream_gauges(stream_id, recorder, process):
+    """Publish the latest speed and how far the log reader lags behind ffmpeg"""
+    if recorder.version:
+        STREAM_SPEED.set(recorder.speed[-1], stream=stream_id)
+
+    pending = array("i", [0])
+    fcntl.ioctl(process.stdout.fileno(), termios.FIONREAD, pending)
+    READER_BACKLOG.set(pending[0], stream=stream_id)
+
+def get_process(stream_id):
+    """The running ffmpeg process of a stream, if any"""
+    with _processes_lock:
+        return _processes.get(stream_id)
+
+def stop_stream(stream_id, timeout=10):
+    """Stop one stream's ffmpeg, letting it flush before killing it"""
+    with _processes_lock:
+        process = _processes.get(stream_id)
+        if process is None:
+            return False
+        feed = _feeds.get(stream_id)
+        # Keeps an adaptive stream from restarting on another rung
+        _stopping.add(stream_id)
+
+    if feed is not None:
+        # ffmpeg keeps reading a live pipe through SIGTERM; end of input stops it cleanly
+        feed.stop()
+    else:
+        process.terminate()
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+    return True
+
+def archive_recording(stream_id, stream_key, recorder, controller, video_path, started_at, log_callback):
+    """Add a finished stream's recorded series to the analytics history"""
+    if not recorder.version:
+        return
+
+    series = recorder.columns()
+    try:
+        # Viewers of the broadcast this stream's key fed, from when the stream started
+        series.update(get_client().stream_columns(stream_key, started_at.timestamp()))
+    except Exception as e:
+        log_callback(f"Archiving without viewer and chat series: {e}")
+
+    metadata = {
+        "title": os.path.basename(video_path),
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "duration": recorder.seconds[-1]
+    }
+    if controller is not None:
+        metadata.update(controller.summary())
+
+    try:
+        archive_stream(stream_id, series, metadata)
+    except OSError as e:
+        log_callback(f"Could not archive stream analytics: {e}")
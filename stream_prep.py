@@ -0,0 +1,265 @@
+import os
+import json
+import math
+import time
+import signal
+import fcntl
+import hashlib
+import tempfile
+import subprocess
+from constants import PREP_CACHE_DIR, BITRATE_LADDER, AUDIO_BITRATE, LIBRARY_DIR, LOUDNESS_TARGET, LOUDNESS_TRUE_PEAK, LOUDNESS_TOLERANCE
+from file_utils import read_json, write_json_atomic
+from media_utils import preflight_input, needs_faststart, file_signature, keyframe_index
+from video_library import hash_file, load_index
+from bitrate_control import scale_filter
+
+# Offline encodes can afford a slower preset than the live encoder at the same bitrate
+TRANSCODE_PRESET = "medium"
+
+# Preparation steps in the order they run; the transcode is by far the slowest
+PREP_TASKS = ("probe", "keyframes", "faststart", "poster", "loudness", "transcode")
+
+# Poster frames are taken this far into the video, and scaled to this width
+POSTER_POSITION = 0.1
+POSTER_WIDTH = 640
+
+def content_hash(video_path, compute=True):
+    """sha256 of a file's content, read once per version of the file; None if not yet hashed and not `compute`"""
+    path = os.path.abspath(video_path)
+    size, mtime = file_signature(path)
+
+    # Library files were hashed when they were added
+    if os.path.dirname(path) == os.path.abspath(LIBRARY_DIR):
+        entry = load_index().get(os.path.basename(path))
+        if entry and entry["size"] == size:
+            return entry["sha256"]
+
+    sidecar = os.path.join(PREP_CACHE_DIR, "hashes", hashlib.sha1(path.encode()).hexdigest()[:20] + ".json")
+    cached = read_json(sidecar)
+    if cached and cached["signature"] == [size, mtime]:
+        return cached["sha256"]
+    if not compute:
+        return None
+
+    sha256 = hash_file(path).hexdigest()
+    write_json_atomic(sidecar, {"signature": [size, mtime], "sha256": sha256})
+    return sha256
+
+def prep_dir(sha256, cache_dir=PREP_CACHE_DIR):
+    """Directory holding everything prepared from one content hash"""
+    return os.path.join(cache_dir, sha256[:32])
+
+def cached_manifest(video_path, cache_dir=PREP_CACHE_DIR):
+    """What has been prepared from a file so far, without hashing it; None if nothing is known"""
+    sha256 = content_hash(video_path, compute=False)
+    return read_json(os.path.join(prep_dir(sha256, cache_dir), "manifest.json")) if sha256 else None
+
+def transcode_name(is_shorts=False):
+    """Output name of the ingest rendition for the current stream settings"""
+    settings = repr((BITRATE_LADDER[0]["video_bitrate"], AUDIO_BITRATE, TRANSCODE_PRESET, is_shorts, LOUDNESS_TARGET))
+    return "ingest-" + hashlib.sha1(settings.encode()).hexdigest()[:12]
+
+def prep_tasks(transcode_video=True):
+    """Steps needed before streaming a video with or without a prepared encode"""
+    return ("probe", "loudness", "transcode") if transcode_video else ("probe", "loudness", "faststart")
+
+# How ffmpeg exits when a cancel stops it, as opposed to failing on its own
+STOPPED_EXIT_CODES = (255, -signal.SIGTERM)
+
+def run_with_progress(cmd, duration=None, progress=None):
+    """Run an offline ffmpeg job to completion; returns its exit code and stderr
+
+    `progress(fraction, pid)` is called as ffmpeg works through `duration` seconds.
+    """
+    progress = progress or (lambda fraction, pid=None: None)
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd + ["-progress", "pipe:1", "-nostats"], stdout=subprocess.PIPE, stderr=errors, text=True)
+        progress(0.0, process.pid)
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            if key == "out_time_us" and duration and value.isdigit():
+                progress(min(int(value) / 1e6 / duration, 1.0), process.pid)
+        returncode = process.wait()
+        errors.seek(0)
+        return returncode, errors.read().decode(errors="replace").strip()
+
+def run_into_cache(cmd, output_path, duration=None, progress=None, output_format="mp4"):
+    """Run an offline ffmpeg job, moving its output into place only once complete"""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.part"
+    returncode, stderr = run_with_progress(cmd + ["-f", output_format, "-y", tmp_path], duration, progress)
+
+    if returncode != 0:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise RuntimeError(stderr.splitlines()[-1] if stderr else f"ffmpeg exited with code {returncode}")
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def transcode(video_path, output_path, is_shorts=False, duration=None, progress=None, threads=None, gain=None):
+    """Encode a video with the live stream settings into an ingest-ready faststart MP4, its audio raised by `gain` dB"""
+    rung = BITRATE_LADDER[0]
+    bitrate = rung["video_bitrate"]
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", video_path,
+        "-c:v", "libx264", "-preset", TRANSCODE_PRESET, "-b:v", f"{bitrate}k",
+        "-maxrate", f"{bitrate}k", "-bufsize", f"{bitrate * 2}k",
+        "-g", "60", "-keyint_min", "60", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE}k",
+        "-movflags", "+faststart"
+    ]
+    scale = scale_filter(rung, is_shorts)
+    if scale:
+        cmd += ["-vf", scale]
+    if gain:
+        cmd += ["-af", f"volume={gain}dB"]
+    if threads:
+        # One encoder per core scales better across many files than one wide encoder
+        cmd += ["-threads", str(threads)]
+
+    return run_into_cache(cmd, output_path, duration, progress)
+
+def remux_faststart(video_path, output_path, duration=None, progress=None):
+    """Copy an MP4 with its index moved to the front, so ffmpeg can start without seeking to the end"""
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", video_path, "-c", "copy", "-movflags", "+faststart"]
+    return run_into_cache(cmd, output_path, duration, progress)
+
+def extract_poster(video_path, output_path, duration=None, progress=None):
+    """Save one frame from early in the video as a JPEG"""
+    position = (duration or 0) * POSTER_POSITION
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-ss", f"{position:.3f}", "-i", video_path,
+        "-frames:v", "1", "-vf", f"scale={POSTER_WIDTH}:-2", "-q:v", "3"
+    ]
+    return run_into_cache(cmd, output_path, progress=progress, output_format="mjpeg")
+
+def measure_loudness(video_path, duration=None, progress=None):
+    """Integrated loudness (LUFS), true peak (dBTP) and loudness range (LU) of a file's audio
+
+    The first of loudnorm's two passes; the second is the fixed gain from
+    loudness_gain. Values are None for silent audio.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-i", video_path, "-vn",
+        "-af", f"loudnorm=I={LOUDNESS_TARGET}:TP={LOUDNESS_TRUE_PEAK}:print_format=json", "-f", "null", "-"
+    ]
+    returncode, stderr = run_with_progress(cmd, duration, progress)
+    if returncode in STOPPED_EXIT_CODES:
+        raise InterruptedError("Loudness measurement stopped")
+    if returncode != 0:
+        raise RuntimeError(stderr.splitlines()[-1] if stderr else f"ffmpeg exited with code {returncode}")
+
+    # The measurement is the last JSON object ffmpeg prints
+    measured = json.loads(stderr[stderr.rindex("{"):stderr.rindex("}") + 1])
+
+    def value(key):
+        number = float(measured[key])
+        return number if math.isfinite(number) else None
+
+    return {"integrated": value("input_i"), "true_peak": value("input_tp"), "lra": value("input_lra")}
+
+def loudness_gain(loudness):
+    """Gain in dB bringing measured audio to the target loudness without pushing true peaks past the limit
+
+    0.0 when the audio is already within tolerance, None when there is no
+    usable measurement.
+    """
+    if not loudness or loudness.get("integrated") is None or loudness.get("true_peak") is None:
+        return None
+    if abs(LOUDNESS_TARGET - loudness["integrated"]) <= LOUDNESS_TOLERANCE and loudness["true_peak"] <= LOUDNESS_TRUE_PEAK:
+        return 0.0
+    # A linear gain cannot limit peaks, so loud peaks cap how far quiet audio is raised
+    return round(min(LOUDNESS_TARGET - loudness["integrated"], LOUDNESS_TRUE_PEAK - loudness["true_peak"]), 2)
+
+def prepare_file(video_path, tasks=PREP_TASKS, is_shorts=False, threads=None, report=None, cache_dir=PREP_CACHE_DIR):
+    """Run preparation steps on one file, skipping those already done for its content; returns its manifest
+
+    `report(task, fraction, pid)` is called as each step progresses. Safe to run
+    from several processes at once: work on the same content is serialized.
+    """
+    report = report or (lambda task, fraction, pid=None: None)
+    report("hash", 0.0)
+    sha256 = content_hash(video_path)
+    directory = prep_dir(sha256, cache_dir)
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, "manifest.json")
+
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = read_json(manifest_path) or {"sha256": sha256, "outputs": {}, "steps": {}}
+        manifest["source"] = os.path.abspath(video_path)
+        outputs = manifest["outputs"]
+
+        for task in tasks:
+            name = transcode_name(is_shorts) if task == "transcode" else task
+            done = outputs.get(name, False)
+            if done is not False and not (isinstance(done, str) and not os.path.exists(done)):
+                continue
+
+            def progress(fraction, pid=None, task=task):
+                report(task, fraction, pid)
+
+            progress(0.0)
+            start = time.perf_counter()
+            info = outputs.get("probe")
+            duration = info["duration"] if info else None
+            if task == "probe":
+                preflight = preflight_input(video_path)
+                if preflight["info"] is None:
+                    raise ValueError(preflight["error"])
+                outputs["probe"] = preflight["info"]
+            elif task == "keyframes":
+                keyframe_index(video_path)
+                outputs["keyframes"] = True
+            elif task == "faststart":
+                # None records that the source can already be streamed as it is
+                outputs["faststart"] = (
+                    remux_faststart(video_path, os.path.join(directory, "faststart.mp4"), duration, progress)
+                    if needs_faststart(video_path) else None
+                )
+            elif task == "poster":
+                outputs["poster"] = extract_poster(video_path, os.path.join(directory, "poster.jpg"), duration, progress)
+            elif task == "loudness":
+                # None records that there is no audio to measure, or that it could not
+                # be measured; a failure must not hold up the steps after it
+                outputs["loudness"] = None
+                if not info or info["audio_codec"]:
+                    try:
+                        outputs["loudness"] = measure_loudness(video_path, duration, progress)
+                    except (RuntimeError, ValueError) as e:
+                        manifest.setdefault("errors", {})["loudness"] = str(e)
+            elif task == "transcode":
+                gain = loudness_gain(outputs.get("loudness"))
+                outputs[name] = transcode(video_path, os.path.join(directory, f"{name}.mp4"), is_shorts, duration, progress, threads, gain)
+            else:
+                raise ValueError(f"Unknown preparation step: {task}")
+
+            manifest["steps"][name] = round((time.perf_counter() - start) * 1000)
+            write_json_atomic(manifest_path, manifest)
+            progress(1.0)
+
+    return manifest
+
+def prepare_video(video_path, is_shorts=False, transcode_video=True, manifest=None):
+    """How to stream a prepared video; runs whatever preparation `manifest` lacks inline"""
+    if manifest is None:
+        manifest = prepare_file(video_path, prep_tasks(transcode_video), is_shorts)
+    outputs = manifest["outputs"]
+
+    if transcode_video:
+        # Already encoded and scaled, so the slot only has to copy it out
+        prepared = {"path": outputs[transcode_name(is_shorts)], "passthrough": True, "is_shorts": False}
+    else:
+        # Re-encoded live, which applies the loudness gain then
+        prepared = {"path": outputs.get("faststart") or video_path, "passthrough": False, "is_shorts": is_shorts, "loudness": outputs.get("loudness")}
+
+    # Probe and warm what will actually be streamed, so Start is a cache hit
+    preflight_input(prepared["path"])
+
+    # Index its keyframes now, so a crash mid-stream resumes without a scan
+    try:
+        keyframe_index(prepared["path"])
+    except (OSError, ValueError, subprocess.SubprocessError):
+        pass
+    prepared["steps"] = dict(manifest["steps"])
+    return prepared
@@ -1,11 +1,59 @@
 import streamlit as st
 import time
 import os
-import subprocess
 import threading
+import uuid
 from datetime import datetime
 import streamlit.components.v1 as components
-from constants import RTMP_URL
+from constants import YOUTUBE_CLIENT_SECRETS_FILE, DROP_DIR
+from youtube_auth import get_credential_manager
+from import_utils import lazy_import
+from metrics import start_metrics_server, timed
+
+# Streaming, scheduling, preparation and their UI are only loaded once a rerun uses them
+engine = lazy_import("stream_engine")
+media_utils = lazy_import("media_utils")
+frame_feed = lazy_import("frame_feed")
+scheduling = lazy_import("scheduler")
+prep_farm = lazy_import("prep_farm")
+stream_prep = lazy_import("stream_prep")
+video_library = lazy_import("video_library")
+uploads = lazy_import("upload_server")
+live_events = lazy_import("live_events")
+streamlit_utils = lazy_import("streamlit_utils")
+data_access = lazy_import("data_access")
+stream_scheduler_ui = lazy_import("components.stream_scheduler")
+video_upload_ui = lazy_import("components.video_upload")
+library_prep_ui = lazy_import("components.library_prep")
+live_panel_ui = lazy_import("components.live_panel")
+
+@st.cache_resource(show_spinner=False)
+def started_scheduler():
+    """The stream scheduler, started once per process rather than on every rerun"""
+    scheduler = scheduling.get_scheduler()
+    scheduler.start()
+    return scheduler
+
+@st.cache_resource(show_spinner=False)
+def started_prep_farm():
+    """The preparation farm; its worker processes start with the first job"""
+    return prep_farm.get_prep_farm()
+
+@st.cache_resource(show_spinner=False)
+def started_upload_server():
+    """The resumable upload server; raises while its port is taken, so a later rerun tries again"""
+    server = uploads.start_upload_server()
+    if server is None:
+        raise OSError("upload server port in use")
+    return server
+
+@st.cache_resource(show_spinner=False)
+def started_live_server():
+    """The live dashboard events server; raises while its port is taken, so a later rerun tries again"""
+    server = live_events.start_live_server()
+    if server is None:
+        raise OSError("live events port in use")
+    return server
 
 # Page configuration
 st.set_page_config(
@@ -14,43 +62,152 @@ st.set_page_config(
     layout="wide"
 )
 
+# Local /metrics endpoint for scraping, when METRICS_ENABLED=1
+start_metrics_server()
+
 # Session state initialization
 if "streaming" not in st.session_state:
     st.session_state.streaming = False
 if "ffmpeg_thread" not in st.session_state:
     st.session_state.ffmpeg_thread = None
+if "stream_id" not in st.session_state:
+    st.session_state.stream_id = None
 
 # Header
 st.title("YouTube Live Stream Manager")
 
-# Video upload and stream settings
-video_files = [f for f in os.listdir('.') if f.endswith(('.mp4', '.flv'))]
+# YouTube account; cached tokens are loaded from disk and refreshed in the background
+credential_manager = get_credential_manager()
+
+with st.expander("YouTube Account", expanded=not credential_manager.is_authorized):
+    if credential_manager.is_authorized:
+        st.success("Connected to YouTube")
+        if st.button("Disconnect"):
+            credential_manager.revoke()
+            st.experimental_rerun()
+    else:
+        st.info("Connect your YouTube account to see live analytics and chat.")
+        if st.button("Connect YouTube Account"):
+            with st.spinner("Waiting for authorization in your browser..."):
+                try:
+                    credential_manager.authorize()
+                    st.experimental_rerun()
+                except FileNotFoundError:
+                    st.error(f"OAuth client file not found: {YOUTUBE_CLIENT_SECRETS_FILE}")
+    
+    if credential_manager.last_error:
+        st.warning(credential_manager.last_error)
+
+# Video source: a file from disk, or frames captured with OpenCV
+source = st.radio("Source", ["Video File", "Capture Device"], horizontal=True)
+capture_source = None
+
+if source == "Video File":
+    # Video upload and stream settings
+    video_files = [f for f in os.listdir('.') if f.endswith(('.mp4', '.flv'))] + video_library.list_videos()
+
+    st.write("Available Videos:")
+    selected_video = st.selectbox("Select video", video_files) if video_files else None
+
+    uploaded_file = st.file_uploader("Or upload new video (mp4/flv)", type=['mp4', 'flv'])
 
-st.write("Available Videos:")
-selected_video = st.selectbox("Select video", video_files) if video_files else None
+    if uploaded_file:
+        # Save uploaded file
+        with open(uploaded_file.name, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+        st.success("Video uploaded successfully!")
+        video_path = uploaded_file.name
+    elif selected_video:
+        video_path = selected_video
+    else:
+        video_path = None
 
-uploaded_file = st.file_uploader("Or upload new video (mp4/flv)", type=['mp4', 'flv'])
+    # Files of several GB go through the resumable uploader or the drop folder instead
+    with st.expander("Large Files"):
+        try:
+            upload_server = started_upload_server()
+        except OSError:
+            upload_server = None
+        if upload_server is not None:
+            video_upload_ui.render_video_upload(upload_server.token)
+        else:
+            st.warning("The upload server could not start; is its port already in use?")
+
+        st.caption(f"Files already on this machine can be moved into `{DROP_DIR}` and imported.")
+        if st.button("Import From Drop Folder"):
+            with st.spinner("Hashing and importing..."):
+                results = video_library.scan_drop_folder()
+            for path, imported in results:
+                st.write(f"{'Imported' if imported else 'Already in library'}: {path}")
+            if not results:
+                st.info("No settled videos in the drop folder")
 
-if uploaded_file:
-    # Save uploaded file
-    with open(uploaded_file.name, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    st.success("Video uploaded successfully!")
-    video_path = uploaded_file.name
-elif selected_video:
-    video_path = selected_video
+    # Probing, remuxing, transcoding and posters for the whole library, on every core
+    with st.expander("Library Preparation"):
+        library_prep_ui.render_library_prep(started_prep_farm(), video_path)
+
+    # Probe and warm the selected video now, so Start does not pay for it
+    if video_path:
+        preflight = media_utils.preflight_input(video_path)
+        if preflight["info"]:
+            st.caption(f"Ready: {media_utils.describe_media(preflight['info'])} (checked in {preflight['elapsed_ms']:.0f} ms)")
+            # Measured in the background, so the stream can start with its loudness gain;
+            # submitted once per session, so a failed or cancelled job is not retried on every rerun
+            manifest = stream_prep.cached_manifest(video_path)
+            measuring = st.session_state.setdefault("loudness_submitted", set())
+            if (not manifest or "loudness" not in manifest["outputs"]) and video_path not in measuring:
+                measuring.add(video_path)
+                started_prep_farm().submit(video_path, ("probe", "loudness"), priority=prep_farm.PRIORITY_INTERACTIVE)
+        else:
+            st.warning(f"Could not check the video: {preflight['error']}")
 else:
     video_path = None
+    capture_source = st.text_input(
+        "Device index or URL",
+        value="0",
+        help="Anything OpenCV can capture from: a camera index, a capture card or a network stream"
+    )
+    capture_size = st.selectbox("Capture resolution", ["1920x1080", "1280x720"])
 
 # Stream settings
 stream_key = st.text_input("Stream Key", type="password")
 is_loop = st.checkbox("Enable Loop", value=True)
 is_shorts = st.checkbox("Shorts Mode (720x1280)")
+fast_start = st.checkbox(
+    "Fast Start",
+    value=True,
+    help="Bursts the first seconds of video and sends an early keyframe to go live sooner"
+)
+adaptive = st.checkbox(
+    "Adaptive Bitrate",
+    value=True,
+    help="Steps bitrate and resolution down when the upload cannot keep up, and back up when it recovers"
+)
+overlays = st.checkbox(
+    "Overlays",
+    help="Draws a LIVE badge, the viewer count and the latest super chat on the stream"
+)
+record = st.checkbox(
+    "Record Locally",
+    help="Keeps a copy of exactly what is sent to YouTube in time-segmented files, without encoding it twice"
+)
+
+# Streams queued for later run from the scheduler's own thread, prepared ahead of their slot
+scheduler = started_scheduler()
+
+with st.expander("Schedule for Later"):
+    stream_scheduler_ui.render_stream_scheduler(
+        scheduler,
+        video_path,
+        stream_key,
+        {"is_shorts": is_shorts, "is_loop": is_loop, "adaptive": adaptive, "overlays": overlays, "record": record}
+    )
 
 # Log display
 log_placeholder = st.empty()
 logs = []
 
+@timed("log_callback_seconds", "Time to append and display one ffmpeg log line")
 def log_callback(msg):
     logs.append(msg)
     try:
@@ -58,53 +215,27 @@ def log_callback(msg):
     except:
         print(msg)
 
-def run_ffmpeg(video_path, stream_key, is_shorts, is_loop, log_callback):
-    output_url = f"{RTMP_URL}/{stream_key}"
-    scale = "-vf scale=720:1280" if is_shorts else ""
-    loop = "-stream_loop" if is_loop else "-stream_loop 0"
-    
-    cmd = [
-        "ffmpeg", "-re", loop, "-1", "-i", video_path,
-        "-c:v", "libx264", "-preset", "veryfast", "-b:v", "2500k",
-        "-maxrate", "2500k", "-bufsize", "5000k",
-        "-g", "60", "-keyint_min", "60",
-        "-c:a", "aac", "-b:a", "128k",
-        "-f", "flv"
-    ]
-    
-    if scale:
-        cmd += scale.split()
-    cmd.append(output_url)
-    
-    log_callback(f"Running command: {' '.join(cmd)}")
-    
-    try:
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.STDOUT, 
-            text=True
-        )
-        for line in process.stdout:
-            log_callback(line.strip())
-        process.wait()
-    except Exception as e:
-        log_callback(f"Error: {e}")
-    finally:
-        log_callback("Stream ended or stopped.")
-
 # Stream controls
 col1, col2 = st.columns(2)
 
 with col1:
     if st.button("Start Streaming", type="primary", use_container_width=True):
-        if not video_path or not stream_key:
+        if not (video_path or capture_source) or not stream_key:
             st.error("Video and stream key are required!")
         else:
+            feed = None
+            if capture_source:
+                width, height = map(int, capture_size.split("x"))
+                device = int(capture_source) if capture_source.isdigit() else capture_source
+                # Capture devices deliver frames at their own rate, so the feed is not paced
+                feed = frame_feed.FrameFeed(frame_feed.capture_producer(device, width, height), width, height, paced=False, name=f"capture {capture_source}")
+            
             st.session_state.streaming = True
+            st.session_state.stream_id = uuid.uuid4().hex
             st.session_state.ffmpeg_thread = threading.Thread(
-                target=run_ffmpeg,
-                args=(video_path, stream_key, is_shorts, is_loop, log_callback),
+                target=engine.run_ffmpeg,
+                args=(video_path, stream_key, is_shorts, is_loop, log_callback, st.session_state.stream_id),
+                kwargs={"fast_start": fast_start, "adaptive": adaptive, "frame_feed": feed, "overlays": overlays, "record": record},
                 daemon=True
             )
             st.session_state.ffmpeg_thread.start()
@@ -113,7 +244,8 @@ with col1:
 with col2:
     if st.button("Stop Streaming", type="primary", use_container_width=True):
         st.session_state.streaming = False
-        os.system("pkill ffmpeg")
+        if st.session_state.stream_id:
+            engine.stop_stream(st.session_state.stream_id)
         st.warning("Stream stopped!")
 
 # Display logs
@@ -129,3 +261,12 @@ if st.session_state.streaming:
         """,
         unsafe_allow_html=True
     )
+
+    # Encoder stats, viewers and chat are pushed into the panel without rerunning the script
+    try:
+        started_live_server()
+    except OSError:
+        pass
+    else:
+        analytics = data_access.fetch("stream_analytics", streamlit_utils.get_stream_analytics, default=streamlit_utils.EMPTY_ANALYTICS).result()
+        live_panel_ui.render_live_panel(st.session_state.stream_id, analytics)
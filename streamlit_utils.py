@@ -3,10 +3,27 @@ import time
 from datetime import datetime
 import os
 import tempfile
+from collections import deque
+from constants import YOUTUBE_BROADCAST_ID, MAX_VIDEO_SIZE
+from youtube_api import get_client, CHAT_BUFFER_SIZE
+from metrics import timed
+from chat_analytics import ChatAggregates
 
-def get_stream_health():
-    """Get the current stream health metrics (mock implementation)"""
-    if not st.session_state.streaming:
+# Ids of a session's latest chat messages kept for deduplication; more than the
+# API client buffers, so every message a fetch can return again is recognized
+CHAT_SEEN_IDS = 2 * CHAT_BUFFER_SIZE
+
+# What analytics look like before there is a broadcast to read
+EMPTY_ANALYTICS = {"times": [], "epochs": [], "viewers": [], "likes": [], "peak_viewers": 0, "avg_viewers": 0, "total_likes": 0, "comments": 0}
+
+def get_stream_health(streaming=None):
+    """Get the current stream health metrics (mock implementation)
+
+    Pass `streaming` when calling off the script thread, where the session state is not available.
+    """
+    if streaming is None:
+        streaming = st.session_state.streaming
+    if not streaming:
         return {"status": "offline", "health": 0}
     
     # Simulate random health metrics
@@ -18,6 +35,83 @@ def get_stream_health():
         "health": health
     }
 
+def get_broadcast():
+    """Get the live broadcast to read analytics and chat from"""
+    client = get_client()
+    
+    if YOUTUBE_BROADCAST_ID:
+        stats = client.get_live_stats(YOUTUBE_BROADCAST_ID)
+        return {"id": YOUTUBE_BROADCAST_ID, "live_chat_id": stats.get("live_chat_id")}
+    
+    return client.get_active_broadcast()
+
+@timed("get_stream_analytics_seconds", "Time to fetch the current stream analytics")
+def get_stream_analytics():
+    """Get the current stream analytics from the shared YouTube API client
+
+    Raises on missing credentials, exhausted quota or an unreachable API, so a
+    data_access fetch answers with the last analytics it got instead.
+    """
+    broadcast = get_broadcast()
+    if not broadcast:
+        return EMPTY_ANALYTICS
+    
+    client = get_client()
+    stats = client.get_live_stats(broadcast["id"])
+    return client.viewer_series(broadcast["id"]).analytics(stats)
+
+def get_live_chat_messages():
+    """Get recent live chat messages from the shared YouTube API client; raises like get_stream_analytics"""
+    broadcast = get_broadcast()
+    if not broadcast or not broadcast.get("live_chat_id"):
+        return []
+    
+    return get_client().get_chat_messages(broadcast["live_chat_id"])
+
+def session_chat_aggregates():
+    """This session's chat aggregates, counted from the chat history once and kept up to date by add_chat_message"""
+    if "chat_aggregates" not in st.session_state:
+        st.session_state.chat_aggregates = ChatAggregates.from_messages(st.session_state.get("chat_history", []))
+    return st.session_state.chat_aggregates
+
+def session_chat_ids():
+    """Ids of this session's latest chat messages, as a set to look them up and a deque of their order"""
+    if "chat_ids" not in st.session_state:
+        order = deque((m.get("id") for m in st.session_state.get("chat_history", [])), maxlen=CHAT_SEEN_IDS)
+        st.session_state.chat_ids = (set(order), order)
+    return st.session_state.chat_ids
+
+def add_chat_message(message):
+    """Append a message to the session's chat history and count it in the chat aggregates
+
+    A message whose id was already added is skipped; returns whether it was added.
+    """
+    seen, order = session_chat_ids()
+    message_id = message.get("id")
+    if message_id is not None:
+        if message_id in seen:
+            return False
+        if len(order) == order.maxlen:
+            seen.discard(order[0])
+        order.append(message_id)
+        seen.add(message_id)
+
+    aggregates = session_chat_aggregates()
+    st.session_state.chat_history.append(message)
+    aggregates.add(message)
+    return True
+
+def send_chat_message(text):
+    """Send a message to the live chat as the channel owner; the sent message, or None if it failed"""
+    try:
+        broadcast = get_broadcast()
+        if not broadcast or not broadcast.get("live_chat_id"):
+            return None
+        
+        return get_client().send_chat_message(broadcast["live_chat_id"], text)
+    except Exception:
+        return None
+
 def start_stream(stream_key):
     """Start a YouTube live stream (mock implementation)"""
     time.sleep(2)  # Simulate startup time
@@ -53,8 +147,8 @@ def validate_video_file(uploaded_file):
     if file_ext not in ["mp4", "webm", "mov"]:
         return False, "Unsupported file format. Please upload MP4, WebM, or MOV files."
     
-    # Check file size (100MB limit)
-    if uploaded_file.size > 100 * 1024 * 1024:
-        return False, "File size too large. Maximum size is 100MB."
+    # Larger files go through the resumable uploader
+    if uploaded_file.size > MAX_VIDEO_SIZE:
+        return False, f"File size too large. Maximum size is {MAX_VIDEO_SIZE // (1024 * 1024)}MB; use Large Files for bigger videos."
     
     return True, "File is valid"
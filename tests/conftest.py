@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Caches, quota and checkpoints go to a scratch directory, not the checkout's data/
+os.environ.setdefault("STREAM_DATA_DIR", tempfile.mkdtemp(prefix="stream-tests-"))
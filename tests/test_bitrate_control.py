@@ -0,0 +1,80 @@
+import pytest
+import bitrate_control
+from bitrate_control import BitrateController, SETTLE_SECONDS
+from constants import ABR_DOWN_SECONDS, ABR_UP_SECONDS, ABR_GOP_SECONDS
+
+class Encode:
+    """Progress reports of an encode running at a given speed and throughput, one per second"""
+
+    def __init__(self, controller, clock):
+        self.controller = controller
+        self.clock = clock
+        self.out_time = 0.0
+        self.total_size = 0
+
+    def run(self, seconds, speed, kbps):
+        """Report for `seconds`; stop early and return True once the controller wants the restart"""
+        for _ in range(seconds):
+            self.clock[0] += 1
+            self.out_time += speed
+            self.total_size += kbps * 125
+            if self.controller.update(self.out_time, self.total_size):
+                return True
+        return False
+
+    def restart(self):
+        """Continue on the pending rung from a fresh ffmpeg process"""
+        self.controller.apply()
+        self.out_time, self.total_size = 0.0, 0
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bitrate_control.time, "monotonic", lambda: now[0])
+    return now
+
+def test_steps_down_under_sustained_low_speed(clock):
+    controller = BitrateController("s1")
+    encode = Encode(controller, clock)
+
+    # Slow only briefly after settling: no change
+    encode.run(SETTLE_SECONDS + ABR_DOWN_SECONDS - 2, speed=0.5, kbps=1400)
+    assert controller.pending is None
+
+    # The restart is asked for once the encode reaches the keyframe it is cut at
+    assert encode.run(10, speed=0.5, kbps=1400)
+    # 1400 kbit/s carries 480p (1128 kbit/s with the margin) but not 720p
+    assert controller.pending == 2
+    assert controller.switch_at % ABR_GOP_SECONDS == 0
+    assert controller.switch_at <= encode.out_time < controller.switch_at + 0.5
+    change = controller.apply()
+    assert change["from"] == "source" and change["to"] == "480p" and change["direction"] == "down"
+    assert controller.seconds_below_realtime > 0
+
+def test_no_step_up_inside_hold_window_then_recovers(clock):
+    controller = BitrateController("s1")
+    encode = Encode(controller, clock)
+    assert encode.run(60, speed=0.5, kbps=1400)
+    encode.restart()
+
+    # Back at realtime, but not for long enough yet
+    encode.run(SETTLE_SECONDS + ABR_UP_SECONDS - 5, speed=1.0, kbps=2000)
+    assert controller.pending is None and controller.rung == 2
+
+    # Throughput has stayed up for the whole hold: probe one rung up
+    assert encode.run(30, speed=1.0, kbps=2000)
+    change = controller.apply()
+    assert change["to"] == "720p" and change["direction"] == "up"
+
+def test_failed_probe_doubles_the_hold(clock):
+    controller = BitrateController("s1")
+    encode = Encode(controller, clock)
+    assert encode.run(60, speed=0.5, kbps=1400)
+    encode.restart()
+    assert encode.run(SETTLE_SECONDS + ABR_UP_SECONDS + 30, speed=1.0, kbps=2000)
+    encode.restart()
+
+    # The higher rung does not hold: back down within the hold
+    assert encode.run(30, speed=0.5, kbps=1400)
+    encode.restart()
+    assert controller.up_hold == ABR_UP_SECONDS * 2
@@ -0,0 +1,27 @@
+import math
+from chart_utils import lttb_indices, downsample
+
+def test_short_series_kept_whole():
+    assert lttb_indices([1, 2, 3], 10) == [0, 1, 2]
+    assert lttb_indices(list(range(10)), 2) == list(range(10))
+
+def test_keeps_budget_and_endpoints():
+    values = [math.sin(i / 50) for i in range(5000)]
+    indices = lttb_indices(values, 300)
+    assert len(indices) == 300
+    assert indices[0] == 0 and indices[-1] == len(values) - 1
+    assert indices == sorted(set(indices))
+
+def test_keeps_spikes():
+    values = [0] * 10000
+    values[1234] = 100
+    values[8765] = -100
+    indices = lttb_indices(values, 50)
+    assert 1234 in indices and 8765 in indices
+
+def test_downsample_pairs_x_with_y():
+    x = list(range(4000))
+    y = [v * 2 for v in x]
+    small_x, small_y = downsample(x, y, 100)
+    assert len(small_x) == len(small_y) == 100
+    assert all(b == 2 * a for a, b in zip(small_x, small_y))
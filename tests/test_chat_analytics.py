@@ -0,0 +1,88 @@
+import random
+from collections import Counter
+from datetime import datetime
+from chat_analytics import ChatAggregates, HyperLogLog, SpaceSaving, minute_of, message_minute
+
+def message(author, kind="regular", timestamp="12:00:00", **extra):
+    return dict({"id": f"{author}-{timestamp}", "author": author, "message": "hi", "timestamp": timestamp, "type": kind}, **extra)
+
+def test_hyperloglog_estimate_within_a_few_percent():
+    hll = HyperLogLog()
+    for i in range(20000):
+        hll.add(f"viewer{i}")
+        hll.add(f"viewer{i}")
+    assert abs(hll.count() - 20000) / 20000 < 0.05
+
+def test_hyperloglog_exact_for_small_counts():
+    hll = HyperLogLog()
+    for name in ["a", "b", "c", "a"]:
+        hll.add(name)
+    assert hll.count() == 3
+
+def test_space_saving_keeps_heavy_hitters():
+    top = SpaceSaving(capacity=5)
+    for i in range(1000):
+        top.add("loud" if i % 3 == 0 else f"quiet{i}")
+    value, count, error = top.top(1)[0]
+    assert value == "loud"
+    assert count - error <= 334 <= count
+
+def test_space_saving_bounds_hold_through_evictions():
+    rng = random.Random(1)
+    top = SpaceSaving(capacity=20)
+    truth = Counter()
+    for _ in range(20000):
+        # Skewed: a few regulars and a long tail of one-off chatters
+        value = f"v{int(rng.paretovariate(1.2))}"
+        truth[value] += 1
+        top.add(value)
+
+    assert sum(count for count, _ in top.counters.values()) == 20000
+    for value, count, error in top.top(20):
+        assert count - error <= truth[value] <= count
+    assert [v for v, _, _ in top.top(3)] == [v for v, _ in truth.most_common(3)]
+    assert len(top._heap) <= 4 * top.capacity + 1
+
+def test_aggregates_count_types_chatters_and_super_chats():
+    aggregates = ChatAggregates()
+    aggregates.add(message("alex"))
+    aggregates.add(message("alex", timestamp="12:00:05"))
+    aggregates.add(message("sam", "super_chat", currency="USD", amount_micros=5_000_000))
+    aggregates.add(message("me", "owner_message"))
+    aggregates.add(message("jo", "membership"))
+
+    summary = aggregates.summary()
+    assert summary["messages"] == 5
+    assert summary["by_type"] == {"regular": 2, "super_chat": 1, "owner_message": 1, "membership": 1}
+    # The channel owner is not counted as a chatter
+    assert summary["unique_chatters"] == 3
+    assert summary["top_chatters"][0][:2] == ("alex", 2)
+    assert summary["super_chats"] == {"USD": {"count": 1, "amount": 5.0}}
+    assert summary["memberships"] == 1
+
+def test_rate_series_fills_quiet_minutes():
+    aggregates = ChatAggregates()
+    now = minute_of(datetime.now())
+    aggregates.add(message("a"), minute=now - 3)
+    aggregates.add(message("b", "membership"), minute=now)
+    aggregates.add(message("c"), minute=now)
+    # Out of order within the window kept
+    aggregates.add(message("d"), minute=now - 3)
+
+    times, messages, memberships = aggregates.rate_series()
+    assert messages == [2, 0, 0, 2]
+    assert memberships == [0, 0, 0, 1]
+    assert len(times) == 4
+    assert aggregates.messages_per_minute(5) == 4 / 5
+
+def test_from_messages_matches_adding_one_by_one():
+    history = [message(f"viewer{i % 7}", timestamp=f"11:{i % 60:02d}:00") for i in range(50)]
+    built = ChatAggregates.from_messages(history)
+    assert built.total == 50
+    assert built.summary()["unique_chatters"] == 7
+
+def test_message_minute_uses_latest_past_day():
+    now = datetime(2026, 1, 2, 0, 30)
+    assert message_minute({"timestamp": "23:59:00"}, now) == minute_of(datetime(2026, 1, 1, 23, 59))
+    assert message_minute({"timestamp": "00:10:00"}, now) == minute_of(datetime(2026, 1, 2, 0, 10))
+    assert message_minute({"timestamp": "bad"}, now) == minute_of(now)
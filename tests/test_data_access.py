@@ -0,0 +1,37 @@
+import threading
+from data_access import fetch, fetch_all
+
+def fail():
+    raise RuntimeError("API down")
+
+def test_default_before_any_success():
+    assert fetch("da-default", fail, default=[]).result() == []
+    assert fetch("da-default-none", fail).result() is None
+
+def test_last_good_value_after_an_error():
+    assert fetch("da-error", lambda: {"viewers": 10}).result() == {"viewers": 10}
+    assert fetch("da-error", fail, default={}).result() == {"viewers": 10}
+
+def test_last_good_value_past_the_deadline():
+    assert fetch("da-late", lambda: 1).result() == 1
+
+    release = threading.Event()
+    def slow():
+        release.wait(5)
+        return 2
+
+    assert fetch("da-late", slow, timeout=0.05).result() == 1
+    # The late fetch is joined rather than repeated, then refreshes the value
+    late = fetch("da-late", lambda: 3, timeout=5)
+    release.set()
+    assert late.result() == 2
+    assert fetch("da-late", lambda: 4).result() == 4
+
+def test_values_kept_per_arguments():
+    assert fetch("da-args", lambda x: x * 2, 1).result() == 2
+    assert fetch("da-args", fail, 2, default=0).result() == 0
+    assert fetch("da-args", fail, 1, default=0).result() == 2
+
+def test_fetch_all_results_by_name():
+    results = fetch_all({"da-all-a": lambda: "a", "da-all-b": fail}, timeout=1)
+    assert results == {"da-all-a": "a", "da-all-b": None}
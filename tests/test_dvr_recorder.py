@@ -0,0 +1,45 @@
+import os
+import time
+from dvr_recorder import DvrRetention, recording_command, next_part, list_segments
+
+def make_segments(directory, ages, size=1000):
+    """One segment per age in seconds, written `size` bytes each; returns their paths"""
+    now = time.time()
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, age in enumerate(ages):
+        path = os.path.join(directory, f"s-{i:03d}.ts")
+        with open(path, "wb") as f:
+            f.write(b"\0" * size)
+        os.utime(path, (now - age, now - age))
+        paths.append(path)
+    return now, paths
+
+def test_sweep_deletes_by_age(tmp_path):
+    now, paths = make_segments(str(tmp_path / "stream"), [3 * 3600, 2 * 3600, 1800, 10])
+    retention = DvrRetention(dvr_dir=str(tmp_path), retention_hours=1.5, max_gb=1)
+
+    assert retention.sweep(now) == 2000
+    assert [path for _, _, path in list_segments(str(tmp_path))] == paths[2:]
+
+def test_sweep_keeps_under_cap_oldest_first(tmp_path):
+    now, first = make_segments(str(tmp_path / "a"), [3000, 2000])
+    _, second = make_segments(str(tmp_path / "b"), [2500, 1500, 10])
+    retention = DvrRetention(dvr_dir=str(tmp_path), retention_hours=24, max_gb=2500 / 1024 ** 3)
+
+    # Across recordings, by age: a/0, b/0 and a/1 go; the one still being written stays
+    assert retention.sweep(now) == 2000
+    assert [path for _, _, path in list_segments(str(tmp_path))] == [second[1], second[2]]
+    assert not os.path.exists(first[0]) and not os.path.exists(first[1])
+
+def test_sweep_never_deletes_segments_being_written(tmp_path):
+    now, paths = make_segments(str(tmp_path / "stream"), [30, 10])
+    retention = DvrRetention(dvr_dir=str(tmp_path), retention_hours=0, max_gb=0)
+    assert retention.sweep(now) == 2000
+    assert all(os.path.exists(path) for path in paths)
+
+def test_each_recorder_process_gets_its_own_part():
+    first, second = next_part("stream-x"), next_part("stream-x")
+    assert second == first + 1
+    assert next_part("stream-y") == 1
+    assert recording_command("/dvr", "stream-x-002")[-1] == "/dvr/stream-x-002-%Y%m%d-%H%M%S.ts"
@@ -0,0 +1,46 @@
+import pytest
+import encoder_metrics
+from encoder_metrics import EncoderRecorder
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(encoder_metrics.time, "monotonic", lambda: now[0])
+    return now
+
+def progress(recorder, out_time, frame, drops, speed):
+    """Feed one ffmpeg -progress block"""
+    for line in (f"frame={frame}", f"drop_frames={drops}", "fps=30", "bitrate=2500.0kbits/s",
+                 f"out_time_us={int(out_time * 1_000_000)}", f"speed={speed}x", "progress=continue"):
+        recorder.feed_line(line)
+
+def test_counts_carry_over_a_restart(clock):
+    recorder = EncoderRecorder("s1")
+    clock[0] += 1
+    progress(recorder, 1, frame=30, drops=2, speed=1.0)
+    clock[0] += 1
+    progress(recorder, 2, frame=60, drops=5, speed=1.0)
+
+    recorder.restart()
+    clock[0] += 1
+    progress(recorder, 1, frame=30, drops=1, speed=1.0)
+
+    assert list(recorder.dropped_frames) == [2, 5, 6]
+    assert recorder.stability.frames == 90
+    assert recorder.stability.dropped_frames == 6
+
+def test_speed_measured_between_samples(clock):
+    recorder = EncoderRecorder("s1")
+    clock[0] += 1
+    progress(recorder, 1, frame=30, drops=0, speed=1.0)
+    # Stalled: media time crawls while ffmpeg's lifetime average still reads near realtime
+    clock[0] += 2
+    progress(recorder, 1.5, frame=45, drops=0, speed=0.83)
+
+    assert list(recorder.speed) == [1.0, 0.25]
+
+    # A restarted process has no previous sample, so its own report is used
+    recorder.restart()
+    clock[0] += 1
+    progress(recorder, 0.4, frame=12, drops=0, speed=0.4)
+    assert recorder.speed[-1] == pytest.approx(0.4)
@@ -0,0 +1,30 @@
+import media_utils
+from media_utils import keyframe_before, file_signature
+
+def seed_index(tmp_path, times):
+    video = tmp_path / "video.mp4"
+    video.write_bytes(b"\0" * 1000)
+    path = str(video)
+    media_utils._keyframes[path] = (file_signature(path), times)
+    return path
+
+def test_keyframe_before(tmp_path):
+    path = seed_index(tmp_path, [0.5, 2.5, 4.5])
+    # Before the first keyframe the stream starts from the top
+    assert keyframe_before(path, 0.2) == 0.0
+    assert keyframe_before(path, 2.5) == 2.5
+    assert keyframe_before(path, 3.9) == 2.5
+    # Past the end, the last keyframe
+    assert keyframe_before(path, 99) == 4.5
+
+def test_keyframe_before_without_index(tmp_path):
+    video = tmp_path / "unindexed.mp4"
+    video.write_bytes(b"\0")
+    assert keyframe_before(str(video), 10) is None
+    assert keyframe_before(str(tmp_path / "missing.mp4"), 10) is None
+
+def test_changed_file_drops_index(tmp_path):
+    path = seed_index(tmp_path, [0.0, 2.0])
+    with open(path, "ab") as f:
+        f.write(b"more")
+    assert keyframe_before(path, 3) is None
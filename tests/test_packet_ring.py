@@ -0,0 +1,85 @@
+from packet_ring import PacketRing, FLV_HEADER_SIZE, FLV_AUDIO, FLV_VIDEO, FLV_SCRIPT, flv_timestamp, last_tag_timestamp
+
+HEADER = b"FLV\x01\x05\x00\x00\x00\x09" + bytes(4)
+
+def tag(kind, body, timestamp=0):
+    """One FLV tag with its trailing previous-tag-size"""
+    header = bytes([kind]) + len(body).to_bytes(3, "big") + (timestamp & 0xffffff).to_bytes(3, "big") + bytes([timestamp >> 24]) + bytes(3)
+    return header + body + (11 + len(body)).to_bytes(4, "big")
+
+def keyframe(timestamp, size=20):
+    return tag(FLV_VIDEO, b"\x17\x01" + bytes(size), timestamp)
+
+def interframe(timestamp, size=20):
+    return tag(FLV_VIDEO, b"\x27\x01" + bytes(size), timestamp)
+
+SETUP = [tag(FLV_SCRIPT, b"\x02meta"), tag(FLV_VIDEO, b"\x17\x00avcC"), tag(FLV_AUDIO, b"\xaf\x00aac")]
+
+def test_feed_splits_tags_across_chunks():
+    ring = PacketRing("test")
+    data = HEADER + b"".join(SETUP) + keyframe(0) + interframe(33)
+    # Fed a few bytes at a time, as a pipe may deliver it
+    for i in range(0, len(data), 7):
+        ring.feed(data[i:i + 7])
+
+    assert ring.header == HEADER[:FLV_HEADER_SIZE]
+    assert ring.setup == SETUP
+    chunk, cursor, _ = ring.read(ring.start_cursor(latest=False), 0)
+    assert chunk == keyframe(0) + interframe(33)
+    assert cursor == 2
+
+def test_read_waits_and_returns_nothing_new():
+    ring = PacketRing("test")
+    ring.feed(HEADER + keyframe(0))
+    chunk, cursor, _ = ring.read(0, 0)
+    assert ring.read(cursor, 0.01) == (b"", cursor, 0)
+
+def test_evict_keeps_last_gops():
+    ring = PacketRing("test", gops=2)
+    ring.feed(HEADER)
+    for gop in range(4):
+        ring.feed(keyframe(gop * 2000) + interframe(gop * 2000 + 1000))
+
+    # The two oldest intervals are gone and a new reader starts at a keyframe
+    assert ring.start_cursor(latest=False) == 4
+    assert ring.start_cursor() == 6
+    chunk, _, _ = ring.read(ring.start_cursor(latest=False), 0)
+    assert chunk == keyframe(4000) + interframe(5000) + keyframe(6000) + interframe(7000)
+    assert ring.bytes == len(chunk)
+
+def test_evict_respects_byte_cap():
+    size = len(keyframe(0))
+    ring = PacketRing("test", gops=10, max_bytes=3 * size)
+    ring.feed(HEADER)
+    for i in range(6):
+        ring.feed(keyframe(i * 1000))
+    assert ring.bytes <= 3 * size
+    assert ring.start_cursor(latest=False) == 3
+
+def test_reader_behind_skips_to_latest_keyframe():
+    ring = PacketRing("test", gops=1)
+    ring.feed(HEADER + keyframe(0) + interframe(1000))
+    cursor = 0
+    ring.feed(keyframe(2000) + interframe(3000))
+
+    chunk, cursor, skipped = ring.read(cursor, 0)
+    assert chunk == keyframe(2000) + interframe(3000)
+    assert cursor == 4
+    # The dropped interval is reported, so the reader can count it
+    assert skipped == 2
+
+def test_behind_in_media_seconds():
+    ring = PacketRing("test")
+    ring.feed(HEADER + keyframe(0) + interframe(1500) + interframe(2500))
+    assert ring.behind(0) == 2.5
+    assert ring.behind(3) == 0.0
+    assert flv_timestamp(keyframe(0x01020304)) == 0x01020304
+    assert last_tag_timestamp(keyframe(0) + interframe(1500, size=300)) == 1500
+
+def test_closed_ring_ends_readers():
+    ring = PacketRing("test")
+    ring.feed(HEADER + keyframe(0))
+    ring.close()
+    _, cursor, _ = ring.read(0, 0)
+    assert ring.ended(cursor)
+    assert ring.wait_ready(0)
@@ -0,0 +1,56 @@
+import os
+import threading
+from pipe_reader import PipeReader, MAX_LINE, READ_SIZE
+
+def read_all(chunks, register=None):
+    """Lines a fresh reader splits `chunks` into, written one at a time, plus anything passed to on_error"""
+    reader = PipeReader()
+    read_fd, write_fd = os.pipe()
+    pipe = os.fdopen(read_fd, "rb", buffering=0)
+    lines, errors = [], []
+    closed = threading.Event()
+
+    on_line = register or lines.append
+    reader.register(pipe, on_line, closed.set, errors.append)
+    for chunk in chunks:
+        os.write(write_fd, chunk)
+    os.close(write_fd)
+    assert closed.wait(5)
+    pipe.close()
+    return lines, errors
+
+def test_splits_on_newlines_and_carriage_returns():
+    lines, _ = read_all([b"frame=1\nfps=30\r\nspeed=1.0x\rstatus"])
+    assert lines == [b"frame=1", b"fps=30", b"speed=1.0x", b"status"]
+
+def test_joins_lines_split_across_reads():
+    lines, _ = read_all([b"fra", b"me=1\nsp", b"eed=", b"1.0x\n"])
+    assert lines == [b"frame=1", b"speed=1.0x"]
+
+def test_cuts_overlong_lines():
+    # A run without a line break is cut once the buffer passes MAX_LINE, so no line grows past one more read
+    lines, _ = read_all([b"x" * 4096] * (4 * MAX_LINE // 4096) + [b"\nend\n"])
+    assert max(len(line) for line in lines) <= MAX_LINE + READ_SIZE
+    assert sum(len(line) for line in lines[:-1]) < 4 * MAX_LINE
+    assert lines[-1] == b"end"
+
+def test_first_handler_error_reported_once():
+    def fail(line):
+        raise ValueError(line)
+
+    lines, errors = read_all([b"a\nb\nc\n"], register=fail)
+    assert len(errors) == 1
+    assert "ValueError: b'a'" in errors[0]
+
+def test_data_pipes_get_raw_chunks():
+    reader = PipeReader()
+    read_fd, write_fd = os.pipe()
+    pipe = os.fdopen(read_fd, "rb", buffering=0)
+    chunks = []
+    closed = threading.Event()
+    reader.register_data(pipe, chunks.append, closed.set)
+    os.write(write_fd, b"a\r\nb")
+    os.close(write_fd)
+    assert closed.wait(5)
+    pipe.close()
+    assert b"".join(chunks) == b"a\r\nb"
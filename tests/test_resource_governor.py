@@ -0,0 +1,49 @@
+import threading
+import pytest
+import resource_governor
+from resource_governor import ResourceGovernor
+
+@pytest.fixture
+def governor(monkeypatch):
+    # Eight CPUs, whatever the test host has
+    monkeypatch.setattr(resource_governor.os, "sched_getaffinity", lambda pid: set(range(8)), raising=False)
+    return ResourceGovernor(budget=4, reserved=2, nice=0)
+
+def test_keeps_reserved_cores_free(governor):
+    assert governor.reserved == [0, 1]
+    placement = governor.acquire("a", 2)
+    assert placement.cores == [2, 3] and placement.threads == 2
+    assert governor.share(placement) == 2
+
+def test_cost_that_does_not_fit_is_refused(governor):
+    assert governor.acquire("a", 3) is not None
+    assert governor.acquire("b", 2, timeout=0) is None
+    assert governor.available() == 1
+
+def test_same_stream_keeps_its_placement(governor):
+    first = governor.acquire("a", 2)
+    assert governor.acquire("a", 2) is first
+    assert governor.used() == 2
+
+def test_release_frees_cores_and_wakes_waiters(governor):
+    governor.acquire("a", 3)
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(governor.acquire("b", 2, timeout=5)))
+    waiter.start()
+
+    governor.release("a")
+    waiter.join(5)
+    assert result and result[0] is not None
+    # The freed cores are the least loaded again, so "b" gets the first of them
+    assert result[0].cores == [2, 3]
+    assert governor.used() == 2
+
+def test_fractional_costs_share_cores(governor):
+    a = governor.acquire("a", 0.5)
+    b = governor.acquire("b", 0.5)
+    assert a.threads is None and len(a.cores) == 1
+    # Spread over the least loaded cores before doubling up
+    assert a.cores != b.cores
+    c = governor.acquire("c", 3)
+    assert len(c.cores) == 3
+    assert governor.acquire("d", 0.5, timeout=0) is None
@@ -0,0 +1,35 @@
+import time
+from resume_store import checkpoint_path, load_checkpoint
+from media_utils import file_signature
+from file_utils import write_json_atomic
+
+def make_checkpoint(tmp_path, age=0, signature=None):
+    video = tmp_path / "video.mp4"
+    if not video.exists():
+        video.write_bytes(b"\0" * 1000)
+    write_json_atomic(checkpoint_path("key", str(video), str(tmp_path)), {
+        "position": 123.4,
+        "signature": signature or file_signature(str(video)),
+        "updated_at": time.time() - age
+    })
+    return str(video)
+
+def test_fresh_checkpoint_loads(tmp_path):
+    video = make_checkpoint(tmp_path)
+    assert load_checkpoint("key", video, str(tmp_path)) == 123.4
+    # Another stream key has its own checkpoint
+    assert load_checkpoint("other", video, str(tmp_path)) is None
+
+def test_expired_checkpoint_ignored(tmp_path):
+    video = make_checkpoint(tmp_path, age=600)
+    assert load_checkpoint("key", video, str(tmp_path), max_age=300) is None
+    assert load_checkpoint("key", video, str(tmp_path), max_age=3600) == 123.4
+
+def test_changed_file_ignored(tmp_path):
+    video = make_checkpoint(tmp_path)
+    with open(video, "ab") as f:
+        f.write(b"more")
+    assert load_checkpoint("key", video, str(tmp_path)) is None
+
+    video = make_checkpoint(tmp_path, signature=[1, 2])
+    assert load_checkpoint("key", video, str(tmp_path)) is None
@@ -0,0 +1,73 @@
+import time
+import threading
+from types import SimpleNamespace
+import pytest
+import scheduler
+from scheduler import JobStore, StreamScheduler, job_stream_id
+from resource_governor import ResourceGovernor
+from constants import SCHEDULER_START_GRACE
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(path=str(tmp_path / "schedule.db"))
+
+@pytest.fixture
+def stream_scheduler(store):
+    return StreamScheduler(store=store, governor=ResourceGovernor(budget=4, reserved=0, pin=False))
+
+def test_only_one_claim_wins(store):
+    job_id = store.add("video.mp4", "key", time.time())
+    barrier = threading.Barrier(8)
+    results = []
+
+    def claim():
+        barrier.wait()
+        results.append(store.claim(job_id, ("scheduled",), "preparing"))
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert store.get(job_id)["status"] == "preparing"
+
+def test_due_window(store):
+    now = time.time()
+    later = store.add("b.mp4", "key", now + 3600)
+    soon = store.add("a.mp4", "key", now + 60)
+    past = store.add("c.mp4", "key", now - 10)
+    store.claim(past, ("scheduled",), "cancelled")
+
+    assert [job["id"] for job in store.list(("scheduled",), before=now + 120)] == [soon]
+    # Slot order, whatever the insertion order
+    assert [job["id"] for job in store.list()] == [past, soon, later]
+    assert [job["id"] for job in store.list(("scheduled", "cancelled"), before=now)] == [past]
+
+def test_recover_requeues_interrupted_jobs(store, stream_scheduler):
+    now = time.time()
+    preparing = store.add("a.mp4", "key", now + 60)
+    store.update(preparing, status="preparing")
+    running = store.add("b.mp4", "key", now - 5)
+    store.update(running, status="running")
+    stale = store.add("c.mp4", "key", now - SCHEDULER_START_GRACE - 60)
+    store.update(stale, status="running")
+
+    stream_scheduler.recover()
+
+    assert store.get(preparing)["status"] == "scheduled"
+    assert store.get(running)["status"] == "ready"
+    assert store.get(stale)["status"] == "failed"
+
+def test_refused_start_reported(store, stream_scheduler, monkeypatch):
+    monkeypatch.setattr(scheduler, "engine", SimpleNamespace(run_ffmpeg=lambda *args, **kwargs: None))
+    job_id = store.add("a.mp4", "key", time.time())
+    prepared = {"path": "a.mp4", "is_shorts": False, "passthrough": True}
+    store.update(job_id, status="running", prepared=prepared)
+
+    stream_scheduler._stream(store.get(job_id), job_stream_id(job_id))
+
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert "not started" in job["error"] and "code None" not in job["error"]
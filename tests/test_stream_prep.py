@@ -0,0 +1,26 @@
+from stream_prep import loudness_gain
+from constants import LOUDNESS_TARGET, LOUDNESS_TRUE_PEAK, LOUDNESS_TOLERANCE
+
+def test_within_tolerance_left_alone():
+    assert loudness_gain({"integrated": LOUDNESS_TARGET + LOUDNESS_TOLERANCE / 2, "true_peak": LOUDNESS_TRUE_PEAK - 3}) == 0.0
+    assert loudness_gain({"integrated": LOUDNESS_TARGET - LOUDNESS_TOLERANCE, "true_peak": LOUDNESS_TRUE_PEAK}) == 0.0
+
+def test_quiet_audio_raised_to_target():
+    assert loudness_gain({"integrated": LOUDNESS_TARGET - 6.123, "true_peak": LOUDNESS_TRUE_PEAK - 10}) == 6.12
+
+def test_loud_audio_lowered():
+    assert loudness_gain({"integrated": LOUDNESS_TARGET + 4, "true_peak": LOUDNESS_TRUE_PEAK + 1}) == -4.0
+
+def test_peaks_limit_the_gain():
+    # 8 LU too quiet, but peaks only 2.5 dB below the limit
+    loudness = {"integrated": LOUDNESS_TARGET - 8, "true_peak": LOUDNESS_TRUE_PEAK - 2.5}
+    assert loudness_gain(loudness) == 2.5
+    # In tolerance but peaking over the limit: brought down to it
+    loudness = {"integrated": LOUDNESS_TARGET, "true_peak": LOUDNESS_TRUE_PEAK + 0.456}
+    assert loudness_gain(loudness) == round(LOUDNESS_TRUE_PEAK - loudness["true_peak"], 2) == -0.46
+
+def test_missing_measurements():
+    assert loudness_gain(None) is None
+    assert loudness_gain({}) is None
+    assert loudness_gain({"integrated": None, "true_peak": -3.0}) is None
+    assert loudness_gain({"integrated": -20.0}) is None
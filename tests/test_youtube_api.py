@@ -0,0 +1,107 @@
+import time
+import threading
+from datetime import datetime, timezone
+import pytest
+from youtube_api import YouTubeClient, QuotaTracker, QuotaExceededError, ChatRate, ViewerSeries, to_chat_message, QUOTA_COSTS
+from youtube_fake_server import FakeYouTubeServer, BROADCAST_ID, LIVE_CHAT_ID, STREAM_KEY
+
+@pytest.fixture
+def server():
+    server = FakeYouTubeServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def client(server, tmp_path):
+    return YouTubeClient(endpoint=server.endpoint, api_key="test", quota=QuotaTracker(path=str(tmp_path / "quota.json")))
+
+def test_active_broadcast(client):
+    assert client.get_active_broadcast() == {"id": BROADCAST_ID, "title": "Fake Live Stream", "live_chat_id": LIVE_CHAT_ID}
+
+def test_concurrent_stats_reads_share_one_call(client, server):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(client.get_live_stats(BROADCAST_ID))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert server.state.requests["/youtube/v3/videos"] == 1
+    assert len(results) == 8 and all(r == results[0] for r in results)
+    # Cached for the TTL afterwards
+    client.get_live_stats(BROADCAST_ID)
+    assert server.state.requests["/youtube/v3/videos"] == 1
+    assert client.viewer_series(BROADCAST_ID).version == 1
+
+def test_quota_charged_per_method_and_enforced(client, server):
+    client.get_active_broadcast()
+    client.get_chat_messages(LIVE_CHAT_ID)
+    assert client.quota.used == QUOTA_COSTS["liveBroadcasts.list"] + QUOTA_COSTS["liveChatMessages.list"]
+
+    client.quota.daily_budget = client.quota.used + QUOTA_COSTS["liveChatMessages.insert"] - 1
+    with pytest.raises(QuotaExceededError):
+        client.send_chat_message(LIVE_CHAT_ID, "hello")
+    # Refused before the request was made
+    assert server.state.requests["/youtube/v3/liveChat/messages"] == 1
+
+def test_sent_message_listed_once_after_polling(client):
+    sent = client.send_chat_message(LIVE_CHAT_ID, "Thanks for watching!")
+    assert sent["type"] == "owner_message"
+
+    messages = client.get_chat_messages(LIVE_CHAT_ID)
+    assert [m["id"] for m in messages].count(sent["id"]) == 1
+    assert len({m["id"] for m in messages}) == len(messages)
+
+def test_chat_polled_at_most_as_often_as_asked(client, server):
+    first = client.get_chat_messages(LIVE_CHAT_ID)
+    again = client.get_chat_messages(LIVE_CHAT_ID)
+    assert server.state.requests["/youtube/v3/liveChat/messages"] == 1
+    assert again == first
+
+def test_stream_columns(client, server):
+    since = time.time() - 1
+    # Nothing sampled, so nothing to look up
+    assert client.stream_columns(STREAM_KEY, since) == {}
+    assert server.state.requests["/youtube/v3/liveStreams"] == 0
+
+    stats = client.get_live_stats(BROADCAST_ID)
+    columns = client.stream_columns(STREAM_KEY, since)
+    seconds, viewers = columns["viewers"]
+    assert viewers == [stats["viewers"]]
+    assert columns["likes"][1] == [stats["likes"]]
+    assert seconds[0] >= 0
+    assert "chat_rate" not in columns
+
+    messages = client.get_chat_messages(LIVE_CHAT_ID)
+    client.send_chat_message(LIVE_CHAT_ID, "hello")
+    seconds, rate = client.stream_columns(STREAM_KEY, since)["chat_rate"]
+    assert sum(rate) == len(messages) + 1
+
+    assert client.stream_columns("another-key", since) == {}
+    # Samples from before the stream started are left out
+    assert client.stream_columns(STREAM_KEY, time.time() + 60) == {}
+
+def test_chat_rate_per_published_minute():
+    rate = ChatRate()
+    start = 1_000_000 * 60
+    rate.record([start - 30, start + 5, start + 50, start + 70], now=start + 80)
+    rate.record([], now=start + 200)
+    # The minute before the stream is left out; a polled minute without messages counts as zero
+    assert rate.columns(start + 10) == ([0, 50, 170], [2, 1, 0])
+
+def test_viewer_series_bounded():
+    series = ViewerSeries(limit=100)
+    for viewers in range(1000):
+        series.record(viewers, 0)
+    assert len(series.viewers) <= 110
+    assert series.viewers[-1] == 999 and len(series.epochs) == len(series.viewers)
+    # Totals still cover every sample
+    analytics = series.analytics({})
+    assert analytics["version"] == 1000
+    assert analytics["peak_viewers"] == 999 and analytics["avg_viewers"] == 500
+
+def test_chat_timestamp_in_local_time():
+    item = {"id": "m1", "snippet": {"publishedAt": "2026-01-02T03:04:05.123Z", "displayMessage": "hi"}}
+    local = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc).astimezone()
+    assert to_chat_message(item)["timestamp"] == local.strftime("%H:%M:%S")
+    assert to_chat_message({"id": "m2", "snippet": {}})["timestamp"] == "00:00:00"
@@ -0,0 +1,44 @@
+import pytest
+from google.auth.exceptions import RefreshError
+from youtube_auth import CredentialManager
+
+class RevokedCredentials:
+    """Credentials whose grant the user revoked: every refresh is refused"""
+    token = None
+    expiry = None
+    refresh_token = "refresh"
+
+    def __init__(self):
+        self.attempts = 0
+
+    def refresh(self, request):
+        self.attempts += 1
+        raise RefreshError("invalid_grant: Token has been expired or revoked.")
+
+@pytest.fixture
+def manager(tmp_path):
+    token_file = tmp_path / "token.json"
+    manager = CredentialManager(token_file=str(token_file), client_secrets_file=str(tmp_path / "client.json"))
+    token_file.write_text("{}")
+    return manager
+
+def test_revoked_grant_stops_refreshing(manager):
+    credentials = RevokedCredentials()
+    manager._credentials = credentials
+    manager.start()
+    thread = manager._thread
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert credentials.attempts == 1
+    assert not manager.is_authorized
+    assert "connect your account again" in manager.last_error
+    # The stored token is gone, so a restart does not pick it up again
+    assert manager.load() is None
+
+def test_direct_refresh_reports_a_revoked_grant(manager):
+    manager._credentials = RevokedCredentials()
+    with pytest.raises(RefreshError):
+        manager.refresh()
+    assert not manager.is_authorized
+    assert manager.last_error
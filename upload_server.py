@@ -0,0 +1,403 @@
+"""Resumable chunked uploads of large videos straight into the library
+
+Protocol, all JSON and authorized with the `X-Upload-Token` header:
+
+    POST   /uploads        {"name", "size", "sha256"?} -> {"id", "offset"}, or
+                           {"complete": true, "path"} when the content is already in the library
+    GET    /uploads/<id>   -> {"id", "name", "size", "offset"}
+    PATCH  /uploads/<id>   bytes at the `Upload-Offset` header -> {"offset", "complete", "path"?}
+    DELETE /uploads/<id>   abandon an upload
+
+Bytes are appended to a part file in the library's upload directory and
+hashed as they arrive, so a dropped connection resumes from the last byte
+written. Push a file from another machine with
+`python upload_server.py push FILE --url http://host:8766`.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import secrets
+import hashlib
+import argparse
+import threading
+from urllib import request, error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from constants import DATA_DIR, LIBRARY_DIR, UPLOAD_HOST, UPLOAD_PORT, UPLOAD_URL, UPLOAD_CHUNK_SIZE
+from file_utils import read_json, write_json_atomic
+from video_library import add_to_library, find_by_hash, hash_file, is_video_file
+from metrics import counter
+
+UPLOAD_BYTES = counter("upload_bytes_total", "Bytes received by the resumable upload server")
+UPLOADS_COMPLETED = counter("uploads_completed_total", "Resumable uploads finished, by result")
+
+UPLOADS_DIR = os.path.join(LIBRARY_DIR, ".uploads")
+TOKEN_FILE = os.path.join(DATA_DIR, "upload_token")
+
+# Request bodies are copied to disk in blocks of this size
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# Seconds a stalled client may hold a connection
+CLIENT_TIMEOUT = 60
+
+UPLOAD_PATH = re.compile(r"^/uploads/([0-9a-f]{32})$")
+
+def upload_token():
+    """Shared secret for the upload API, from UPLOAD_TOKEN or generated once per data directory"""
+    token = os.getenv("UPLOAD_TOKEN")
+    if token:
+        return token
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE) as f:
+            return f.read().strip()
+
+    os.makedirs(os.path.dirname(TOKEN_FILE) or ".", exist_ok=True)
+    token = secrets.token_hex(16)
+    fd = os.open(TOKEN_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+class UploadSession:
+    """One upload in progress; its part file on disk is the source of truth for the offset"""
+
+    def __init__(self, upload_id, name, size, sha256=None, created_at=None):
+        self.id = upload_id
+        self.name = name
+        self.size = size
+        self.sha256 = sha256
+        self.created_at = created_at or time.time()
+        self.lock = threading.Lock()
+        self._hasher = None
+        self._hashed = 0
+
+    @property
+    def part_path(self):
+        return os.path.join(UPLOADS_DIR, f"{self.id}.part")
+
+    @property
+    def meta_path(self):
+        return os.path.join(UPLOADS_DIR, f"{self.id}.json")
+
+    @property
+    def offset(self):
+        return os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+
+    def save(self):
+        write_json_atomic(self.meta_path, {
+            "id": self.id, "name": self.name, "size": self.size,
+            "sha256": self.sha256, "created_at": self.created_at
+        })
+
+    def describe(self):
+        return {"id": self.id, "name": self.name, "size": self.size, "offset": self.offset}
+
+    def hasher(self):
+        """Hash state matching the part file, caught up from disk after a restart"""
+        offset = self.offset
+        if self._hasher is None or self._hashed != offset:
+            self._hasher = hash_file(self.part_path) if offset else hashlib.sha256()
+            self._hashed = offset
+        return self._hasher
+
+    def append(self, stream, length):
+        """Copy `length` bytes from the request to the part file; returns how many arrived"""
+        hasher = self.hasher()
+        buffer = bytearray(COPY_BLOCK_SIZE)
+        view = memoryview(buffer)
+        received = 0
+        with open(self.part_path, "ab") as f:
+            while received < length:
+                try:
+                    size = stream.readinto(view[:min(COPY_BLOCK_SIZE, length - received)])
+                except OSError:
+                    # Connection dropped or timed out; keep what arrived
+                    break
+                if not size:
+                    break
+                f.write(view[:size])
+                hasher.update(view[:size])
+                received += size
+                self._hashed += size
+                UPLOAD_BYTES.inc(size)
+        return received
+
+    def discard(self):
+        for path in (self.part_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+class UploadRegistry:
+    """Uploads in progress, reloaded from the upload directory on start"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        if os.path.isdir(UPLOADS_DIR):
+            for name in os.listdir(UPLOADS_DIR):
+                if name.endswith(".json"):
+                    meta = read_json(os.path.join(UPLOADS_DIR, name))
+                    self.sessions[meta["id"]] = UploadSession(meta["id"], meta["name"], meta["size"], meta["sha256"], meta["created_at"])
+        # Rehash interrupted part files now rather than inside their next request
+        threading.Thread(target=self._catch_up, name="upload-rehash", daemon=True).start()
+
+    def _catch_up(self):
+        for session in list(self.sessions.values()):
+            with session.lock:
+                session.hasher()
+
+    def create(self, name, size, sha256=None):
+        """Start an upload, or resume the unfinished one for the same file"""
+        with self.lock:
+            if sha256:
+                for session in self.sessions.values():
+                    if session.sha256 == sha256 and session.size == size:
+                        return session
+
+            session = UploadSession(uuid.uuid4().hex, name, size, sha256)
+            os.makedirs(UPLOADS_DIR, exist_ok=True)
+            session.save()
+            self.sessions[session.id] = session
+            return session
+
+    def get(self, upload_id):
+        with self.lock:
+            return self.sessions.get(upload_id)
+
+    def remove(self, upload_id):
+        with self.lock:
+            return self.sessions.pop(upload_id, None)
+
+class UploadHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = CLIENT_TIMEOUT
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_cors_headers()
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_cors_headers(self):
+        # Requests carry the token, so the uploader component may run on any origin
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PATCH, DELETE, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, Upload-Offset, X-Upload-Token")
+
+    def authorized(self):
+        if secrets.compare_digest(self.headers.get("X-Upload-Token", ""), self.server.token):
+            return True
+        self.send_json({"error": "Invalid upload token"}, status=401)
+        return False
+
+    def session(self):
+        match = UPLOAD_PATH.match(self.path)
+        session = self.server.registry.get(match.group(1)) if match else None
+        if session is None:
+            self.send_json({"error": "Unknown upload"}, status=404)
+        return session
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_cors_headers()
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        if self.path != "/uploads":
+            return self.send_json({"error": "Not found"}, status=404)
+        if not self.authorized():
+            return
+
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "{}")
+        name, size, sha256 = os.path.basename(body.get("name", "")), body.get("size"), body.get("sha256")
+        if not is_video_file(name) or not isinstance(size, int) or size <= 0:
+            return self.send_json({"error": "Expected a video file name and its size in bytes"}, status=400)
+
+        if sha256:
+            existing = find_by_hash(sha256)
+            if existing:
+                return self.send_json({"complete": True, "path": existing})
+
+        os.makedirs(LIBRARY_DIR, exist_ok=True)
+        if shutil.disk_usage(LIBRARY_DIR).free < size:
+            return self.send_json({"error": "Not enough free space in the library"}, status=507)
+
+        session = self.server.registry.create(name, size, sha256)
+        self.send_json(session.describe(), status=201)
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        session = self.session()
+        if session is not None:
+            self.send_json(session.describe())
+
+    def do_DELETE(self):
+        if not self.authorized():
+            return
+        session = self.session()
+        if session is None:
+            return
+        with session.lock:
+            self.server.registry.remove(session.id)
+            session.discard()
+        self.send_json({"deleted": True})
+
+    def do_PATCH(self):
+        length = int(self.headers.get("Content-Length", 0))
+        # The body may be left unread or cut short, so the connection cannot be reused
+        self.close_connection = True
+        if not self.authorized():
+            return
+        session = self.session()
+        if session is None:
+            return
+
+        if not session.lock.acquire(blocking=False):
+            return self.send_json({"error": "Upload is already receiving data", "offset": session.offset}, status=409)
+        try:
+            offset = session.offset
+            if self.headers.get("Upload-Offset") != str(offset):
+                # The client lost track after a blip; it resumes from here
+                return self.send_json({"error": "Offset mismatch", "offset": offset}, status=409)
+            if offset + length > session.size:
+                return self.send_json({"error": "Chunk runs past the declared size", "offset": offset}, status=413)
+
+            if session.append(self.rfile, length) < length:
+                # The client is gone; it asks for the offset when it comes back
+                return
+            if session.offset < session.size:
+                return self.send_json({"offset": session.offset, "complete": False})
+
+            return self.complete(session)
+        finally:
+            session.lock.release()
+
+    def complete(self, session):
+        """Verify a complete upload and move it into the library"""
+        self.server.registry.remove(session.id)
+        sha256 = session.hasher().hexdigest()
+        if session.sha256 and session.sha256 != sha256:
+            session.discard()
+            UPLOADS_COMPLETED.inc(result="corrupt")
+            return self.send_json({"error": "Checksum mismatch; upload discarded", "offset": 0}, status=422)
+
+        path = add_to_library(session.part_path, session.name, sha256, "upload")
+        session.discard()
+        UPLOADS_COMPLETED.inc(result="ok")
+        self.send_json({"offset": session.size, "complete": True, "path": path, "sha256": sha256})
+
+class UploadServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host=UPLOAD_HOST, port=UPLOAD_PORT, token=None):
+        super().__init__((host, port), UploadHandler)
+        self.token = token or upload_token()
+        self.registry = UploadRegistry()
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_upload_server():
+    """Serve resumable uploads once per process; None if the port is taken"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = UploadServer()
+            except OSError:
+                return None
+            threading.Thread(target=_server.serve_forever, name="upload-server", daemon=True).start()
+        return _server
+
+def api_call(url, token, method="GET", data=None, headers=None):
+    """One upload API request; returns (status, JSON body)"""
+    headers = dict(headers or {}, **{"X-Upload-Token": token})
+    if isinstance(data, dict):
+        data = json.dumps(data).encode()
+        headers["Content-Type"] = "application/json"
+
+    req = request.Request(url, data=data, headers=headers, method=method)
+    try:
+        with request.urlopen(req, timeout=CLIENT_TIMEOUT) as response:
+            return response.status, json.load(response)
+    except error.HTTPError as e:
+        return e.code, json.load(e)
+
+def push(path, url=UPLOAD_URL, token=None, chunk_size=UPLOAD_CHUNK_SIZE, retries=8):
+    """Upload a file, resuming after network errors; returns its library path on the server"""
+    token = token or upload_token()
+    size = os.path.getsize(path)
+    sha256 = hash_file(path).hexdigest()
+
+    status, body = api_call(f"{url}/uploads", token, "POST", {"name": os.path.basename(path), "size": size, "sha256": sha256})
+    if status >= 400:
+        raise RuntimeError(body["error"])
+    if body.get("complete"):
+        return body["path"]
+
+    upload_url, offset, failures = f"{url}/uploads/{body['id']}", body["offset"], 0
+    with open(path, "rb") as f:
+        while True:
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+            try:
+                status, body = api_call(upload_url, token, "PATCH", chunk, {
+                    "Upload-Offset": str(offset),
+                    "Content-Type": "application/offset+octet-stream"
+                })
+            except (OSError, ValueError):
+                failures += 1
+                if failures > retries:
+                    raise
+                time.sleep(min(30, 2 ** failures))
+                # Ask where the server got to before sending more
+                try:
+                    status, body = api_call(upload_url, token)
+                except (OSError, ValueError):
+                    continue
+
+            if status >= 400 and status != 409:
+                raise RuntimeError(body["error"])
+            if body.get("complete"):
+                return body["path"]
+            if status == 409 and body["offset"] == offset:
+                # The server is still draining the dropped request
+                time.sleep(1)
+            elif status < 400:
+                failures = 0
+            offset = body["offset"]
+            print(f"\r{offset / size * 100:5.1f}% of {size / 1e9:.2f} GB", end="", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("serve", help="Run the upload server in the foreground")
+    send = commands.add_parser("push", help="Upload a file, resuming if interrupted")
+    send.add_argument("path")
+    send.add_argument("--url", default=UPLOAD_URL)
+    send.add_argument("--token", help="Defaults to UPLOAD_TOKEN or the local token file")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = UploadServer()
+        print(f"Uploads on {UPLOAD_HOST}:{UPLOAD_PORT} into {LIBRARY_DIR}, token {server.token}")
+        server.serve_forever()
+    else:
+        print(f"\nStored as {push(args.path, args.url, args.token)}")
+
+if __name__ == "__main__":
+    main()
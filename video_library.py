@@ -0,0 +1,139 @@
+"""Video library: large files added by resumable upload or from a drop folder
+
+Import files already on the host with `python video_library.py import PATH...`,
+or move them into the drop folder and run `python video_library.py scan`.
+"""
+import os
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+from constants import LIBRARY_DIR, DROP_DIR, DROP_SETTLE_SECONDS, SUPPORTED_VIDEO_FORMATS
+from file_utils import read_json, write_json_atomic
+from metrics import counter
+
+LIBRARY_IMPORTS = counter("library_imports_total", "Videos added to the library, by source")
+
+INDEX_FILE = "library.json"
+
+# Read size for hashing; files are streamed, never loaded whole
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+_index_lock = threading.Lock()
+
+def load_index(library_dir=LIBRARY_DIR):
+    """Library entries by file name: size, sha256, source and when they were added"""
+    return read_json(os.path.join(library_dir, INDEX_FILE), default={})
+
+def hash_file(path, hasher=None, start=0):
+    """Feed a file into a sha256 hasher from `start` in fixed-size blocks"""
+    hasher = hasher or hashlib.sha256()
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb") as f:
+        f.seek(start)
+        while True:
+            size = f.readinto(buffer)
+            if not size:
+                return hasher
+            hasher.update(view[:size])
+
+def is_video_file(name):
+    return name.rsplit(".", 1)[-1].lower() in SUPPORTED_VIDEO_FORMATS
+
+def find_by_hash(sha256, library_dir=LIBRARY_DIR):
+    """Path of a library file with this content, if there is one"""
+    for name, entry in load_index(library_dir).items():
+        path = os.path.join(library_dir, name)
+        if entry["sha256"] == sha256 and os.path.exists(path):
+            return path
+    return None
+
+def unique_name(name, library_dir=LIBRARY_DIR):
+    """`name`, or `name (2)` and so on if the library already has a different file by that name"""
+    base, ext = os.path.splitext(os.path.basename(name))
+    candidate, n = base + ext, 2
+    while os.path.exists(os.path.join(library_dir, candidate)):
+        candidate = f"{base} ({n}){ext}"
+        n += 1
+    return candidate
+
+def add_to_library(path, name, sha256, source, library_dir=LIBRARY_DIR):
+    """Move a complete file into the library and index it; returns its library path"""
+    os.makedirs(library_dir, exist_ok=True)
+    with _index_lock:
+        name = unique_name(name, library_dir)
+        target = os.path.join(library_dir, name)
+        # A rename on the same filesystem; otherwise copied in blocks
+        shutil.move(path, target)
+
+        index = load_index(library_dir)
+        index[name] = {
+            "size": os.path.getsize(target),
+            "sha256": sha256,
+            "source": source,
+            "added_at": time.time()
+        }
+        write_json_atomic(os.path.join(library_dir, INDEX_FILE), index)
+
+    LIBRARY_IMPORTS.inc(source=source)
+    return target
+
+def import_file(path, source="import", library_dir=LIBRARY_DIR):
+    """Hash a file on this host and move it into the library, unless its content is already there"""
+    sha256 = hash_file(path).hexdigest()
+    existing = find_by_hash(sha256, library_dir)
+    if existing:
+        return existing, False
+    return add_to_library(path, os.path.basename(path), sha256, source, library_dir), True
+
+def scan_drop_folder(drop_dir=DROP_DIR, library_dir=LIBRARY_DIR):
+    """Import the videos in the drop folder that have finished copying; returns (path, imported) pairs"""
+    if not os.path.isdir(drop_dir):
+        return []
+
+    results = []
+    for name in sorted(os.listdir(drop_dir)):
+        path = os.path.join(drop_dir, name)
+        if not os.path.isfile(path) or not is_video_file(name):
+            continue
+        # Still being written by whatever is copying it in
+        if time.time() - os.path.getmtime(path) < DROP_SETTLE_SECONDS:
+            continue
+
+        # Duplicates stay in the drop folder for the owner to deal with
+        results.append(import_file(path, "drop", library_dir))
+    return results
+
+def list_videos(library_dir=LIBRARY_DIR):
+    """Paths of the library's videos, newest first"""
+    index = load_index(library_dir)
+    names = sorted(index, key=lambda name: index[name]["added_at"], reverse=True)
+    return [os.path.join(library_dir, name) for name in names if os.path.exists(os.path.join(library_dir, name))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("import", help="Move files on this host into the library")
+    add.add_argument("paths", nargs="+")
+    commands.add_parser("scan", help="Import settled files from the drop folder")
+    commands.add_parser("list", help="Show the library")
+
+    args = parser.parse_args()
+
+    if args.command == "import":
+        results = [import_file(path) for path in args.paths]
+    elif args.command == "scan":
+        results = scan_drop_folder()
+    else:
+        for name, entry in load_index().items():
+            print(f"{entry['size'] / 1e9:8.2f} GB  {entry['sha256'][:12]}  {entry['source']:<6}  {name}")
+        return
+
+    for path, imported in results:
+        print(f"{'Imported' if imported else 'Already in library'}: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+import os
+import time
+import bisect
+import threading
+from collections import deque, Counter
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from constants import (
+    DATA_DIR,
+    YOUTUBE_API_ENDPOINT,
+    YOUTUBE_API_KEY,
+    YOUTUBE_DAILY_QUOTA,
+    LIVE_STATS_TTL,
+    BROADCAST_TTL,
+    VIEWER_SERIES_SAMPLES,
+    CHAT_RATE_MINUTES
+)
+from file_utils import read_json, write_json_atomic
+from youtube_auth import get_credential_manager
+from metrics import counter, timer
+
+# Quota cost of each API method, in units
+QUOTA_COSTS = {
+    "liveBroadcasts.list": 1,
+    "liveStreams.list": 1,
+    "videos.list": 1,
+    "liveChatMessages.list": 5,
+    "liveChatMessages.insert": 50
+}
+
+QUOTA_FILE = os.path.join(DATA_DIR, "quota.json")
+
+# The daily quota resets at midnight Pacific time
+QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+# Most results the list methods return per page
+MAX_RESULTS_PER_PAGE = 50
+
+# Recent chat messages kept per live chat for all sessions to read
+CHAT_BUFFER_SIZE = 2000
+
+API_TIMEOUT = 10
+
+API_CALLS = counter("youtube_api_calls_total", "YouTube Data API calls by method")
+QUOTA_USED = counter("youtube_api_quota_units_total", "Quota units charged by method")
+
+class QuotaExceededError(Exception):
+    """Raised when a call would exceed the daily API quota"""
+
+class QuotaTracker:
+    """Tracks API quota spent today and refuses calls past the daily budget"""
+
+    def __init__(self, daily_budget=YOUTUBE_DAILY_QUOTA, path=QUOTA_FILE):
+        self.daily_budget = daily_budget
+        self.path = path
+        self.lock = threading.Lock()
+
+        state = read_json(path, default={})
+        self.day = state.get("day")
+        self.used = state.get("used", 0)
+        self.calls = Counter(state.get("calls", {}))
+        self._roll_day()
+
+    def _roll_day(self):
+        today = datetime.now(QUOTA_TIMEZONE).date().isoformat()
+        if self.day != today:
+            self.day = today
+            self.used = 0
+            self.calls = Counter()
+
+    @property
+    def remaining(self):
+        return max(0, self.daily_budget - self.used)
+
+    def spend(self, method):
+        """Charge a call against today's budget before it is made"""
+        cost = QUOTA_COSTS.get(method, 1)
+
+        with self.lock:
+            self._roll_day()
+            if self.used + cost > self.daily_budget:
+                raise QuotaExceededError(f"{method} needs {cost} units, {self.remaining} left today")
+
+            self.used += cost
+            self.calls[method] += 1
+
+            try:
+                write_json_atomic(self.path, self.snapshot())
+            except OSError:
+                pass
+
+    def snapshot(self):
+        return {
+            "day": self.day,
+            "used": self.used,
+            "remaining": self.remaining,
+            "calls": dict(self.calls)
+        }
+
+class _Flight:
+    """A fetch in progress that other callers of the same key wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+class TTLCache:
+    """Response cache shared by all sessions, with request coalescing on misses"""
+
+    def __init__(self):
+        self._entries = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, key, ttl, fetch):
+        """Return a fresh cached value or fetch it once for all concurrent callers"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+
+            flight = self._inflight.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not is_leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = fetch()
+            self.put(key, flight.value, ttl(flight.value) if callable(ttl) else ttl)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.event.set()
+
+    def put(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+class ViewerSeries:
+    """Viewer and like counts sampled each time live stats are fetched
+
+    Only the newest `limit` samples are kept; the lists are trimmed in chunks
+    so appending stays cheap and `columns` can still bisect them.
+    """
+
+    def __init__(self, limit=VIEWER_SERIES_SAMPLES):
+        self.lock = threading.Lock()
+        self.limit = limit
+        # Wall-clock time of each sample, so it can be lined up with a stream's start
+        self.epochs = []
+        self.times = []
+        self.viewers = []
+        self.likes = []
+        self.samples = 0
+        self.peak_viewers = 0
+        self.viewer_total = 0
+
+    @property
+    def version(self):
+        return self.samples
+
+    def record(self, viewers, likes):
+        with self.lock:
+            now = time.time()
+            self.epochs.append(now)
+            self.times.append(datetime.fromtimestamp(now).strftime("%H:%M:%S"))
+            self.viewers.append(viewers)
+            self.likes.append(likes)
+            self.samples += 1
+            self.peak_viewers = max(self.peak_viewers, viewers)
+            self.viewer_total += viewers
+
+            excess = len(self.epochs) - self.limit
+            if excess > self.limit // 10:
+                for values in (self.epochs, self.times, self.viewers, self.likes):
+                    del values[:excess]
+
+    def columns(self, since):
+        """Series recorded from `since` (epoch seconds) on, in the `(seconds since then, values)` form used by the history store"""
+        with self.lock:
+            first = bisect.bisect_left(self.epochs, since)
+            seconds = [int(epoch - since) for epoch in self.epochs[first:]]
+            return {
+                "viewers": (seconds, self.viewers[first:]),
+                "likes": (seconds, self.likes[first:])
+            }
+
+    def analytics(self, stats):
+        """Analytics dict in the shape the dashboard components read"""
+        with self.lock:
+            return {
+                "version": self.version,
+                "times": list(self.times),
+                "epochs": list(self.epochs),
+                "viewers": list(self.viewers),
+                "likes": list(self.likes),
+                "peak_viewers": self.peak_viewers,
+                "avg_viewers": round(self.viewer_total / self.samples) if self.samples else 0,
+                "total_likes": stats.get("likes", 0),
+                "comments": stats.get("comments", 0)
+            }
+
+class ChatRate:
+    """Chat messages counted per minute they were published, for the stream archive"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Epoch minute -> messages; a minute exists once chat was polled or posted in it
+        self.minutes = {}
+
+    def record(self, epochs, now=None):
+        """Count messages published at `epochs`, and mark the current minute as watched"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.minutes.setdefault(int(now // 60), 0)
+            for epoch in epochs:
+                minute = int(epoch // 60)
+                self.minutes[minute] = self.minutes.get(minute, 0) + 1
+            if len(self.minutes) > CHAT_RATE_MINUTES:
+                oldest = int(now // 60) - CHAT_RATE_MINUTES
+                self.minutes = {m: c for m, c in self.minutes.items() if m > oldest}
+
+    def columns(self, since):
+        """Messages per minute from `since` (epoch seconds) on, as `(seconds since then, values)`"""
+        with self.lock:
+            minutes = sorted(m for m in self.minutes if m >= int(since // 60))
+            return (
+                [max(0, int(m * 60 - since)) for m in minutes],
+                [self.minutes[m] for m in minutes]
+            )
+
+def published_epoch(item):
+    """Epoch seconds a liveChatMessage was published, or None"""
+    try:
+        return datetime.fromisoformat(item["snippet"]["publishedAt"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, ValueError):
+        return None
+
+def to_chat_message(item):
+    """Convert a liveChatMessage resource to the app's chat message dict"""
+    snippet = item.get("snippet", {})
+    author = item.get("authorDetails", {})
+    event_type = snippet.get("type")
+    published = published_epoch(item)
+
+    message = {
+        "id": item.get("id"),
+        "author": author.get("displayName", "Anonymous"),
+        "channel_id": author.get("channelId"),
+        "message": snippet.get("displayMessage", ""),
+        # publishedAt is UTC; shown in local time like the rest of the dashboard
+        "timestamp": datetime.fromtimestamp(published).strftime("%H:%M:%S") if published is not None else "00:00:00",
+        "type": "regular"
+    }
+
+    if author.get("isChatOwner"):
+        message["type"] = "owner_message"
+    elif event_type == "superChatEvent":
+        details = snippet.get("superChatDetails", {})
+        message["type"] = "super_chat"
+        message["amount"] = details.get("amountDisplayString")
+        message["currency"] = details.get("currency")
+        message["amount_micros"] = int(details.get("amountMicros", 0))
+    elif event_type in ("newSponsorEvent", "memberMilestoneChatEvent", "membershipGiftingEvent"):
+        message["type"] = "membership"
+
+    return message
+
+class YouTubeClient:
+    """Shared YouTube Data API client with connection reuse, caching and quota tracking"""
+
+    def __init__(self, endpoint=YOUTUBE_API_ENDPOINT, api_key=YOUTUBE_API_KEY, credentials_provider=None, quota=None):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.credentials_provider = credentials_provider
+        self.quota = quota or QuotaTracker()
+        self.cache = TTLCache()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._chats = {}
+        self._series = {}
+        # Live chat of each broadcast seen, to find the chat rate of a stream
+        self._live_chats = {}
+
+    def service(self):
+        """API service for the calling thread; its HTTP object keeps connections open"""
+        credentials = self.credentials_provider() if self.credentials_provider else None
+        service = getattr(self._local, "service", None)
+
+        if service is None or self._local.credentials is not credentials:
+            import httplib2
+            from googleapiclient.discovery import build
+
+            http = httplib2.Http(timeout=API_TIMEOUT)
+            if credentials is not None:
+                import google_auth_httplib2
+                http = google_auth_httplib2.AuthorizedHttp(credentials, http=http)
+
+            service = build(
+                "youtube",
+                "v3",
+                http=http,
+                developerKey=self.api_key if credentials is None else None,
+                client_options={"api_endpoint": self.endpoint} if self.endpoint else None,
+                static_discovery=True
+            )
+            self._local.service = service
+            self._local.credentials = credentials
+
+        return service
+
+    def execute(self, method, request):
+        """Charge the quota and run one API request"""
+        self.quota.spend(method)
+        API_CALLS.inc(method=method)
+        QUOTA_USED.inc(QUOTA_COSTS.get(method, 1), method=method)
+        with timer("youtube_api_seconds", "YouTube Data API call latency", method=method):
+            return request.execute(num_retries=2)
+
+    def get_active_broadcast(self):
+        """The channel's active broadcast as {"id", "title", "live_chat_id"}, or None"""
+        def fetch():
+            response = self.execute("liveBroadcasts.list", self.service().liveBroadcasts().list(
+                part="id,snippet",
+                broadcastStatus="active",
+                broadcastType="all"
+            ))
+            items = response.get("items", [])
+            if not items:
+                return None
+            live_chat_id = items[0]["snippet"].get("liveChatId")
+            if live_chat_id:
+                with self._lock:
+                    self._live_chats[items[0]["id"]] = live_chat_id
+            return {
+                "id": items[0]["id"],
+                "title": items[0]["snippet"].get("title", ""),
+                "live_chat_id": live_chat_id
+            }
+
+        return self.cache.get_or_fetch(("broadcast",), BROADCAST_TTL, fetch)
+
+    def _fetch_video(self, video_id):
+        """Fetch the live stats of one video and record them in its viewer series"""
+        response = self.execute("videos.list", self.service().videos().list(
+            part="statistics,liveStreamingDetails",
+            id=video_id
+        ))
+        items = response.get("items", [])
+        if not items:
+            return {}
+
+        statistics = items[0].get("statistics", {})
+        details = items[0].get("liveStreamingDetails", {})
+        stats = {
+            "viewers": int(details.get("concurrentViewers", 0)),
+            "likes": int(statistics.get("likeCount", 0)),
+            "comments": int(statistics.get("commentCount", 0)),
+            "live_chat_id": details.get("activeLiveChatId")
+        }
+        self.viewer_series(video_id).record(stats["viewers"], stats["likes"])
+        if stats["live_chat_id"]:
+            with self._lock:
+                self._live_chats[video_id] = stats["live_chat_id"]
+        return stats
+
+    def get_live_stats(self, video_id):
+        """Viewer, like and comment counts of a live video"""
+        return self.cache.get_or_fetch(("video", video_id), LIVE_STATS_TTL, lambda: self._fetch_video(video_id))
+
+    def viewer_series(self, video_id):
+        with self._lock:
+            if video_id not in self._series:
+                self._series[video_id] = ViewerSeries()
+            return self._series[video_id]
+
+    def broadcasts_for_stream_key(self, stream_key):
+        """Ids of the channel's broadcasts bound to the ingest stream with this key"""
+        def fetch():
+            streams = self.execute("liveStreams.list", self.service().liveStreams().list(
+                part="id,cdn",
+                mine=True,
+                maxResults=MAX_RESULTS_PER_PAGE
+            ))
+            stream_ids = {
+                item["id"] for item in streams.get("items", [])
+                if item.get("cdn", {}).get("ingestionInfo", {}).get("streamName") == stream_key
+            }
+            if not stream_ids:
+                return []
+
+            broadcasts = self.execute("liveBroadcasts.list", self.service().liveBroadcasts().list(
+                part="id,contentDetails",
+                mine=True,
+                broadcastType="all",
+                maxResults=MAX_RESULTS_PER_PAGE
+            ))
+            return [
+                item["id"] for item in broadcasts.get("items", [])
+                if item.get("contentDetails", {}).get("boundStreamId") in stream_ids
+            ]
+
+        return self.cache.get_or_fetch(("bound", stream_key), BROADCAST_TTL, fetch)
+
+    def stream_columns(self, stream_key, since):
+        """Viewer, like and chat rate series recorded since `since` for the broadcast a stream key fed, or {}
+
+        Samples are only taken while a dashboard reads live stats or chat, so
+        with none recorded at all no API call is made.
+        """
+        with self._lock:
+            if not self._series and not self._chats:
+                return {}
+
+        for video_id in self.broadcasts_for_stream_key(stream_key):
+            with self._lock:
+                series = self._series.get(video_id)
+                chat = self._chats.get(self._live_chats.get(video_id))
+            columns = series.columns(since) if series is not None else {}
+            if chat is not None:
+                columns["chat_rate"] = chat["rate"].columns(since)
+            if any(seconds for seconds, _ in columns.values()):
+                return columns
+        return {}
+
+    def _chat_state(self, live_chat_id):
+        with self._lock:
+            if live_chat_id not in self._chats:
+                self._chats[live_chat_id] = {
+                    "page_token": None,
+                    "messages": deque(maxlen=CHAT_BUFFER_SIZE),
+                    # Ids of messages sent from here, already buffered when polling returns them
+                    "sent": set(),
+                    "rate": ChatRate()
+                }
+            return self._chats[live_chat_id]
+
+    def get_chat_messages(self, live_chat_id):
+        """Recent chat messages, polled at most as often as the API asks"""
+        state = self._chat_state(live_chat_id)
+
+        def fetch():
+            response = self.execute("liveChatMessages.list", self.service().liveChatMessages().list(
+                liveChatId=live_chat_id,
+                part="snippet,authorDetails",
+                pageToken=state["page_token"]
+            ))
+            state["page_token"] = response.get("nextPageToken")
+            published = []
+            with self._lock:
+                for item in response.get("items", []):
+                    if item.get("id") in state["sent"]:
+                        state["sent"].discard(item["id"])
+                    else:
+                        state["messages"].append(to_chat_message(item))
+                        published.append(published_epoch(item) or time.time())
+            state["rate"].record(published)
+            return response.get("pollingIntervalMillis", 5000) / 1000
+
+        self.cache.get_or_fetch(("chat", live_chat_id), lambda interval: interval, fetch)
+        return list(state["messages"])
+
+    def send_chat_message(self, live_chat_id, text):
+        """Post a message to the live chat as the authenticated channel"""
+        item = self.execute("liveChatMessages.insert", self.service().liveChatMessages().insert(
+            part="snippet",
+            body={
+                "snippet": {
+                    "liveChatId": live_chat_id,
+                    "type": "textMessageEvent",
+                    "textMessageDetails": {"messageText": text}
+                }
+            }
+        ))
+        # Insert responses carry no author details; the poster is always the owner
+        message = to_chat_message(item)
+        message.update(author="You (Channel Owner)", message=text, type="owner_message")
+        state = self._chat_state(live_chat_id)
+        with self._lock:
+            # A poll that ran meanwhile may have buffered, and counted, it already
+            if any(m["id"] == message["id"] for m in state["messages"]):
+                return message
+            state["sent"].add(message["id"])
+            state["messages"].append(message)
+        state["rate"].record([published_epoch(item) or time.time()])
+        return message
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The process-wide API client shared by every session"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = YouTubeClient(credentials_provider=get_credential_manager().credentials)
+        return _client
@@ -0,0 +1,171 @@
+import os
+import threading
+from datetime import datetime
+from constants import (
+    YOUTUBE_CLIENT_SECRETS_FILE,
+    YOUTUBE_TOKEN_FILE,
+    YOUTUBE_SCOPES,
+    TOKEN_REFRESH_MARGIN
+)
+
+# Wait between attempts when a refresh fails, in seconds
+REFRESH_RETRY_DELAY = 30
+
+class CredentialManager:
+    """Caches YouTube OAuth credentials on disk and refreshes them in the background"""
+
+    def __init__(self, token_file=YOUTUBE_TOKEN_FILE, client_secrets_file=YOUTUBE_CLIENT_SECRETS_FILE, scopes=YOUTUBE_SCOPES):
+        self.token_file = token_file
+        self.client_secrets_file = client_secrets_file
+        self.scopes = scopes
+        self.last_error = None
+
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self.load()
+
+    def load(self):
+        """Load cached credentials from disk without any network round trip"""
+        if not os.path.exists(self.token_file):
+            return None
+
+        from google.oauth2.credentials import Credentials
+
+        try:
+            credentials = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+        except ValueError as e:
+            self.last_error = f"Ignoring unreadable token file: {e}"
+            return None
+
+        with self._lock:
+            self._credentials = credentials
+        self.start()
+        return credentials
+
+    def save(self, credentials):
+        """Persist credentials readable by the current user only"""
+        directory = os.path.dirname(self.token_file) or "."
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        tmp_path = f"{self.token_file}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(credentials.to_json())
+        os.replace(tmp_path, self.token_file)
+
+    def credentials(self):
+        """Current credentials, never blocking on the network"""
+        with self._lock:
+            return self._credentials
+
+    @property
+    def is_authorized(self):
+        return self.credentials() is not None
+
+    def authorize(self):
+        """Run the interactive browser consent flow and cache the result"""
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
+        flow = InstalledAppFlow.from_client_secrets_file(self.client_secrets_file, self.scopes)
+        credentials = flow.run_local_server(port=0, open_browser=True)
+        self.save(credentials)
+
+        with self._lock:
+            self._credentials = credentials
+        self.last_error = None
+        self.start()
+        self._wake.set()
+        return credentials
+
+    def revoke(self):
+        """Forget the cached credentials"""
+        with self._lock:
+            self._credentials = None
+        if os.path.exists(self.token_file):
+            os.remove(self.token_file)
+        self._wake.set()
+
+    def seconds_until_refresh(self):
+        """Time left before the token should be refreshed, or None without a token"""
+        credentials = self.credentials()
+        if credentials is None or not credentials.refresh_token:
+            return None
+
+        if credentials.expiry is None or not credentials.token:
+            return 0
+
+        # google-auth keeps expiry as a naive UTC datetime
+        remaining = (credentials.expiry - datetime.utcnow()).total_seconds()
+        return max(0, remaining - TOKEN_REFRESH_MARGIN)
+
+    def refresh(self):
+        """Refresh the access token now and persist it
+
+        A RefreshError means the grant was revoked or expired, which no retry
+        fixes: the stored token is dropped so the UI asks to connect again.
+        """
+        from google.auth.exceptions import RefreshError
+        from google.auth.transport.requests import Request
+
+        credentials = self.credentials()
+        if credentials is None:
+            return
+
+        try:
+            credentials.refresh(Request())
+        except RefreshError as e:
+            # Unless the account was connected again meanwhile
+            if self.credentials() is credentials:
+                self.revoke()
+                self.last_error = f"YouTube access was revoked or has expired ({e}); connect your account again"
+            raise
+        self.save(credentials)
+        self.last_error = None
+
+    def start(self):
+        """Start the background refresher once"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="youtube-token-refresh", daemon=True)
+        self._thread.start()
+
+    def _refresh_loop(self):
+        from google.auth.exceptions import RefreshError
+
+        while True:
+            delay = self.seconds_until_refresh()
+
+            # Sleep until the token is close to expiry or the credentials change
+            if delay is None or delay > 0:
+                self._wake.wait(timeout=delay)
+                self._wake.clear()
+                continue
+
+            try:
+                self.refresh()
+            except RefreshError:
+                # Nothing left to refresh; authorize() starts a new loop,
+                # unless it already ran meanwhile and this one carries on
+                with self._lock:
+                    if self._credentials is None:
+                        self._thread = None
+                        return
+            except Exception as e:
+                self.last_error = f"Token refresh failed: {e}"
+                self._wake.wait(timeout=REFRESH_RETRY_DELAY)
+                self._wake.clear()
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_credential_manager():
+    """The process-wide credential manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = CredentialManager()
+        return _manager
@@ -0,0 +1,179 @@
+"""Local stand-in for the YouTube Data API, for working and testing offline
+
+Run with `python youtube_fake_server.py` and point the app at it with
+YOUTUBE_API_ENDPOINT=http://127.0.0.1:8765/
+"""
+import json
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BROADCAST_ID = "fakeBroadcast01"
+LIVE_CHAT_ID = "fakeLiveChat01"
+
+# The ingest stream the broadcast is bound to, and its stream key
+STREAM_ID = "fakeStream01"
+STREAM_KEY = "fake-stream-key"
+
+CHAT_AUTHORS = ["Alex", "Sam", "Jordan", "Taylor", "Casey", "Riley", "Morgan"]
+CHAT_TEXTS = ["Hello!", "Great stream", "First time here", "LOL", "What song is this?", "GG"]
+
+class FakeYouTubeState:
+    """Evolving broadcast statistics and chat served by the fake API"""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.viewers = 50
+        self.likes = 0
+        self.messages = []
+        self.requests = Counter()
+
+    def tick(self):
+        """Advance viewers, likes and chat by one poll"""
+        self.viewers = max(0, self.viewers + self.random.randint(-5, 8))
+        self.likes += self.random.randint(0, 3)
+
+        for _ in range(self.random.randint(0, 4)):
+            roll = self.random.random()
+            snippet = {
+                "type": "textMessageEvent",
+                "displayMessage": self.random.choice(CHAT_TEXTS),
+                "publishedAt": datetime.now(timezone.utc).isoformat()
+            }
+            if roll > 0.95:
+                snippet["type"] = "superChatEvent"
+                snippet["superChatDetails"] = {
+                    "amountMicros": "5000000",
+                    "currency": "USD",
+                    "amountDisplayString": "$5.00"
+                }
+            elif roll > 0.92:
+                snippet["type"] = "newSponsorEvent"
+
+            author = self.random.choice(CHAT_AUTHORS)
+            self.messages.append({
+                "id": f"msg{len(self.messages)}",
+                "snippet": snippet,
+                "authorDetails": {"displayName": author, "channelId": f"UC{author}"}
+            })
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        state = self.server.state
+
+        with state.lock:
+            state.requests[url.path] += 1
+
+            if url.path == "/youtube/v3/liveBroadcasts":
+                return self.send_json({"items": [{
+                    "id": BROADCAST_ID,
+                    "snippet": {"title": "Fake Live Stream", "liveChatId": LIVE_CHAT_ID},
+                    "contentDetails": {"boundStreamId": STREAM_ID}
+                }]})
+
+            if url.path == "/youtube/v3/liveStreams":
+                return self.send_json({"items": [{
+                    "id": STREAM_ID,
+                    "cdn": {"ingestionInfo": {"streamName": STREAM_KEY}}
+                }]})
+
+            if url.path == "/youtube/v3/videos":
+                state.tick()
+                return self.send_json({"items": [
+                    {
+                        "id": video_id,
+                        "statistics": {"likeCount": str(state.likes), "commentCount": str(len(state.messages))},
+                        "liveStreamingDetails": {
+                            "concurrentViewers": str(state.viewers),
+                            "activeLiveChatId": LIVE_CHAT_ID
+                        }
+                    }
+                    for video_id in query.get("id", "").split(",") if video_id
+                ]})
+
+            if url.path == "/youtube/v3/liveChat/messages":
+                state.tick()
+                start = int(query.get("pageToken") or 0)
+                return self.send_json({
+                    "items": state.messages[start:],
+                    "nextPageToken": str(len(state.messages)),
+                    "pollingIntervalMillis": 2000
+                })
+
+        self.send_json({"error": {"code": 404, "message": "Not found"}}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        state = self.server.state
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or "{}")
+
+        with state.lock:
+            state.requests[url.path] += 1
+
+            if url.path == "/youtube/v3/liveChat/messages":
+                snippet = body.get("snippet", {})
+                item = {
+                    "id": f"msg{len(state.messages)}",
+                    "snippet": {
+                        "type": "textMessageEvent",
+                        "liveChatId": snippet.get("liveChatId"),
+                        "displayMessage": snippet.get("textMessageDetails", {}).get("messageText", ""),
+                        "publishedAt": datetime.now(timezone.utc).isoformat()
+                    },
+                    "authorDetails": {"displayName": "Channel Owner", "isChatOwner": True}
+                }
+                state.messages.append(item)
+                return self.send_json(item)
+
+        self.send_json({"error": {"code": 404, "message": "Not found"}}, status=404)
+
+class FakeYouTubeServer(ThreadingHTTPServer):
+    """Fake API server that can run on a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, seed=0):
+        super().__init__((host, port), FakeYouTubeHandler)
+        self.state = FakeYouTubeState(seed)
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = FakeYouTubeServer(port=args.port)
+    print(f"Fake YouTube API listening on {server.endpoint}")
+    server.serve_forever()